@@ -23,9 +23,9 @@ class CookieJWTAuthentication(JWTAuthentication):
             validated_token = self.get_validated_token(access_token)
             user = self.get_user(validated_token)
             
-            logger.debug(f"Successfully authenticated user: {user.email}")
+            logger.debug("Successfully authenticated user %s", user.pk)
             return (user, validated_token)
             
         except Exception as e:
-            logger.debug(f"JWT authentication failed: {str(e)}")
+            logger.debug("JWT authentication failed: %s", e)
             return None
\ No newline at end of file
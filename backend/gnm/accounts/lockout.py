@@ -0,0 +1,120 @@
+# accounts/lockout.py
+"""
+Login lockout for CookieLoginView, kept entirely in the cache.
+
+Failures are counted per account and per client IP with atomic cache
+increments in fixed time buckets. The current bucket is combined with a
+linearly decaying share of the previous one, which approximates a sliding
+window without storing individual attempts. The limits reuse the axes
+settings so both layers lock out on the same policy. Counting per IP is
+off unless LOGIN_LOCKOUT_IP_FAILURE_LIMIT is set.
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _window():
+    """Cool-off window in seconds, from AXES_COOLOFF_TIME (hours or timedelta)"""
+    cooloff = getattr(settings, 'AXES_COOLOFF_TIME', 1) or 1
+    if isinstance(cooloff, timedelta):
+        return max(int(cooloff.total_seconds()), 1)
+    return max(int(float(cooloff) * 3600), 1)
+
+
+def _limits():
+    return {
+        'account': getattr(settings, 'AXES_FAILURE_LIMIT', 5),
+        'ip': getattr(settings, 'LOGIN_LOCKOUT_IP_FAILURE_LIMIT', None),
+    }
+
+
+def client_ip(request):
+    """
+    The client's address: REMOTE_ADDR, or with LOGIN_LOCKOUT_TRUSTED_PROXIES
+    set, the X-Forwarded-For entry that the outermost trusted proxy added.
+    Entries further left were sent by the client and are not trusted.
+    """
+    addresses = [request.META.get('REMOTE_ADDR', '')]
+    proxies = getattr(settings, 'LOGIN_LOCKOUT_TRUSTED_PROXIES', 0)
+    if proxies:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        addresses = [part for part in forwarded if part] + addresses
+        return addresses[max(len(addresses) - 1 - proxies, 0)]
+    return addresses[0]
+
+
+def _identifiers(email=None, ip=None):
+    found = {}
+    if email:
+        found['account'] = email.strip().lower()
+    if ip and _limits()['ip']:
+        found['ip'] = ip
+    return found
+
+
+def _bucket_keys(kind, value, now):
+    window = _window()
+    bucket = int(now // window)
+    digest = hashlib.sha256(value.encode()).hexdigest()[:32]
+    return (
+        f"login_failures:{kind}:{digest}:{bucket}",
+        f"login_failures:{kind}:{digest}:{bucket - 1}",
+    )
+
+
+def get_failures(email=None, ip=None):
+    """
+    Return {kind: {'failures', 'limit', 'locked', 'retry_after'}} for the
+    given identifiers with a single cache round trip
+    """
+    now = time.time()
+    window = _window()
+    elapsed = (now % window) / window
+    identifiers = _identifiers(email, ip)
+    keys = {kind: _bucket_keys(kind, value, now) for kind, value in identifiers.items()}
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+    limits = _limits()
+
+    status = {}
+    for kind, (current, previous) in keys.items():
+        failures = values.get(current, 0) + values.get(previous, 0) * (1 - elapsed)
+        locked = failures >= limits[kind]
+        status[kind] = {
+            'failures': round(failures, 2),
+            'limit': limits[kind],
+            'locked': locked,
+            'retry_after': int(window - now % window) if locked else 0,
+        }
+    return status
+
+
+def check_lockout(email, ip):
+    """Return seconds to wait if either the account or the IP is locked, else 0"""
+    status = get_failures(email=email, ip=ip)
+    return max((s['retry_after'] for s in status.values() if s['locked']), default=0)
+
+
+def record_failure(email, ip):
+    now = time.time()
+    timeout = _window() * 2
+    for kind, value in _identifiers(email, ip).items():
+        key = _bucket_keys(kind, value, now)[0]
+        cache.add(key, 0, timeout=timeout)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(key, 1, timeout=timeout)
+
+
+def clear_failures(email=None, ip=None):
+    now = time.time()
+    cache.delete_many([
+        key
+        for kind, value in _identifiers(email, ip).items()
+        for key in _bucket_keys(kind, value, now)
+    ])
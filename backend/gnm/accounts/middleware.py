@@ -21,7 +21,7 @@ class JWTCookieMiddleware:
         refresh_token = request.session.get('_jwt_refresh')
         
         if access_token and refresh_token:
-            logger.info("Setting JWT cookies from session")
+            logger.debug("Setting JWT cookies from session")
             
             # Set cookies
             secure = getattr(settings, 'SESSION_COOKIE_SECURE', False)
@@ -51,6 +51,6 @@ class JWTCookieMiddleware:
             del request.session['_jwt_refresh']
             request.session.modified = True
             
-            logger.info("JWT cookies set and session cleared")
+            logger.debug("JWT cookies set and session cleared")
         
         return response
\ No newline at end of file
@@ -0,0 +1,79 @@
+# accounts/revocation.py
+"""
+Cache-resident denylist for refresh tokens.
+
+Each revoked ``jti`` is an entry in the shared cache that lives until the
+token would have expired. Revoking every token of a user (password reset)
+stores a per-user cutoff instead: tokens issued before it are rejected.
+Checking a token is a single ``get_many`` of both keys.
+
+``iat`` only has whole seconds, so tokens minted here also carry
+``issued_at`` with sub-second precision; a login in the same second as a
+reset is then told apart from the tokens the reset revoked.
+"""
+import time
+
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+ISSUED_AT_CLAIM = 'issued_at'
+
+
+def _exact_key(jti):
+    return f"jwt_revoked:{jti}"
+
+
+def _cutoff_key(user_id):
+    return f"jwt_revoked_before:{user_id}"
+
+
+def stamp(token):
+    """Set the sub-second issue time on a token whose iat was just set"""
+    token[ISSUED_AT_CLAIM] = time.time()
+    return token
+
+
+def refresh_token_for(user):
+    """RefreshToken.for_user with the issue time the cutoff check needs"""
+    return stamp(RefreshToken.for_user(user))
+
+
+def revoke_token(token):
+    """
+    Add a refresh token's jti to the denylist until the token expires.
+
+    Returns False if it was already there, or could not be recorded. The
+    entry is added with cache.add(), so of two requests rotating the same
+    token only one gets True; the other must not reissue it.
+    """
+    jti = token.get(api_settings.JTI_CLAIM)
+    exp = token.get('exp')
+    if not jti or not exp:
+        return False
+    now = time.time()
+    if exp <= now:
+        return False
+    return cache.add(_exact_key(jti), 1, timeout=int(exp - now) + 1)
+
+
+def revoke_user_tokens(user_id):
+    """Reject every refresh token issued to the user up to now"""
+    lifetime = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    cache.set(_cutoff_key(user_id), time.time(), timeout=int(lifetime) + 1)
+
+
+def is_revoked(token):
+    """True if the token was revoked individually or by a per-user cutoff"""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if not jti:
+        return True
+    exact_key = _exact_key(jti)
+    cutoff_key = _cutoff_key(token.get(api_settings.USER_ID_CLAIM))
+    found = cache.get_many([exact_key, cutoff_key])
+    if exact_key in found:
+        return True
+    cutoff = found.get(cutoff_key)
+    # Tokens from before issued_at existed fall back to iat, which errs
+    # towards rejecting a token minted in the same second as the cutoff
+    return cutoff is not None and token.get(ISSUED_AT_CLAIM, token.get('iat', 0)) < cutoff
@@ -1,7 +1,7 @@
 # accounts/signals.py
 from django.dispatch import receiver
 from allauth.account.signals import user_logged_in
-from rest_framework_simplejwt.tokens import RefreshToken
+from .revocation import refresh_token_for
 # from django.conf import settings
 import logging
 
@@ -12,10 +12,10 @@ def set_jwt_cookies_on_login(sender, request, user, **kwargs):
     """
     Set JWT cookies whenever a user logs in (including social login)
     """
-    logger.info(f"User logged in: {user.email}")
+    logger.info("User logged in: %s", user.pk)
     
     # Generate JWT tokens
-    refresh = RefreshToken.for_user(user)
+    refresh = refresh_token_for(user)
     access_token = str(refresh.access_token)
     refresh_token = str(refresh)
     
@@ -25,4 +25,4 @@ def set_jwt_cookies_on_login(sender, request, user, **kwargs):
     request.session['_jwt_refresh'] = refresh_token
     request.session.modified = True
     
-    logger.info("JWT tokens stored in session for cookie setting")
\ No newline at end of file
+    logger.debug("JWT tokens stored in session for cookie setting")
\ No newline at end of file
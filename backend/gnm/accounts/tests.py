@@ -1,3 +1,264 @@
-from django.test import TestCase
+import itertools
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from gnm.benchmark import SEED_PASSWORD, Endpoint, EndpointBenchmarkMixin
+
+from . import lockout
+from .revocation import is_revoked, refresh_token_for, revoke_token, revoke_user_tokens
+
+User = get_user_model()
+
+_registrations = itertools.count()
+
+
+def _refresh_cookie(case):
+    return {'cookies': {'refresh': str(RefreshToken.for_user(case.accounts['user']))}}
+
+
+def _new_registration(case):
+    n = next(_registrations)
+    return {'data': {
+        'first_name': 'New', 'last_name': 'User', 'email': f'new{n}@example.com', 'password': 'a-long-password',
+    }}
+
+
+def _reset_token(case, **extra):
+    user = case.accounts['reset']
+    user.refresh_from_db()
+    data = {'uid': urlsafe_base64_encode(force_bytes(user.pk)), 'token': default_token_generator.make_token(user)}
+    return {'data': {**data, **extra}}
+
+
+class AccountsEndpointBenchmark(EndpointBenchmarkMixin, TestCase):
+    urls_module = 'accounts.urls'
+    # Budgets include the shared cache's database tier (gnm/cache.py)
+    endpoints = [
+        # Lockout counters read, user lookup, counters cleared
+        Endpoint('cookie_login', 'post', queries=3, p95_ms=25, data={
+            'email': 'bench0@example.com', 'password': SEED_PASSWORD,
+        }),
+        # User lookup, then the revocation: one denylist entry
+        Endpoint('cookie_logout', 'post', as_user='user', queries=2, p95_ms=25, prepare=_refresh_cookie),
+        # No user query: the denylist check, then the revocation as for logout
+        Endpoint('token_refresh', 'post', queries=2, p95_ms=25, prepare=_refresh_cookie),
+        Endpoint('login_lockouts', as_user='admin', queries=2, p95_ms=25, data={'email': 'bench0@example.com'}),
+        Endpoint('csrf', queries=0, p95_ms=25),
+        # The INSERT; inside the test transaction its atomic block adds SAVEPOINT and RELEASE
+        Endpoint('register', 'post', status=201, queries=3, p95_ms=25, prepare=_new_registration),
+        Endpoint('password_reset_request', 'post', queries=1, p95_ms=25, data={'email': 'bench0@example.com'}),
+        # User lookup, password update and the per-user token cutoff
+        Endpoint('password_reset_confirm', 'post', queries=3, p95_ms=25,
+                 prepare=lambda case: _reset_token(case, password='another-long-password')),
+        Endpoint('validate_reset_token', 'post', queries=1, p95_ms=25, prepare=_reset_token),
+    ]
+
+
+class GoogleCallbackTests(TestCase):
+    """Authorization-code reuse guard of CustomGoogleCallbackView"""
+
+    def test_a_code_is_exchanged_once(self):
+        with override_settings(CACHES={'default': settings.CACHES['shared']}), \
+                mock.patch('accounts.views.requests.post') as post, \
+                self.assertLogs('accounts.views', 'ERROR'):
+            cache.clear()
+            post.return_value.json.return_value = {'error': 'invalid_grant', 'error_description': 'Bad code'}
+            first = self.client.get('/accounts/google/login/callback/', {'code': 'abc', 'state': 's'})
+            again = self.client.get('/accounts/google/login/callback/', {'code': 'abc', 'state': 's'})
+        self.assertIn('Bad%20code', first['Location'])
+        self.assertIn('already%20used', again['Location'])
+        self.assertEqual(post.call_count, 1)
+
+
+class RevocationTests(TestCase):
+    """Refresh tokens stop working once rotated, logged out or reset"""
+
+    refresh_url = '/api/auth/custom/token/refresh/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('rev@example.com', 'rev@example.com', 'pw123456789')
+
+    def setUp(self):
+        cache.clear()
+
+    def refresh(self, token):
+        self.client.cookies['refresh'] = str(token)
+        return self.client.post(self.refresh_url)
+
+    def test_rotated_token_is_rejected(self):
+        old = refresh_token_for(self.user)
+        response = self.refresh(old)
+        self.assertEqual(response.status_code, 200)
+        rotated = response.cookies['refresh'].value
+        self.assertEqual(self.refresh(old).status_code, 401)
+        self.assertEqual(self.refresh(rotated).status_code, 200)
+
+    def test_logged_out_token_is_rejected(self):
+        token = refresh_token_for(self.user)
+        self.client.cookies['refresh'] = str(token)
+        self.assertEqual(self.client.post('/api/auth/custom/logout/').status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_token_issued_before_reset_is_rejected(self):
+        before = refresh_token_for(self.user)
+        revoke_user_tokens(self.user.pk)
+        after = refresh_token_for(self.user)
+        # Usually minted in the same second as the cutoff, so iat alone could not tell
+        self.assertTrue(is_revoked(before))
+        self.assertFalse(is_revoked(after))
+        self.assertEqual(self.refresh(before).status_code, 401)
+        self.assertEqual(self.refresh(after).status_code, 200)
+
+    def test_unstamped_token_from_the_reset_second_is_rejected(self):
+        token = RefreshToken.for_user(self.user)
+        with mock.patch('accounts.revocation.time.time', return_value=token['iat'] + 0.5):
+            revoke_user_tokens(self.user.pk)
+        self.assertTrue(is_revoked(token))
+
+    def test_check_is_one_cache_read(self):
+        token = refresh_token_for(self.user)
+        with self.assertNumQueries(1):
+            self.assertFalse(is_revoked(token))
+
+    def test_token_is_retired_only_once(self):
+        token = refresh_token_for(self.user)
+        self.assertTrue(revoke_token(token))
+        self.assertFalse(revoke_token(token))
+
+    def test_concurrent_rotation_reissues_once(self):
+        token = refresh_token_for(self.user)
+        # Another request retires the token between this one's check and rotation
+        with mock.patch('accounts.views.is_revoked', return_value=False):
+            revoke_token(token)
+            with self.assertLogs('accounts.views', 'WARNING'):
+                response = self.refresh(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn('refresh', response.cookies)
+
+
+class LockoutTests(TestCase):
+    """CookieLoginView locks out repeated failures from the cache counters"""
+
+    login_url = '/api/auth/custom/login/'
+    lockouts_url = '/api/auth/custom/lockouts/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('lock@example.com', 'lock@example.com', 'pw123456789')
+        cls.admin = User.objects.create_superuser('lockadmin@example.com', 'lockadmin@example.com', 'pw123456789')
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, password, email='lock@example.com'):
+        return self.client.post(self.login_url, {'email': email, 'password': password},
+                                content_type='application/json')
+
+    def fail(self, times):
+        for _ in range(times):
+            self.assertEqual(self.login('wrong').status_code, 401)
+
+    def test_failures_lock_the_account(self):
+        self.fail(settings.AXES_FAILURE_LIMIT)
+        with self.assertLogs('accounts.views', 'WARNING'):
+            response = self.login('pw123456789')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_previous_bucket_decays(self):
+        window = 3600
+        start = (int(time.time()) // window) * window
+        with mock.patch('accounts.lockout.time.time', return_value=start - 1):
+            for _ in range(settings.AXES_FAILURE_LIMIT):
+                lockout.record_failure('lock@example.com', '10.0.0.1')
+        # The previous bucket counts in full at the start of the next one...
+        with mock.patch('accounts.lockout.time.time', return_value=start):
+            self.assertTrue(lockout.get_failures(email='lock@example.com')['account']['locked'])
+        # ...and half as much halfway through it
+        with mock.patch('accounts.lockout.time.time', return_value=start + window / 2):
+            status = lockout.get_failures(email='lock@example.com')['account']
+        self.assertEqual(status['failures'], settings.AXES_FAILURE_LIMIT / 2)
+        self.assertFalse(status['locked'])
+
+    def test_successful_login_clears_the_account(self):
+        self.fail(settings.AXES_FAILURE_LIMIT - 1)
+        self.assertEqual(self.login('pw123456789').status_code, 200)
+        self.assertEqual(lockout.get_failures(email='lock@example.com')['account']['failures'], 0)
+        self.fail(settings.AXES_FAILURE_LIMIT - 1)
+        self.assertEqual(self.login('pw123456789').status_code, 200)
+
+    def test_admin_delete_clears_the_lock(self):
+        self.fail(settings.AXES_FAILURE_LIMIT)
+        self.client.cookies['access'] = str(AccessToken.for_user(self.admin))
+        with self.assertLogs('accounts.views', 'INFO'):
+            response = self.client.delete(f'{self.lockouts_url}?email=lock@example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['account']['locked'])
+        del self.client.cookies['access']
+        self.assertEqual(self.login('pw123456789').status_code, 200)
+
+    def test_shared_ip_does_not_lock_everyone_out(self):
+        # Behind a proxy every request has the same REMOTE_ADDR
+        for i in range(20):
+            self.assertEqual(self.login('wrong', email=f'other{i}@example.com').status_code, 401)
+        self.assertEqual(self.login('pw123456789').status_code, 200)
+
+    @override_settings(LOGIN_LOCKOUT_IP_FAILURE_LIMIT=3, LOGIN_LOCKOUT_TRUSTED_PROXIES=1)
+    def test_ip_limit_uses_the_forwarded_client(self):
+        for i in range(3):
+            self.client.post(self.login_url, {'email': f'other{i}@example.com', 'password': 'wrong'},
+                             content_type='application/json', HTTP_X_FORWARDED_FOR='10.0.0.1')
+        with self.assertLogs('accounts.views', 'WARNING'):
+            response = self.client.post(self.login_url, {'email': 'lock@example.com', 'password': 'pw123456789'},
+                                        content_type='application/json', HTTP_X_FORWARDED_FOR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        # Another client behind the same proxy, even one claiming to be the locked address
+        response = self.client.post(self.login_url, {'email': 'lock@example.com', 'password': 'pw123456789'},
+                                    content_type='application/json', HTTP_X_FORWARDED_FOR='10.0.0.1, 10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    def test_locked_attempt_skips_the_user_lookup(self):
+        self.fail(settings.AXES_FAILURE_LIMIT)
+        with mock.patch.object(type(User.objects), 'get_by_email') as get_by_email, \
+                self.assertLogs('accounts.views', 'WARNING'):
+            self.assertEqual(self.login('pw123456789').status_code, 429)
+        get_by_email.assert_not_called()
+
+
+class RegistrationTests(TestCase):
+    """register_user relies on the case-insensitive unique email index"""
+
+    url = '/api/auth/custom/register/'
+
+    def register(self, email):
+        return self.client.post(self.url, {
+            'first_name': 'Foo', 'last_name': 'Bar', 'email': email, 'password': 'a-long-password',
+        }, content_type='application/json')
+
+    def test_duplicate_email_differing_in_case(self):
+        response = self.register('Foo@x.com')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['email'], 'foo@x.com')
+        with self.assertLogs('accounts.views', 'WARNING'):
+            response = self.register('foo@x.com')
+        # Same answer as a new account, without its details
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('user_id', response.json())
+        self.assertEqual(User.objects.with_email('FOO@x.com').count(), 1)
+
+    def test_duplicate_of_a_mixed_case_stored_email(self):
+        User.objects.create_user('legacy', 'Foo@X.com', 'pw123456789')
+        with self.assertLogs('accounts.views', 'WARNING'):
+            self.assertEqual(self.register('foo@x.com').status_code, 201)
+        # The failed INSERT left the surrounding transaction usable
+        self.assertEqual(User.objects.with_email('foo@x.com').get().username, 'legacy')
@@ -3,6 +3,7 @@ from .views import (
     CookieLoginView,
     CookieLogoutView,
     CookieTokenRefreshView,
+    login_lockouts,
     # MeView,
     csrf,
     register_user,
@@ -16,6 +17,7 @@ urlpatterns = [
     path("login/", CookieLoginView.as_view(), name="cookie_login"),
     path("logout/", CookieLogoutView.as_view(), name="cookie_logout"),
     path("token/refresh/", CookieTokenRefreshView.as_view(), name="token_refresh"),
+    path("lockouts/", login_lockouts, name="login_lockouts"),
     # path("me/", MeView.as_view(), name="current_user"),
     path("csrf/", csrf, name="csrf"),
     path("register/", register_user, name="register"),
@@ -1,14 +1,15 @@
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework import status
 from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
 from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth.hashers import make_password
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.views.decorators.http import require_http_methods
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.views.decorators.csrf import csrf_exempt
@@ -25,6 +26,9 @@ from django.core.cache import cache
 from urllib.parse import quote
 from django.contrib.auth import get_user_model
 from profile.serializers import UserSerializer
+from .revocation import is_revoked, refresh_token_for, revoke_token, revoke_user_tokens, stamp
+from . import lockout
+from gnm.timing import timed
 User = get_user_model()
 
 
@@ -42,7 +46,7 @@ class CookieJWTAuthentication(JWTAuthentication):
             validated = self.get_validated_token(access_token)
             return (self.get_user(validated), validated)
         except Exception as e:
-            logger.debug(f"JWT authentication failed: {e}")
+            logger.debug("JWT authentication failed: %s", e)
             return None
 
 # ----------------------------
@@ -62,50 +66,50 @@ class CustomGoogleCallbackView(View):
             logger.error("No code provided in Google callback")
             return self._error_redirect("No authorization code provided")
         
-        # Prevent code reuse using Django cache
+        # Prevent code reuse: add() is atomic in the shared cache, so only
+        # one request (on any worker) can claim a code; kept for 5 minutes
         code_key = f"oauth_code:{code}:{state}"
-        if cache.get(code_key):
-            logger.warning(f"Attempted reuse of authorization code: {code[:10]}...")
+        if not cache.add(code_key, True, timeout=300):
+            logger.warning("Attempted reuse of authorization code: %s...", code[:10])
             return self._error_redirect("Authorization code already used")
         
-        # Mark code as used for 5 minutes
-        cache.set(code_key, True, timeout=300)
-        
         try:
             # Exchange code for access token
-            token_response = requests.post(
-                'https://oauth2.googleapis.com/token',
-                data={
-                    'code': code,
-                    'client_id': settings.GOOGLE_CLIENT_ID,
-                    'client_secret': settings.GOOGLE_CLIENT_SECRET,
-                    'redirect_uri': settings.GOOGLE_REDIRECT_URI,
-                    'grant_type': 'authorization_code'
-                },
-                timeout=10
-            )
+            with timed('google'):
+                token_response = requests.post(
+                    settings.GOOGLE_TOKEN_URL,
+                    data={
+                        'code': code,
+                        'client_id': settings.GOOGLE_CLIENT_ID,
+                        'client_secret': settings.GOOGLE_CLIENT_SECRET,
+                        'redirect_uri': settings.GOOGLE_REDIRECT_URI,
+                        'grant_type': 'authorization_code'
+                    },
+                    timeout=10
+                )
             
             token_data = token_response.json()
             access_token = token_data.get('access_token')
             
             if not access_token:
                 error_msg = token_data.get('error_description', 'Failed to obtain access token')
-                logger.error(f"Token exchange failed: {token_data}")
+                logger.error("Token exchange failed: %s", token_data.get('error'))
                 return self._error_redirect(error_msg)
 
             # Fetch user info
-            user_info_resp = requests.get(
-                'https://www.googleapis.com/oauth2/v2/userinfo',
-                headers={'Authorization': f'Bearer {access_token}'},
-                timeout=10
-            )
+            with timed('google'):
+                user_info_resp = requests.get(
+                    settings.GOOGLE_USERINFO_URL,
+                    headers={'Authorization': f'Bearer {access_token}'},
+                    timeout=10
+                )
             
             if user_info_resp.status_code != 200:
-                logger.error(f"Failed to fetch user info: {user_info_resp.status_code}")
+                logger.error("Failed to fetch user info: %s", user_info_resp.status_code)
                 return self._error_redirect("Failed to retrieve user information")
             
             user_info = user_info_resp.json()
-            email = user_info.get('email')
+            email = (user_info.get('email') or '').strip().lower()
             first_name = user_info.get('given_name', '')
             last_name = user_info.get('family_name', '')
 
@@ -113,8 +117,8 @@ class CustomGoogleCallbackView(View):
                 return self._error_redirect("Failed to retrieve user email")
 
             # Create or get user
-            user, created = User.objects.get_or_create(
-                email=email,
+            user, created = User.objects.get_or_create_by_email(
+                email,
                 defaults={
                     'username': email,
                     'first_name': first_name,
@@ -122,10 +126,10 @@ class CustomGoogleCallbackView(View):
                 }
             )
 
-            logger.info(f"Google OAuth user: {email} | Created: {created}")
+            logger.info("Google OAuth user %s | Created: %s", user.pk, created)
 
             # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = refresh_token_for(user)
             access_jwt = str(refresh.access_token)
             refresh_jwt = str(refresh)
 
@@ -155,17 +159,17 @@ class CustomGoogleCallbackView(View):
                 path='/'
             )
 
-            logger.info("JWT cookies set successfully for Google OAuth")
+            logger.debug("JWT cookies set for Google OAuth user %s", user.pk)
             return response
 
         except requests.Timeout:
             logger.error("Google OAuth request timed out")
             return self._error_redirect("Authentication request timed out")
         except requests.RequestException as e:
-            logger.exception(f"Network error in Google OAuth: {str(e)}")
+            logger.exception("Network error in Google OAuth: %s", e)
             return self._error_redirect("Network error during authentication")
         except Exception as e:
-            logger.exception(f"Error in Google OAuth callback: {str(e)}")
+            logger.exception("Error in Google OAuth callback: %s", e)
             return self._error_redirect("Internal server error")
     
     def _error_redirect(self, error_message):
@@ -193,10 +197,23 @@ class CookieLoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Reject locked-out attempts before the user lookup and the
+        # password hash check
+        ip = lockout.client_ip(request)
+        retry_after = lockout.check_lockout(email, ip)
+        if retry_after:
+            logger.warning("Locked out login attempt for %s from %s", email, ip)
+            return Response(
+                {"detail": "Too many failed login attempts. Please try again later."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(retry_after)}
+            )
+        
         # Authenticate user
         try:
-            user = User.objects.get(email=email)
+            user = User.objects.get_by_email(email)
         except User.DoesNotExist:
+            lockout.record_failure(email, ip)
             return Response(
                 {"detail": "Invalid credentials"}, 
                 status=status.HTTP_401_UNAUTHORIZED
@@ -204,6 +221,7 @@ class CookieLoginView(APIView):
         
         # Check password
         if not user.check_password(password):
+            lockout.record_failure(email, ip)
             return Response(
                 {"detail": "Invalid credentials"}, 
                 status=status.HTTP_401_UNAUTHORIZED
@@ -216,12 +234,14 @@ class CookieLoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
+        lockout.clear_failures(email=email)
+
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = refresh_token_for(user)
         access_token = str(refresh.access_token)
         refresh_token = str(refresh)
         
-        logger.info(f"User logged in: {email}")
+        logger.info("User logged in: %s", user.pk)
         
         # Create response
         response = Response({"detail": "Login successful"}, status=status.HTTP_200_OK)
@@ -253,6 +273,13 @@ class CookieLoginView(APIView):
 # Refresh access token from HttpOnly refresh cookie
 # ----------------------------
 class CookieTokenRefreshView(APIView):
+    """
+    Rotates the refresh token on every use. The presented token is added
+    to the cache denylist, so a stolen copy stops working after one refresh.
+    """
+    # The refresh cookie is the credential here; skip loading the user
+    # from the access cookie so the common path does no database query
+    authentication_classes = []
     permission_classes = [AllowAny]
     
     def post(self, request, *args, **kwargs):
@@ -261,17 +288,58 @@ class CookieTokenRefreshView(APIView):
             return Response({"detail": "Refresh token missing"}, status=status.HTTP_401_UNAUTHORIZED)
         try:
             refresh = RefreshToken(refresh_token)
-            access_token = str(refresh.access_token)
-            response = Response({"detail": "Token refreshed"})
-            secure = getattr(settings, "SESSION_COOKIE_SECURE", False)
-            response.set_cookie(
-                "access", access_token, httponly=True, secure=secure,
-                samesite="Lax", max_age=60*15, path="/"
-            )
-            return response
-        except Exception:
+        except TokenError:
+            return Response({"detail": "Invalid refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if is_revoked(refresh):
+            logger.warning("Revoked refresh token presented: %s", refresh.get('jti'))
             return Response({"detail": "Invalid refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
 
+        # Rotate: retire the old jti, then reissue the same claims. Only one
+        # of two concurrent refreshes with the same token retires it.
+        if not revoke_token(refresh):
+            logger.warning("Refresh token already rotated: %s", refresh.get('jti'))
+            return Response({"detail": "Invalid refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+        refresh.set_jti()
+        refresh.set_exp()
+        refresh.set_iat()
+        stamp(refresh)
+
+        response = Response({"detail": "Token refreshed"})
+        secure = getattr(settings, "SESSION_COOKIE_SECURE", False)
+        response.set_cookie(
+            "access", str(refresh.access_token), httponly=True, secure=secure,
+            samesite="Lax", max_age=60*15, path="/"
+        )
+        response.set_cookie(
+            "refresh", str(refresh), httponly=True, secure=secure,
+            samesite="Lax", max_age=60*60*24*7, path="/"
+        )
+        return response
+
+# ----------------------------
+# Admin: inspect and clear login lockouts
+# ----------------------------
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def login_lockouts(request):
+    """
+    Inspect (GET) or clear (DELETE) lockout counters for ?email= and/or ?ip=
+    """
+    email = request.query_params.get('email', '').strip().lower()
+    ip = request.query_params.get('ip', '').strip()
+    if not email and not ip:
+        return Response(
+            {"detail": "Provide an email and/or ip query parameter"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if request.method == 'DELETE':
+        lockout.clear_failures(email=email, ip=ip)
+        logger.info("Lockout cleared by user %s: email=%s ip=%s", request.user.pk, email, ip)
+
+    return Response(lockout.get_failures(email=email, ip=ip), status=status.HTTP_200_OK)
+
 # ----------------------------
 # Logout
 # ----------------------------
@@ -282,15 +350,22 @@ class CookieLogoutView(APIView):
     permission_classes = [AllowAny]
     
     def post(self, request, *args, **kwargs):
-        logger.info(f"Logout request received from: {request.user if request.user.is_authenticated else 'Anonymous'}")
+        logger.debug("Logout request received from user %s", request.user.pk)
         
+        refresh_token = request.COOKIES.get("refresh")
+        if refresh_token:
+            try:
+                revoke_token(RefreshToken(refresh_token))
+            except TokenError:
+                pass  # Already invalid or expired, nothing to revoke
+
         response = Response({"detail": "Successfully logged out"}, status=status.HTTP_200_OK)
         
         response.delete_cookie('access', path='/', samesite='Lax')
         response.delete_cookie('refresh', path='/', samesite='Lax')
         response.delete_cookie('refresh', path='/api/auth/token/refresh/', samesite='Lax')
         
-        logger.info("Logout successful - cookies cleared")
+        logger.debug("Logout successful - cookies cleared")
         return response
 
 # ----------------------------
@@ -360,22 +435,27 @@ def register_user(request):
                 status=400
             )
 
-        if User.objects.filter(email=email).exists():
-            logger.warning(f"Registration attempt for existing email: {email}")
+        # Insert directly: the unique indexes on lower(email) and username
+        # reject duplicates, so no exists() round trip is needed. The
+        # savepoint keeps a surrounding transaction usable after the
+        # IntegrityError.
+        try:
+            with transaction.atomic():
+                user = User.objects.create(
+                    username=email,
+                    email=email,
+                    first_name=first_name,
+                    last_name=last_name,
+                    password=make_password(password)
+                )
+        except IntegrityError:
+            logger.warning("Registration attempt for existing email: %s", email)
             # Still return 201 to prevent enumeration
             return JsonResponse({
                 "detail": "Account created successfully. Please check your email."
             }, status=201)
 
-        user = User.objects.create(
-            username=email,
-            email=email,
-            first_name=first_name,
-            last_name=last_name,
-            password=make_password(password)
-        )
-
-        logger.info(f"New user registered: {email}")
+        logger.info("New user registered: %s", user.pk)
         
         return JsonResponse({
             "detail": "Account created successfully",
@@ -385,10 +465,8 @@ def register_user(request):
         
     except json.JSONDecodeError:
         return JsonResponse({"detail": "Invalid JSON data"}, status=400)
-    except IntegrityError:
-        return JsonResponse({"detail": "User with this email already exists"}, status=400)
     except Exception as e:
-        logger.exception(f"Registration error: {str(e)}")
+        logger.exception("Registration error: %s", e)
         return JsonResponse({"detail": "Registration failed. Please try again."}, status=500)
 
 # ----------------------------
@@ -412,7 +490,7 @@ def password_reset_request(request):
             )
         
         try:
-            user = User.objects.get(email=email)
+            user = User.objects.get_by_email(email)
         except User.DoesNotExist:
             return Response({
                 "detail": "If an account exists with this email, you will receive reset instructions."
@@ -497,10 +575,10 @@ The GNM Events Team
                 fail_silently=False,
             )
             
-            logger.info(f"Password reset email sent to: {email}")
+            logger.info("Password reset email sent to user %s", user.pk)
             
         except Exception as e:
-            logger.error(f"Failed to send password reset email: {str(e)}")
+            logger.error("Failed to send password reset email: %s", e)
             return Response(
                 {"detail": "Failed to send reset email. Please try again later."}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -516,7 +594,7 @@ The GNM Events Team
             status=status.HTTP_400_BAD_REQUEST
         )
     except Exception as e:
-        logger.exception(f"Password reset request error: {str(e)}")
+        logger.exception("Password reset request error: %s", e)
         return Response(
             {"detail": "An error occurred. Please try again."}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -568,8 +646,10 @@ def password_reset_confirm(request):
         
         user.set_password(new_password)
         user.save()
+        # Sign out every session that was using the old password
+        revoke_user_tokens(user.pk)
         
-        logger.info(f"Password reset successful for user: {user.email}")
+        logger.info("Password reset successful for user %s", user.pk)
         
         try:
             send_mail(
@@ -589,7 +669,7 @@ The GNM Events Team
                 fail_silently=True,
             )
         except Exception as e:
-            logger.warning(f"Failed to send password change confirmation: {str(e)}")
+            logger.warning("Failed to send password change confirmation: %s", e)
         
         return Response({
             "detail": "Password has been reset successfully. You can now log in with your new password."
@@ -601,7 +681,7 @@ The GNM Events Team
             status=status.HTTP_400_BAD_REQUEST
         )
     except Exception as e:
-        logger.exception(f"Password reset confirm error: {str(e)}")
+        logger.exception("Password reset confirm error: %s", e)
         return Response(
             {"detail": "An error occurred. Please try again."}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -643,7 +723,7 @@ def validate_reset_token(request):
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
-        logger.exception(f"Token validation error: {str(e)}")
+        logger.exception("Token validation error: %s", e)
         return Response(
             {"valid": False, "detail": "Validation error"}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -690,7 +770,7 @@ class ProfileUpdateView(APIView):
             user.username = username
             user.save()
             
-            logger.info(f"Profile updated for user: {user.email}")
+            logger.info("Profile updated for user %s", user.pk)
             
             return Response({
                 "id": user.id,
@@ -703,7 +783,7 @@ class ProfileUpdateView(APIView):
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
-            logger.exception(f"Profile update error: {str(e)}")
+            logger.exception("Profile update error: %s", e)
             return Response(
                 {"detail": "Failed to update profile. Please try again."}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1,11 +1,21 @@
 from django.contrib import admin
-from .models import ContactMessage, Booking
+from django.utils import timezone
+from gnm.admin import EstimatedCountPaginator, ListDisplayColumnsMixin, chunked_delete, chunked_update
+from .models import ContactMessage, Booking, QuarantinedSubmission
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(ListDisplayColumnsMixin, admin.ModelAdmin):
     list_display = ('name', 'email', 'phone', 'eventType', 'eventDate', 'user', 'status', 'created_at')
-    list_filter = ('eventType', 'eventDate', 'status', 'created_at')
+    list_filter = ('eventType', 'eventDate', 'status')
     search_fields = ('name', 'email', 'phone', 'venue', 'user__username')
+    # Large-table settings: no FK dropdown, no per-row user query, no exact COUNT(*)
+    list_select_related = ('user',)
+    list_display_related = {'user': ('username',)}
+    autocomplete_fields = ('user',)
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('mark_confirmed', 'mark_completed', 'mark_cancelled')
 
     def save_model(self, request, obj, form, change):
         # Auto-fill name/email from linked user if not set
@@ -16,11 +26,35 @@ class BookingAdmin(admin.ModelAdmin):
                 obj.email = obj.user.email
         super().save_model(request, obj, form, change)
 
+    def _set_status(self, request, queryset, status):
+        # update() skips auto_now, so updated_at is set explicitly
+        updated = chunked_update(queryset, status=status, updated_at=timezone.now())
+        self.message_user(request, f"{updated} booking(s) marked as {status.replace('_', ' ')}.")
+
+    @admin.action(description="Mark selected bookings as confirmed")
+    def mark_confirmed(self, request, queryset):
+        self._set_status(request, queryset, 'confirmed')
+
+    @admin.action(description="Mark selected bookings as completed")
+    def mark_completed(self, request, queryset):
+        self._set_status(request, queryset, 'completed')
+
+    @admin.action(description="Mark selected bookings as cancelled")
+    def mark_cancelled(self, request, queryset):
+        self._set_status(request, queryset, 'cancelled')
+
 
 @admin.register(ContactMessage)
-class ContactMessageAdmin(admin.ModelAdmin):
+class ContactMessageAdmin(ListDisplayColumnsMixin, admin.ModelAdmin):
     list_display = ('name', 'email', 'subject', 'user', 'created_at')
     search_fields = ('name', 'email', 'subject', 'message', 'user__username')
+    list_select_related = ('user',)
+    list_display_related = {'user': ('username',)}
+    autocomplete_fields = ('user',)
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('delete_in_chunks',)
 
     def save_model(self, request, obj, form, change):
         if obj.user:
@@ -29,3 +63,27 @@ class ContactMessageAdmin(admin.ModelAdmin):
             if not obj.email:
                 obj.email = obj.user.email
         super().save_model(request, obj, form, change)
+
+    @admin.action(description="Delete selected messages (no confirmation, in batches)", permissions=['delete'])
+    def delete_in_chunks(self, request, queryset):
+        deleted = chunked_delete(queryset)
+        self.message_user(request, f"{deleted} message(s) deleted.")
+
+
+@admin.register(QuarantinedSubmission)
+class QuarantinedSubmissionAdmin(ListDisplayColumnsMixin, admin.ModelAdmin):
+    list_display = ('kind', 'reasons', 'score', 'ip', 'user', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('reasons', 'ip', 'user__username')
+    list_select_related = ('user',)
+    list_display_related = {'user': ('username',)}
+    autocomplete_fields = ('user',)
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('delete_in_chunks',)
+
+    @admin.action(description="Delete selected submissions (no confirmation, in batches)", permissions=['delete'])
+    def delete_in_chunks(self, request, queryset):
+        deleted = chunked_delete(queryset)
+        self.message_user(request, f"{deleted} submission(s) deleted.")
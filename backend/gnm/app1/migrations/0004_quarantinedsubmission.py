@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0003_booking_booking_created_at_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuarantinedSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('contact', 'Contact Message'), ('booking', 'Booking')], max_length=20)),
+                ('payload', models.JSONField()),
+                ('reasons', models.CharField(max_length=200)),
+                ('score', models.PositiveSmallIntegerField()),
+                ('ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Quarantined Submission',
+                'verbose_name_plural': 'Quarantined Submissions',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at'], name='quarantine_created_at_idx')],
+            },
+        ),
+    ]
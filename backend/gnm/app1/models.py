@@ -14,6 +14,9 @@ class ContactMessage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='contact_created_at_idx'),
+        ]
         verbose_name = 'Contact Message'
         verbose_name_plural = 'Contact Messages'
 
@@ -46,5 +49,37 @@ class Booking(models.Model):
 
         class Meta:
             ordering = ['-created_at']
+            indexes = [
+                models.Index(fields=['created_at'], name='booking_created_at_idx'),
+                # A user's booking history, newest first
+                models.Index(fields=['user', 'created_at'], name='booking_user_created_idx'),
+            ]
             verbose_name = 'Booking'
             verbose_name_plural = 'Bookings'
+
+
+class QuarantinedSubmission(models.Model):
+    """A contact or booking submission held back by the spam pre-filter (app1/spam.py)"""
+    KIND_CHOICES = [
+        ('contact', 'Contact Message'),
+        ('booking', 'Booking'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField()
+    reasons = models.CharField(max_length=200)
+    score = models.PositiveSmallIntegerField()
+    ip = models.GenericIPAddressField(null=True, blank=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} ({self.reasons})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='quarantine_created_at_idx'),
+        ]
+        verbose_name = 'Quarantined Submission'
+        verbose_name_plural = 'Quarantined Submissions'
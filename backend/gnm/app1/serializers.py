@@ -1,13 +1,15 @@
 from rest_framework import serializers
+from gnm.serializers import SparseFieldsetsMixin
+from gnm.timing import TimedSerializerMixin
 from .models import ContactMessage, Booking
 
-class ContactMessageSerializer(serializers.ModelSerializer):
+class ContactMessageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ContactMessage
         fields = '__all__'
         read_only_fields = ('user', 'created_at')
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsetsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     user_email = serializers.EmailField(source='user.email', read_only=True)
     user_name = serializers.CharField(source='user.username', read_only=True)
     
@@ -0,0 +1,151 @@
+# app1/spam.py
+"""
+Spam pre-filter for the public contact and booking forms.
+
+screen() runs after the serializer has validated a submission and before
+anything is saved or mailed. A suspect submission is stored in
+QuarantinedSubmission instead, no email is sent, and the client gets the
+same 201 response as for a real one, so bots learn nothing.
+
+The checks, cheapest first:
+
+- honeypot: a field (SPAM_HONEYPOT_FIELD) hidden from people by the form
+  and filled in by bots;
+- timing token: GET /api/form-token/ hands out a signed issue time which
+  the form sends back as ``form_token``; a form submitted sooner than
+  SPAM_MIN_FILL_SECONDS after loading, or with a forged token, scores
+  high. A missing token (old clients) is noted among the reasons but
+  scores nothing;
+- content rules: precompiled patterns for links, markup and spam words,
+  and shouting, over the free-text fields;
+- duplicates: a hash of the normalised content is added to the cache for
+  SPAM_DUPLICATE_WINDOW seconds; a second identical submission in that
+  window is quarantined. Only submissions that pass everything else are
+  recorded, so this is the only check that touches the cache.
+
+A submission is suspect when its score reaches SPAM_SCORE_THRESHOLD.
+"""
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from accounts.lockout import client_ip
+
+from .models import QuarantinedSubmission
+
+TOKEN_FIELD = 'form_token'
+
+_signer = signing.Signer(salt='app1.spam.form_token')
+
+_LINK = re.compile(r'https?://|www\.|\[url|<a\s', re.IGNORECASE)
+_MARKUP = re.compile(r'<\s*/?\s*[a-z][^>]*>|\[/?(?:url|link|img|b)\b', re.IGNORECASE)
+_SPAM_WORDS = re.compile(
+    r'\b(?:viagra|cialis|casino|betting|crypto|bitcoin|forex|payday|loans?|seo|backlinks?|'
+    r'porn|escort|weight\s+loss|work\s+from\s+home|click\s+here|unsubscribe)\b',
+    re.IGNORECASE,
+)
+_WHITESPACE = re.compile(r'\s+')
+
+# Points per finding; a bad or too-fast token reaches the default threshold
+# alone, the content rules need several findings
+HONEYPOT_SCORE = 10
+BAD_TOKEN_SCORE = 6
+TOO_FAST_SCORE = 6
+EXPIRED_TOKEN_SCORE = 2
+MISSING_TOKEN_SCORE = 0
+DUPLICATE_SCORE = 10
+
+
+class Verdict:
+    __slots__ = ('score', 'reasons')
+
+    def __init__(self):
+        self.score = 0
+        self.reasons = []
+
+    def add(self, reason, points):
+        self.score += points
+        self.reasons.append(reason)
+
+    @property
+    def suspect(self):
+        return self.score >= settings.SPAM_SCORE_THRESHOLD
+
+
+def issue_token():
+    """Signed issue time, returned by the form-token view"""
+    return _signer.sign(f'{time.time():.3f}')
+
+
+def _check_token(token, verdict):
+    if not token:
+        verdict.add('no_token', MISSING_TOKEN_SCORE)
+        return
+    try:
+        age = time.time() - float(_signer.unsign(token))
+    except (signing.BadSignature, ValueError):
+        verdict.add('bad_token', BAD_TOKEN_SCORE)
+        return
+    if age < settings.SPAM_MIN_FILL_SECONDS:
+        verdict.add('too_fast', TOO_FAST_SCORE)
+    elif age > settings.SPAM_TOKEN_MAX_AGE:
+        verdict.add('expired_token', EXPIRED_TOKEN_SCORE)
+
+
+def score_text(text, verdict):
+    """Content rules over the free-text fields of a submission"""
+    links = len(_LINK.findall(text))
+    if links:
+        verdict.add('links', 1 if links == 1 else 3)
+    if _MARKUP.search(text):
+        verdict.add('markup', 3)
+    words = {match.lower() for match in _SPAM_WORDS.findall(text)}
+    if words:
+        verdict.add('spam_words', 2 * len(words))
+    letters = [char for char in text if char.isalpha()]
+    if len(letters) >= 20 and sum(char.isupper() for char in letters) > 0.7 * len(letters):
+        verdict.add('shouting', 2)
+
+
+def _fingerprint(kind, values):
+    normalised = '\x1f'.join(_WHITESPACE.sub(' ', str(value)).strip().casefold() for value in values)
+    return hashlib.sha256(f'{kind}\x1e{normalised}'.encode()).hexdigest()
+
+
+def screen(request, kind, text_fields, identity_fields, data):
+    """
+    Score a validated submission of form ``kind``. ``text_fields`` are the
+    names in ``data`` the content rules read; the duplicate hash covers
+    ``identity_fields`` as well.
+    """
+    verdict = Verdict()
+    if request.data.get(settings.SPAM_HONEYPOT_FIELD):
+        verdict.add('honeypot', HONEYPOT_SCORE)
+        return verdict
+
+    _check_token(request.data.get(TOKEN_FIELD), verdict)
+    score_text(' '.join(str(data.get(name) or '') for name in text_fields), verdict)
+    if verdict.suspect:
+        return verdict
+
+    key = f'form_dup:{kind}:{_fingerprint(kind, [data.get(name) for name in (*identity_fields, *text_fields)])}'
+    if not cache.add(key, 1, timeout=settings.SPAM_DUPLICATE_WINDOW):
+        verdict.add('duplicate', DUPLICATE_SCORE)
+    return verdict
+
+
+def quarantine(request, kind, data, verdict):
+    """Keep a suspect submission for review instead of saving and mailing it"""
+    user = request.user if request.user.is_authenticated else None
+    return QuarantinedSubmission.objects.create(
+        kind=kind,
+        payload={name: str(value) if value is not None else None for name, value in data.items()},
+        reasons=','.join(verdict.reasons),
+        score=verdict.score,
+        ip=client_ip(request) or None,
+        user=user,
+    )
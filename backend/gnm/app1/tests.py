@@ -1,3 +1,313 @@
+import datetime
+import itertools
+import statistics
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from gnm.admin import chunked_update
+from gnm.benchmark import Endpoint, EndpointBenchmarkMixin
+from gnm.parsers import ORJSONParser
+from gnm.queryplan import HotQuery, QueryPlanTestMixin
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import spam
+from .models import Booking, ContactMessage, QuarantinedSubmission
+
+User = get_user_model()
+
+
+class AdminChangelistTests(TestCase):
+    """Booking/ContactMessage/User changelists stay flat as tables grow"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'admin@example.com', 'pw123456789')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        users = User.objects.bulk_create(
+            User(username=f'u{User.objects.count()}-{i}', email=f'u{i}-{User.objects.count()}@example.com')
+            for i in range(count)
+        )
+        Booking.objects.bulk_create(
+            Booking(user=user, name='N', email=user.email, phone='1', eventType='wedding',
+                    eventDate=datetime.date(2026, 1, 1), guestCount=10)
+            for user in users
+        )
+        ContactMessage.objects.bulk_create(
+            ContactMessage(user=user, name='N', email=user.email, subject='S', message='M') for user in users
+        )
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for url in ('/admin/app1/booking/', '/admin/app1/contactmessage/', '/admin/profile/customuser/'):
+            with self.subTest(url=url):
+                self.add_rows(5)
+                small = self.changelist_queries(url)
+                self.add_rows(60)
+                self.assertEqual(self.changelist_queries(url), small)
+
+    def test_rows_select_only_displayed_columns(self):
+        self.add_rows(5)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/admin/app1/booking/')
+        rows = next(q['sql'] for q in queries if 'ORDER BY' in q['sql'] and 'FROM "app1_booking"' in q['sql'])
+        self.assertIn('"app1_booking"."eventType"', rows)
+        self.assertNotIn('"specialRequests"', rows)
+        self.assertNotIn('"venue"', rows)
+        self.assertIn('"custom_user"."username"', rows)
+        self.assertNotIn('"custom_user"."password"', rows)
+
+    def test_user_field_uses_autocomplete(self):
+        response = self.client.get('/admin/app1/booking/add/')
+        self.assertContains(response, 'admin-autocomplete')
+
+    def test_status_action_updates_every_selected_row(self):
+        self.add_rows(30)
+        response = self.client.post('/admin/app1/booking/', {
+            'action': 'mark_confirmed',
+            '_selected_action': list(Booking.objects.values_list('pk', flat=True)),
+            'select_across': '1',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Booking.objects.exclude(status='confirmed').count(), 0)
+
+    def test_chunked_update_covers_rows_leaving_the_filter(self):
+        self.add_rows(30)
+        # The filter stops matching as rows are updated; keyset chunks still visit each once
+        updated = chunked_update(Booking.objects.filter(status='pending'), size=7, status='cancelled')
+        self.assertEqual(updated, 30)
+        self.assertEqual(Booking.objects.filter(status='cancelled').count(), 30)
+
+
+def _new_booking(case, user='user'):
+    booking = Booking.objects.create(
+        user=case.accounts[user], name='Temp', email='temp@example.com', phone='1',
+        eventType='party', eventDate=datetime.date(2026, 7, 1), guestCount=20,
+    )
+    return {'url_kwargs': {'booking_id': booking.pk}}
+
+
+BOOKING_FORM = {
+    'name': 'Asha', 'email': 'asha@example.com', 'phone': '9876543210', 'eventType': 'wedding',
+    'eventDate': '2026-12-01', 'venue': 'Hall', 'guestCount': 120, 'budget': '5L', 'specialRequests': '',
+}
+CONTACT_FORM = {'name': 'Asha', 'email': 'asha@example.com', 'subject': 'Hi', 'message': 'Hello'}
+
+_submissions = itertools.count()
+
+
+def _fresh_form(form, field):
+    """Vary one field per request so repeated runs are not caught as duplicates"""
+    def prepare(case):
+        return {'data': {**form, field: f'{form[field]} {next(_submissions)}'}}
+    return prepare
+
+
+class App1EndpointBenchmark(EndpointBenchmarkMixin, TestCase):
+    urls_module = 'app1.urls'
+    endpoints = [
+        # The INSERT plus the spam filter's duplicate check in the shared cache
+        Endpoint('contact', 'post', status=201, queries=2, p95_ms=50, prepare=_fresh_form(CONTACT_FORM, 'message')),
+        Endpoint('booking', 'post', status=201, queries=2, p95_ms=50,
+                 prepare=_fresh_form(BOOKING_FORM, 'specialRequests')),
+        Endpoint('booking', 'post', status=201, queries=3, p95_ms=50, as_user='user',
+                 prepare=_fresh_form(BOOKING_FORM, 'specialRequests')),
+        Endpoint('form_token', queries=0, p95_ms=25),
+        # Auth lookup and one joined select, however many bookings the user has
+        Endpoint('user_history', as_user='user', queries=2, p95_ms=50),
+        Endpoint('user_delete_booking', 'delete', as_user='user', status=204, queries=3, p95_ms=50,
+                 prepare=_new_booking),
+        Endpoint('admin_bookings', as_user='admin', queries=2, p95_ms=500),
+        Endpoint('admin_users', as_user='admin', queries=2, p95_ms=150),
+        Endpoint('admin_update_booking', 'put', as_user='admin', queries=3, p95_ms=50,
+                 prepare=_new_booking, data={'status': 'confirmed'}),
+        Endpoint('admin_delete_booking', 'delete', as_user='admin', status=204, queries=3, p95_ms=50,
+                 prepare=_new_booking),
+    ]
+
+
+def _get_as(account, url):
+    def run(case):
+        case.client.cookies['access'] = str(AccessToken.for_user(case.accounts[account]))
+        case.assertEqual(case.client.get(url).status_code, 200)
+    return run
+
+
+def _admin_changelist(case):
+    case.client.force_login(case.accounts['admin'])
+    case.assertEqual(case.client.get('/admin/app1/booking/').status_code, 200)
+
+
+class SparseFieldsetsTests(TestCase):
+    """?fields= / ?omit= narrow both the SELECT and the booking JSON"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'admin@example.com', 'pw123456789')
+        Booking.objects.create(user=cls.admin, specialRequests='Long text', **{
+            key: value for key, value in BOOKING_FORM.items() if key != 'specialRequests'
+        })
+
+    def setUp(self):
+        self.client.cookies['access'] = str(AccessToken.for_user(self.admin))
+
+    def get(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/admin/bookings/' + query)
+        return response, queries[-1]['sql']
+
+    def test_fields_narrow_output_and_select(self):
+        response, sql = self.get('?fields=id,eventType')
+        self.assertEqual(list(response.json()[0]), ['id', 'eventType'])
+        self.assertNotIn('specialRequests', sql)
+        self.assertNotIn('JOIN', sql)
+
+    def test_related_field_keeps_its_join(self):
+        response, sql = self.get('?fields=id,user_email')
+        self.assertEqual(response.json()[0]['user_email'], 'admin@example.com')
+        self.assertIn('JOIN', sql)
+        self.assertNotIn('"custom_user"."password"', sql)
+
+    def test_omit(self):
+        response, sql = self.get('?omit=specialRequests,user_name')
+        self.assertNotIn('specialRequests', response.json()[0])
+        self.assertNotIn('user_name', response.json()[0])
+        self.assertNotIn('specialRequests', sql)
+
+    def test_no_parameters_keep_every_field(self):
+        response, _ = self.get('')
+        self.assertEqual(response.json()[0]['specialRequests'], 'Long text')
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/admin/bookings/?fields=id,nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nope', response.json()['fields'][0])
+
+
+class App1QueryPlans(QueryPlanTestMixin, TestCase):
+    hot_queries = [
+        HotQuery('booking_history', _get_as('user', '/api/bookings/history/'), Booking._meta.db_table),
+        HotQuery('admin_bookings', _get_as('admin', '/api/admin/bookings/'), Booking._meta.db_table),
+        # The page of rows, not the count or date-hierarchy queries
+        HotQuery(
+            'admin_booking_changelist', _admin_changelist, Booking._meta.db_table, contains=('ORDER BY', 'LIMIT'),
+        ),
+    ]
+
+
+class SpamFilterTests(TestCase):
+    """Suspect form submissions are quarantined before any INSERT or email"""
+
+    def setUp(self):
+        cache.clear()
+
+    def token(self, age):
+        with mock.patch('app1.spam.time.time', return_value=time.time() - age):
+            return self.client.get('/api/form-token/').json()['token']
+
+    def post_contact(self, **fields):
+        return self.client.post('/api/contact/', {**CONTACT_FORM, **fields}, content_type='application/json')
+
+    def assert_quarantined(self, response, reason):
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ContactMessage.objects.count(), 0)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertIn(reason, QuarantinedSubmission.objects.get().reasons.split(','))
+
+    def test_clean_submission_is_saved_and_mailed(self):
+        response = self.post_contact(form_token=self.token(age=30), message='Do you cover weddings in Pune?')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(QuarantinedSubmission.objects.exists())
+
+    def test_missing_token_alone_is_not_enough(self):
+        self.assertEqual(self.post_contact().status_code, 201)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+    def test_plausible_message_is_not_quarantined(self):
+        # Old client without a token, two spam words and a link: 0 + 4 + 1 points
+        response = self.post_contact(
+            subject='Free quote for a casino night?',
+            message='We saw your offer of a free consultation. Can you do a casino and betting themed '
+                    'party at our venue? Details: https://venue.example/events',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+        self.assertFalse(QuarantinedSubmission.objects.exists())
+
+    def test_honeypot(self):
+        self.assert_quarantined(self.post_contact(website='http://example.com'), 'honeypot')
+
+    def test_submitted_too_fast(self):
+        self.assert_quarantined(self.post_contact(form_token=self.token(age=0)), 'too_fast')
+
+    def test_forged_token(self):
+        self.assert_quarantined(self.post_contact(form_token='1700000000.000:forged'), 'bad_token')
+
+    def test_duplicate_within_window(self):
+        self.post_contact(form_token=self.token(age=30))
+        mail.outbox.clear()
+        ContactMessage.objects.all().delete()
+        # Same content with different whitespace and case
+        self.assert_quarantined(self.post_contact(message='  HELLO '), 'duplicate')
+
+    def test_spammy_content(self):
+        response = self.post_contact(
+            form_token=self.token(age=30), subject='Cheap SEO backlinks',
+            message='Click here: <a href="http://spam.example">http://spam.example</a> www.spam.example',
+        )
+        self.assert_quarantined(response, 'spam_words')
+        self.assertEqual(QuarantinedSubmission.objects.get().payload['subject'], 'Cheap SEO backlinks')
+
+    def test_booking_is_screened(self):
+        response = self.client.post('/api/booking/', {**BOOKING_FORM, 'website': 'x'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Booking.objects.count(), 0)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QuarantinedSubmission.objects.get().kind, 'booking')
+
+    def test_quarantined_response_looks_accepted(self):
+        def shape(response):
+            return {key: type(value) for key, value in response.json().items()}
+
+        for url, form in (('/api/contact/', CONTACT_FORM), ('/api/booking/', BOOKING_FORM)):
+            with self.subTest(url=url):
+                cache.clear()
+                accepted = self.client.post(url, form, content_type='application/json')
+                quarantined = self.client.post(url, {**form, 'website': 'x'}, content_type='application/json')
+                self.assertEqual(quarantined.status_code, accepted.status_code)
+                self.assertEqual(shape(quarantined), shape(accepted))
+                self.assertGreater(quarantined.json()['id'], accepted.json()['id'])
 
-# Create your tests here.
+    def test_clean_submission_costs_under_a_millisecond(self):
+        factory = APIRequestFactory()
+        token = self.token(age=30)
+        timings = []
+        for i in range(200):
+            data = {**CONTACT_FORM, 'message': f'We would like a quote for a wedding, guest list {i}.'}
+            request = Request(
+                factory.post('/api/contact/', {**data, 'form_token': token}, format='json'), parsers=[ORJSONParser()]
+            )
+            request.data  # parsed before the view's serializer runs, not by the filter
+            start = time.perf_counter()
+            verdict = spam.screen(request, 'contact', ('subject', 'message'), ('email',), data)
+            timings.append(time.perf_counter() - start)
+            self.assertFalse(verdict.suspect, verdict.reasons)
+        self.assertLess(statistics.median(timings), 0.001)
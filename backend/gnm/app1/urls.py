@@ -7,13 +7,15 @@ from .views import (
     admin_update_booking,
     admin_delete_booking,
     admin_all_users,
-    user_delete_booking
+    user_delete_booking,
+    form_token,
 )
 
 urlpatterns = [
     # Public endpoints
     path('contact/', contact_message, name='contact'),
     path('booking/', booking_request, name='booking'),
+    path('form-token/', form_token, name='form_token'),
     
     # User endpoints (authenticated users only)
     path('bookings/history/', user_booking_history, name='user_history'),
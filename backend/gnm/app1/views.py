@@ -2,14 +2,18 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated,IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from django.core.mail import EmailMessage
 from django.conf import settings
+from django.utils import timezone
 from .serializers import ContactMessageSerializer, BookingSerializer
 from rest_framework.permissions import AllowAny
 from django.contrib.auth.models import AnonymousUser
 from .models import Booking
+from . import spam
 from django.contrib.auth.models import User
 from profile.serializers import UserSerializer
+from gnm.routers import use_replica
 import logging
 from django.contrib.auth import get_user_model
 
@@ -20,6 +24,7 @@ User = get_user_model()
 logger = logging.getLogger(__name__)
 
 # Admin: Get all users with their booking stats
+@use_replica()
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def admin_all_users(request):
@@ -30,25 +35,58 @@ def admin_all_users(request):
     try:
         users = User.objects.all().order_by('-date_joined')
         
-        # Use the UserSerializer to get complete profile data
-        serializer = UserSerializer(users, many=True, context={'request': request})
+        # Complete profile data, or the ?fields= / ?omit= subset of it
+        serializer = UserSerializer.for_request(users, request, context={'request': request})
         
-        logger.info(f"Admin fetched {users.count()} users")
+        data = serializer.data
+        logger.debug("Admin fetched %s users", len(data))
         
-        return Response(serializer.data)
+        return Response(data)
+    except ValidationError:
+        # Unknown names in ?fields= / ?omit=
+        raise
     except Exception as e:
-        logger.exception(f"Error fetching users for admin: {str(e)}")
+        logger.exception("Error fetching users for admin: %s", e)
         return Response(
             {'detail': 'Failed to fetch users'},
             status=500
         ) 
 
+# Timing token for the public forms (see app1/spam.py)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def form_token(request):
+    response = Response({'token': spam.issue_token()})
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def _quarantined(request, kind, serializer, verdict):
+    """Hold a suspect submission back and answer as if it had been accepted"""
+    spam.quarantine(request, kind, serializer.validated_data, verdict)
+    logger.info("Quarantined %s submission", kind, extra={'reasons': verdict.reasons, 'score': verdict.score})
+    model = serializer.Meta.model
+    instance = model(**serializer.validated_data)
+    if request.user.is_authenticated:
+        instance.user = request.user
+    # What a save would have filled in: the next id and the timestamps
+    instance.pk = (model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+    now = timezone.now()
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            setattr(instance, field.attname, now)
+    return Response(type(serializer)(instance).data, status=status.HTTP_201_CREATED)
+
+
 # Contact form submission - ALLOWS GUEST USERS
 @api_view(['POST'])
 @permission_classes([AllowAny]) 
 def contact_message(request):
     serializer = ContactMessageSerializer(data=request.data)
     if serializer.is_valid():
+        verdict = spam.screen(request, 'contact', ('subject', 'message'), ('email',), serializer.validated_data)
+        if verdict.suspect:
+            return _quarantined(request, 'contact', serializer, verdict)
 
         # ✅ Only attach user if authenticated
         if isinstance(request.user, AnonymousUser):
@@ -89,6 +127,12 @@ Message: {serializer.data['message']}
 def booking_request(request):
     serializer = BookingSerializer(data=request.data)
     if serializer.is_valid():
+        verdict = spam.screen(
+            request, 'booking', ('venue', 'specialRequests'), ('email', 'eventType', 'eventDate'),
+            serializer.validated_data,
+        )
+        if verdict.suspect:
+            return _quarantined(request, 'booking', serializer, verdict)
         # ✅ Only attach user if authenticated
         if isinstance(request.user, AnonymousUser):
             serializer.save()
@@ -128,19 +172,22 @@ Special Requests: {serializer.data['specialRequests']}
 
 
 # Get current user's booking history
+@use_replica()
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_booking_history(request):
-    bookings = Booking.objects.filter(user=request.user).order_by('-created_at')
-    serializer = BookingSerializer(bookings, many=True)
+    # BookingSerializer reads user.email/username for every row
+    bookings = Booking.objects.filter(user=request.user).select_related('user').order_by('-created_at')
+    serializer = BookingSerializer.for_request(bookings, request)
     return Response(serializer.data)
 
 # Admin: Get all bookings
+@use_replica()
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def admin_all_bookings(request):
     bookings = Booking.objects.all().select_related('user').order_by('-created_at')
-    serializer = BookingSerializer(bookings, many=True)
+    serializer = BookingSerializer.for_request(bookings, request)
     return Response(serializer.data)
 
 # Admin: Update booking
@@ -148,7 +195,7 @@ def admin_all_bookings(request):
 @permission_classes([IsAdminUser])
 def admin_update_booking(request, booking_id):
     try:
-        booking = Booking.objects.get(id=booking_id)
+        booking = Booking.objects.select_related('user').get(id=booking_id)
     except Booking.DoesNotExist:
         return Response({'error': 'Booking not found'}, status=status.HTTP_404_NOT_FOUND)
     
@@ -0,0 +1,145 @@
+# gnm/admin.py
+"""
+Admin helpers for large tables.
+
+EstimatedCountPaginator keeps changelists from running COUNT(*) over the
+whole table on every page load, ListDisplayColumnsMixin has them select
+only the columns they display, and chunked_update / chunked_delete keep
+bulk actions on "select all" from loading or locking every row at once.
+"""
+import logging
+
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
+
+from .nplusone import allow_repeated_queries
+
+logger = logging.getLogger(__name__)
+
+ACTION_CHUNK_SIZE = 1000
+
+
+def estimated_row_count(model, using='default'):
+    """
+    Row count of a model's table from the database statistics, or None
+    where the backend keeps none (SQLite)
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'mysql':
+        sql = (
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+        )
+    elif connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids exact counts on large tables.
+
+    Unfiltered lists use the table statistics once they are past
+    ``exact_count_limit`` rows. Filtered lists count at most
+    ``exact_count_limit`` matches, so the count query stops early instead
+    of scanning the rest of the table.
+    """
+
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.exact_count_limit:
+                return estimate
+        return queryset.order_by()[:self.exact_count_limit].count()
+
+
+class ListDisplayChangeList(ChangeList):
+    """ChangeList whose page of rows loads only the list_display columns"""
+
+    def get_results(self, request):
+        columns = self.model_admin.list_display_columns(request)
+        if columns is not None:
+            self.queryset = self.queryset.only(*columns)
+        super().get_results(request)
+
+
+class ListDisplayColumnsMixin:
+    """
+    ModelAdmin mixin: the changelist selects the primary key and the
+    list_display fields instead of every column. A foreign key loads the
+    whole related row unless ``list_display_related`` names the columns
+    its __str__ reads, e.g. {'user': ('username',)}. A list_display entry
+    that is not a model field (a method, __str__) leaves the SELECT as it
+    is. Actions and the other admin views see the full queryset.
+    """
+
+    list_display_related = {}
+
+    def list_display_columns(self, request):
+        opts = self.model._meta
+        columns = [opts.pk.name]
+        for name in self.get_list_display(request):
+            try:
+                field = opts.get_field(name) if isinstance(name, str) else None
+            except FieldDoesNotExist:
+                field = None
+            if field is None or not field.concrete:
+                return None
+            related = self.list_display_related.get(field.name)
+            if related:
+                columns.extend(f'{field.name}__{column}' for column in related)
+            else:
+                columns.append(field.name)
+        return columns
+
+    def get_changelist(self, request, **kwargs):
+        return ListDisplayChangeList
+
+
+def _pk_chunks(queryset, size):
+    """Primary keys of queryset in ascending chunks, fetched by keyset so each query is a range scan"""
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        chunk = list(page[:size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def chunked_update(queryset, size=ACTION_CHUNK_SIZE, **values):
+    """UPDATE in primary-key chunks, one short transaction each; returns rows updated"""
+    manager = queryset.model._base_manager.using(queryset.db)
+    updated = 0
+    with allow_repeated_queries():
+        for chunk in _pk_chunks(queryset, size):
+            with transaction.atomic(using=queryset.db):
+                updated += manager.filter(pk__in=chunk).update(**values)
+    return updated
+
+
+def chunked_delete(queryset, size=ACTION_CHUNK_SIZE):
+    """DELETE in primary-key chunks, one short transaction each; returns rows deleted"""
+    model = queryset.model
+    manager = model._base_manager.using(queryset.db)
+    deleted = 0
+    with allow_repeated_queries():
+        for chunk in _pk_chunks(queryset, size):
+            with transaction.atomic(using=queryset.db):
+                deleted += manager.filter(pk__in=chunk).delete()[1].get(model._meta.label, 0)
+    return deleted
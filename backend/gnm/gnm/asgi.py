@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gnm.settings')
 
 application = get_asgi_application()
+
+# Build lazily initialized state before gunicorn/uvicorn fork workers
+from gnm.warmup import warm_up  # noqa: E402
+
+warm_up()
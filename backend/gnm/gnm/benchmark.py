@@ -0,0 +1,193 @@
+# gnm/benchmark.py
+"""
+Endpoint benchmark harness with query and latency budgets.
+
+Each app's tests.py declares its endpoints in an EndpointBenchmarkMixin
+test case. Every endpoint runs against a seeded database; the exact query
+count and the p50/p95/p99 latency of each one are recorded and compared
+with its budget, and the test fails if an endpoint exceeds either one or
+if a named URL of the app has no endpoint declared.
+
+    python manage.py test --settings=gnm.settings_test
+
+BENCHMARK_ITERATIONS sets the requests per endpoint (default 20), and
+BENCHMARK_LATENCY_SCALE multiplies every latency budget for slow machines.
+"""
+import datetime
+import json
+import os
+import statistics
+import time
+from importlib import import_module
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from app1.models import Booking, ContactMessage
+
+User = get_user_model()
+
+SEED_PASSWORD = 'benchmark-pass-123'
+
+
+def seed(users=200, bookings_per_user=5, messages=300):
+    """
+    Create a realistic amount of data with bulk inserts.
+
+    Returns the accounts the endpoints run as: 'user' (has bookings),
+    'admin' (staff and superuser) and 'reset' (used by password reset).
+    """
+    password = make_password(SEED_PASSWORD)
+    created = User.objects.bulk_create(
+        User(
+            username=f'bench{i}', email=f'bench{i}@example.com', password=password,
+            first_name='Bench', last_name=str(i), location='Pune', bio='Seeded account',
+        )
+        for i in range(users)
+    )
+    accounts = {
+        'user': created[0],
+        'reset': created[1],
+        'admin': User.objects.create_superuser('benchadmin', 'benchadmin@example.com', SEED_PASSWORD),
+    }
+
+    event_date = datetime.date(2026, 6, 1)
+    Booking.objects.bulk_create(
+        Booking(
+            user=user, name=user.get_full_name(), email=user.email, phone='9876543210',
+            eventType='wedding', eventDate=event_date + datetime.timedelta(days=i),
+            venue='Hall', guestCount=150, budget='5L', specialRequests='None',
+        )
+        for user in created
+        for i in range(bookings_per_user)
+    )
+    ContactMessage.objects.bulk_create(
+        ContactMessage(
+            user=created[i % users] if i % 2 else None, name='Visitor', email=f'visitor{i}@example.com',
+            subject='Enquiry', message='Do you cover corporate events?',
+        )
+        for i in range(messages)
+    )
+    return accounts
+
+
+class Endpoint:
+    """
+    One benchmarked request.
+
+    ``as_user`` names a seeded account ('user', 'admin') or None for
+    anonymous requests. ``prepare(case)``, if given, runs untimed before
+    every request and may return 'url_kwargs', 'data' or 'cookies' to use
+    for it, e.g. a fresh row to delete.
+    """
+
+    def __init__(self, url_name, method='get', *, queries, p95_ms, as_user=None, data=None,
+                 url_kwargs=None, status=200, prepare=None):
+        self.url_name = url_name
+        self.method = method
+        self.queries = queries
+        self.p95_ms = p95_ms
+        self.as_user = as_user
+        self.data = data
+        self.url_kwargs = url_kwargs or {}
+        self.status = status
+        self.prepare = prepare
+
+    def __str__(self):
+        return f"{self.method.upper()} {self.url_name}"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class EndpointBenchmarkMixin:
+    """
+    Mixed into a django.test.TestCase. Subclasses set ``urls_module`` and
+    ``endpoints``; data comes from seed() once per class.
+    """
+
+    urls_module = None
+    endpoints = ()
+    iterations = int(os.getenv('BENCHMARK_ITERATIONS', '20'))
+    latency_scale = float(os.getenv('BENCHMARK_LATENCY_SCALE', '1'))
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.accounts = seed()
+
+    def setUp(self):
+        super().setUp()
+        # Lockout counters and cached documents must not leak between runs
+        cache.clear()
+
+    def _request(self, endpoint, overrides):
+        self.client.cookies.clear()
+        if endpoint.as_user:
+            self.client.cookies['access'] = str(AccessToken.for_user(self.accounts[endpoint.as_user]))
+        for name, value in overrides.get('cookies', {}).items():
+            self.client.cookies[name] = value
+
+        url = reverse(endpoint.url_name, kwargs=overrides.get('url_kwargs', endpoint.url_kwargs))
+        data = overrides.get('data', endpoint.data)
+        if endpoint.method == 'get':
+            return self.client.get(url, data)
+        body = json.dumps(data) if data is not None else ''
+        return self.client.generic(endpoint.method.upper(), url, body, content_type='application/json')
+
+    def measure(self, endpoint):
+        """Run endpoint.iterations times after a warm-up; return (timings in ms, query counts)"""
+        timings, query_counts = [], []
+        for i in range(self.iterations + 1):
+            overrides = endpoint.prepare(self) if endpoint.prepare else {}
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self._request(endpoint, overrides)
+                elapsed = (time.perf_counter() - start) * 1000
+            self.assertEqual(
+                response.status_code, endpoint.status,
+                f"{endpoint} returned {response.status_code}: {response.content[:300]!r}"
+            )
+            if i:
+                timings.append(elapsed)
+                query_counts.append(len(queries))
+        return sorted(timings), query_counts
+
+    def test_every_url_is_benchmarked(self):
+        module = import_module(self.urls_module)
+        prefix = f"{module.app_name}:" if getattr(module, 'app_name', None) else ''
+        named = {prefix + p.name for p in module.urlpatterns if isinstance(p, URLPattern) and p.name}
+        missing = named - {endpoint.url_name for endpoint in self.endpoints}
+        self.assertFalse(missing, f"No benchmark declared for: {sorted(missing)}")
+
+    def test_endpoints_within_budget(self):
+        rows = []
+        for endpoint in self.endpoints:
+            with self.subTest(endpoint=str(endpoint)):
+                timings, query_counts = self.measure(endpoint)
+                p50, p95, p99 = (percentile(timings, p) for p in (50, 95, 99))
+                rows.append((str(endpoint), max(query_counts), endpoint.queries, p50, p95, p99, endpoint.p95_ms))
+                self.assertLessEqual(
+                    max(query_counts), endpoint.queries,
+                    f"{endpoint} ran {max(query_counts)} queries, budget is {endpoint.queries}"
+                )
+                self.assertLessEqual(
+                    p95, endpoint.p95_ms * self.latency_scale,
+                    f"{endpoint} p95 is {p95:.2f} ms, budget is {endpoint.p95_ms} ms"
+                )
+
+        print(f"\n{type(self).__name__} ({self.iterations} requests per endpoint)")
+        print(f"  {'endpoint':<48} {'queries':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'budget':>8}")
+        for name, queries, query_budget, p50, p95, p99, p95_budget in rows:
+            print(
+                f"  {name:<48} {queries:>4}/{query_budget:<4} "
+                f"{p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {p95_budget:>8}"
+            )
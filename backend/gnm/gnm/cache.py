@@ -0,0 +1,349 @@
+# gnm/cache.py
+"""
+Two-tier cache: a bounded in-process LRU (L1) in front of Django's
+database cache (L2), which every worker and host shares and which
+survives restarts.
+
+    'BACKEND': 'gnm.cache.TwoTierCache',
+    'LOCATION': 'gnm_cache',          # L2 table (manage.py createcachetable)
+    'OPTIONS': {'L1_MAX_ENTRIES': 1000, 'L1_TIMEOUT': 5, 'L1_EXCLUDE_PREFIXES': (...)}
+
+L1 is not invalidated across workers, so an entry can be stale for up to
+L1_TIMEOUT seconds after another worker changes it. Keys that must be
+exact everywhere (counters, locks, revocation lists, one-time codes) are
+listed in L1_EXCLUDE_PREFIXES; they always go to L2 and are never culled
+from it before they expire.
+
+L2 is SharedDatabaseCache: set() and add() are one statement in the
+common case rather than DatabaseCache's COUNT(*), SELECT and write, the
+table is culled at most every CULL_INTERVAL seconds per process, and
+incr() locks the row, so concurrent increments are never lost.
+
+get_or_set() is single-flight: one caller per key computes the value,
+threads of the same process wait on a lock, other processes on a short
+L2 lock entry. Lookups are counted in gnm.metrics by the tier that
+answered them.
+"""
+import base64
+import pickle
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DatabaseError, connections, router, transaction
+from django.utils.timezone import now as tz_now
+
+from .metrics import store
+from .nplusone import allow_repeated_queries
+from .timing import TimedCacheMixin
+
+_MISSING = object()
+
+# Striped locks for single-flight recomputation within this process
+_flight_locks = [threading.Lock() for _ in range(64)]
+
+
+def _flight_lock(key):
+    return _flight_locks[hash(key) % len(_flight_locks)]
+
+
+class SharedDatabaseCache(DatabaseCache):
+    """DatabaseCache with cheap writes, periodic culling and an atomic incr()"""
+
+    def __init__(self, table, params):
+        super().__init__(table, params)
+        options = params.get('OPTIONS', {})
+        self.cull_interval = options.get('CULL_INTERVAL', 60)
+        self.cull_exclude = tuple(options.get('CULL_EXCLUDE_PREFIXES', ()))
+        self._next_cull = 0
+
+    def _sql(self, db):
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        return connection, quote_name(self._table), quote_name('cache_key'), quote_name('value'), quote_name('expires')
+
+    def _now(self, connection):
+        # As DatabaseCache.has_key compares expiry dates
+        return connection.ops.adapt_datetimefield_value(tz_now().replace(microsecond=0, tzinfo=None))
+
+    def _encode(self, value):
+        return base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1')
+
+    def _expiry(self, connection, timeout):
+        if timeout is None:
+            exp = datetime.max
+        else:
+            exp = datetime.fromtimestamp(timeout, tz=timezone.utc if settings.USE_TZ else None)
+        return connection.ops.adapt_datetimefield_value(exp.replace(microsecond=0))
+
+    def _insert_sql(self, connection, on_conflict):
+        """INSERT of one entry that on a duplicate key does nothing, or updates it with ``on_conflict``"""
+        _, table, cache_key, value_col, expires = self._sql(connection.alias)
+        insert = f"INTO {table} ({cache_key}, {value_col}, {expires}) VALUES (%s, %s, %s)"
+        if connection.vendor == 'mysql':
+            if on_conflict:
+                return f"INSERT {insert} ON DUPLICATE KEY UPDATE {value_col} = VALUES({value_col}), " \
+                       f"{expires} = VALUES({expires})"
+            return f"INSERT IGNORE {insert}"
+        if on_conflict:
+            return f"INSERT {insert} ON CONFLICT ({cache_key}) DO UPDATE SET " \
+                   f"{value_col} = excluded.{value_col}, {expires} = excluded.{expires}"
+        return f"INSERT {insert} ON CONFLICT ({cache_key}) DO NOTHING"
+
+    def _base_set(self, mode, key, value, timeout=DEFAULT_TIMEOUT):
+        db = router.db_for_write(self.cache_model_class)
+        connection, table, cache_key, value_col, expires = self._sql(db)
+        if connection.vendor not in ('mysql', 'sqlite', 'postgresql'):
+            return super()._base_set(mode, key, value, timeout)
+        exp = self._expiry(connection, self.get_backend_timeout(timeout))
+        try:
+            with connection.cursor() as cursor:
+                self._maybe_cull(db, cursor)
+                if mode == 'touch':
+                    cursor.execute(f"UPDATE {table} SET {expires} = %s WHERE {cache_key} = %s", [exp, key])
+                    return cursor.rowcount > 0
+                encoded = self._encode(value)
+                cursor.execute(self._insert_sql(connection, on_conflict=mode == 'set'), [key, encoded, exp])
+                if mode == 'set' or cursor.rowcount:
+                    return True
+                # add() on an existing key takes it over only once it has expired
+                cursor.execute(
+                    f"UPDATE {table} SET {value_col} = %s, {expires} = %s WHERE {cache_key} = %s AND {expires} < %s",
+                    [encoded, exp, key, self._now(connection)],
+                )
+                return cursor.rowcount > 0
+        except DatabaseError:
+            # As in DatabaseCache, writes may fail silently under contention
+            return False
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = router.db_for_write(self.cache_model_class)
+        connection, table, cache_key, value_col, expires = self._sql(db)
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            if connection.features.has_select_for_update:
+                lock = ' FOR UPDATE'
+            else:
+                # No row locks (SQLite): take the database write lock before reading
+                cursor.execute(f"UPDATE {table} SET {expires} = {expires} WHERE {cache_key} = %s", [key])
+                lock = ''
+            cursor.execute(
+                f"SELECT {value_col} FROM {table} WHERE {cache_key} = %s AND {expires} > %s{lock}",
+                [key, self._now(connection)],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found." % key)
+            value = pickle.loads(base64.b64decode(connection.ops.process_clob(row[0]).encode())) + delta
+            cursor.execute(f"UPDATE {table} SET {value_col} = %s WHERE {cache_key} = %s", [self._encode(value), key])
+        return value
+
+    def clear(self):
+        super().clear()
+        # Nothing to cull in an empty table
+        self._next_cull = time.monotonic() + self.cull_interval
+
+    def _maybe_cull(self, db, cursor):
+        if time.monotonic() < self._next_cull:
+            return
+        self._next_cull = time.monotonic() + self.cull_interval
+        connection, table, *_ = self._sql(db)
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        num = cursor.fetchone()[0]
+        if num > self._max_entries:
+            self._cull(db, cursor, tz_now(), num)
+
+    def _cull(self, db, cursor, now, num):
+        connection, table, cache_key, _, expires = self._sql(db)
+        cursor.execute(f"DELETE FROM {table} WHERE {expires} < %s", [self._now(connection)])
+        remaining = num - cursor.rowcount
+        if remaining <= self._max_entries or not self._cull_frequency:
+            return
+        # Then the first 1/CULL_FREQUENCY of the other keys, sparing the
+        # excluded prefixes, which only go once they have expired
+        starts_with = connection.operators['startswith'] % '%s'
+        spared = ''.join(f" AND NOT ({cache_key} {starts_with})" for _ in self.cull_exclude)
+        patterns = [
+            connection.ops.prep_for_like_query(self.make_key(prefix)) + '%' for prefix in self.cull_exclude
+        ]
+        cursor.execute(
+            f"SELECT {cache_key} FROM {table} WHERE 1 = 1{spared} ORDER BY {cache_key} LIMIT 1 OFFSET %s",
+            [*patterns, remaining // self._cull_frequency],
+        )
+        last = cursor.fetchone()
+        if last:
+            cursor.execute(f"DELETE FROM {table} WHERE {cache_key} < %s{spared}", [last[0], *patterns])
+
+
+class TwoTierCacheBase(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.name = location
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.l1_exclude = tuple(options.get('L1_EXCLUDE_PREFIXES', ()))
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        shared = {
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+            'VERSION': params.get('VERSION', 1),
+            'KEY_FUNCTION': params.get('KEY_FUNCTION'),
+        }
+        self.l1 = LocMemCache(options.get('L1_NAME', f'l1:{location}'), {
+            **shared,
+            'TIMEOUT': self.l1_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000)},
+        })
+        self.l2 = SharedDatabaseCache(location, {
+            **shared,
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'OPTIONS': {
+                **{key: value for key, value in options.items()
+                   if key in ('MAX_ENTRIES', 'CULL_FREQUENCY', 'CULL_INTERVAL')},
+                'CULL_EXCLUDE_PREFIXES': self.l1_exclude,
+            },
+        })
+
+    def _in_l1(self, key):
+        return not key.startswith(self.l1_exclude)
+
+    def _l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return self.l1_timeout if timeout is None else min(timeout, self.l1_timeout)
+
+    def _count(self, result, amount=1):
+        if amount:
+            store.inc('gnm_cache_lookups_total', {'cache': self.name, 'result': result}, amount)
+
+    # L2 lookups are one query per call by design, not an N+1
+    def _l2(self, name, *args, **kwargs):
+        with allow_repeated_queries():
+            return getattr(self.l2, name)(*args, **kwargs)
+
+    def get(self, key, default=None, version=None):
+        if self._in_l1(key):
+            value = self.l1.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                self._count('l1_hit')
+                return value
+        value = self._l2('get', key, _MISSING, version=version)
+        if value is _MISSING:
+            self._count('miss')
+            return default
+        self._count('l2_hit')
+        if self._in_l1(key):
+            self.l1.set(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self.l1.get(key, _MISSING, version=version) if self._in_l1(key) else _MISSING
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        self._count('l1_hit', len(found))
+        if remaining:
+            from_l2 = self._l2('get_many', remaining, version=version)
+            self._count('l2_hit', len(from_l2))
+            self._count('miss', len(remaining) - len(from_l2))
+            self.l1.set_many(
+                {key: value for key, value in from_l2.items() if self._in_l1(key)}, version=version
+            )
+            found.update(from_l2)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l2('set', key, value, timeout=timeout, version=version)
+        if self._in_l1(key):
+            self.l1.set(key, value, timeout=self._l1_timeout(timeout), version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._l2('add', key, value, timeout=timeout, version=version)
+        if added and self._in_l1(key):
+            self.l1.set(key, value, timeout=self._l1_timeout(timeout), version=version)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._l2('set_many', data, timeout=timeout, version=version)
+        self.l1.set_many(
+            {key: value for key, value in data.items() if self._in_l1(key) and key not in failed},
+            timeout=self._l1_timeout(timeout), version=version,
+        )
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.delete(key, version=version)
+        return self._l2('touch', key, timeout=timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.l1.delete(key, version=version)
+        return self._l2('incr', key, delta, version=version)
+
+    def delete(self, key, version=None):
+        self.l1.delete(key, version=version)
+        return self._l2('delete', key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.l1.delete_many(keys, version=version)
+        self._l2('delete_many', keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._in_l1(key) and self.l1.has_key(key, version=version):
+            return True
+        return self._l2('has_key', key, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        self._l2('clear')
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Return the cached value, computing it with ``default`` (a value or a
+        callable) on a miss. Concurrent misses on one key compute it once.
+        """
+        value = self.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+
+        with _flight_lock(self.make_and_validate_key(key, version=version)):
+            # Another thread of this process may have filled it meanwhile
+            value = self.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                store.inc('gnm_cache_single_flight_total', {'cache': self.name, 'result': 'waited'})
+                return value
+
+            lock_key = f'{key}:lock'
+            locked = self._l2('add', lock_key, 1, timeout=self.lock_timeout, version=version)
+            if not locked:
+                # Another process is computing it; wait for its result
+                deadline = time.monotonic() + self.lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    value = self._l2('get', key, _MISSING, version=version)
+                    if value is not _MISSING:
+                        store.inc('gnm_cache_single_flight_total', {'cache': self.name, 'result': 'waited'})
+                        if self._in_l1(key):
+                            self.l1.set(key, value, version=version)
+                        return value
+            try:
+                value = default() if callable(default) else default
+                store.inc('gnm_cache_single_flight_total', {'cache': self.name, 'result': 'computed'})
+                self.set(key, value, timeout=timeout, version=version)
+            finally:
+                if locked:
+                    self._l2('delete', lock_key, version=version)
+        return value
+
+
+class TwoTierCache(TimedCacheMixin, TwoTierCacheBase):
+    def _l2(self, *args, **kwargs):
+        # get_or_set() is not timed as a whole, since computing the value is
+        # not cache time, but its own L2 calls are
+        return self._call('_l2', *args, **kwargs)
@@ -0,0 +1,79 @@
+# gnm/compression.py
+"""
+Response compression for the JSON API.
+
+Responses under /api/ of at least API_COMPRESSION_MIN_SIZE bytes are
+compressed with the best encoding the client accepts: brotli when the
+optional ``brotli`` package is installed, else gzip. Small bodies (the
+CSRF token, login results) are left alone: compressing them saves
+little and would expose their secrets to BREACH-style length probing.
+"""
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_ACCEPT_ENCODING = _lazy_re_compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*(?:,|$)')
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for coding, q in _ACCEPT_ENCODING.findall(header or ''):
+        try:
+            accepted[coding.lower()] = float(q) if q else 1.0
+        except ValueError:
+            continue
+    return accepted
+
+
+def choose_encoding(header):
+    """'br', 'gzip' or None for an Accept-Encoding header"""
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get('*', 0)
+    for coding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def compress(content, coding):
+    if coding == 'br':
+        return brotli.compress(content, quality=settings.API_COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=settings.API_COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class APICompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path.startswith('/api/') or response.streaming:
+            return response
+
+        # The body varies with Accept-Encoding whether or not this one is compressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.has_header('Content-Encoding') or len(response.content) < settings.API_COMPRESSION_MIN_SIZE:
+            return response
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if coding is None:
+            return response
+
+        compressed = compress(response.content, coding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = coding
+        # The encoded body is no longer byte-identical to the strong ETag's
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
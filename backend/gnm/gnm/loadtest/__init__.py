@@ -0,0 +1,12 @@
+# gnm/loadtest/__init__.py
+"""
+End-to-end load test: scripted user journeys against a running server.
+
+    python manage.py loadtest --settings=gnm.settings_loadtest --users 1,5,10,20
+
+The loadtest command starts an SMTP sink and a Google OAuth stub
+(stubs.py), then a local server with gnm.settings_loadtest pointed at
+them. Virtual users (runner.py) repeat the journeys in journeys.py while
+concurrency ramps through the given stages. The report gives, per stage
+and per step, throughput, p50/p95/p99 latency and error rate.
+"""
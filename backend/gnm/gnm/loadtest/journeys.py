@@ -0,0 +1,121 @@
+# gnm/loadtest/journeys.py
+"""
+Scripted user journeys. Each run() is one pass through the journey with
+a fresh cookie jar, as a new browser would make it; every request is a
+named step whose latency and outcome go to the recorder. A failed step
+ends the pass, since the steps after it depend on it.
+"""
+import itertools
+import uuid
+
+import requests
+from django.urls import reverse
+
+PASSWORD = 'loadtest-pass-123'
+
+# Unique per process, so repeated runs against one database do not collide
+_run = uuid.uuid4().hex[:8]
+_sequence = itertools.count()
+
+
+def _unique():
+    return f'{_run}-{next(_sequence)}'
+
+
+class StepFailed(Exception):
+    pass
+
+
+class Journey:
+    name = None
+
+    def __init__(self, base_url, recorder, admin=None, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        # (email, password) of a staff account, for AdminJourney
+        self.admin = admin
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def step(self, name, method, path, expect=200, check=None, **kwargs):
+        """Request ``path``; the step fails unless the status is ``expect`` and ``check(response)`` holds"""
+        start = self.recorder.clock()
+        try:
+            response = self.session.request(
+                method, self.base_url + path, allow_redirects=False, timeout=self.timeout, **kwargs
+            )
+        except requests.RequestException as e:
+            self.recorder.record(self.name, name, self.recorder.clock() - start, type(e).__name__)
+            raise StepFailed(name) from e
+        if response.status_code != expect:
+            error = str(response.status_code)
+        elif check is not None and not check(response):
+            error = f'{response.status_code} (check failed)'
+        else:
+            error = None
+        self.recorder.record(self.name, name, self.recorder.clock() - start, error)
+        if error:
+            raise StepFailed(name)
+        return response
+
+    def booking_form(self, email):
+        return {
+            'name': 'Load Test', 'email': email, 'phone': '9876543210', 'eventType': 'wedding',
+            'eventDate': '2027-01-15', 'venue': 'Hall', 'guestCount': 150, 'budget': '5L',
+            # Distinct content, so the spam filter's duplicate window does not apply
+            'specialRequests': f'Load test booking {_unique()}',
+        }
+
+    def run(self):
+        raise NotImplementedError
+
+    def close(self):
+        self.session.close()
+
+
+class UserJourney(Journey):
+    """Register, log in, view the profile, book, view the history, refresh the token"""
+    name = 'user'
+
+    def run(self):
+        email = f'user-{_unique()}@loadtest.example'
+        self.step('register', 'post', reverse('register'), expect=201, json={
+            'first_name': 'Load', 'last_name': 'Test', 'email': email, 'password': PASSWORD,
+        })
+        self.step('login', 'post', reverse('cookie_login'), json={'email': email, 'password': PASSWORD})
+        self.step('me', 'get', reverse('profile:get_current_user'))
+        self.step('booking', 'post', reverse('booking'), expect=201, json=self.booking_form(email))
+        self.step('history', 'get', reverse('user_history'))
+        self.step('refresh', 'post', reverse('token_refresh'))
+
+
+class AdminJourney(Journey):
+    """Log in as staff, list every booking, update one and delete it"""
+    name = 'admin'
+
+    def run(self):
+        email, password = self.admin
+        self.step('login', 'post', reverse('cookie_login'), json={'email': email, 'password': password})
+        # A booking of its own to update and delete, so user journeys are left alone
+        booking = self.step('booking', 'post', reverse('booking'), expect=201, json=self.booking_form(email))
+        booking_id = booking.json()['id']
+        self.step('list', 'get', reverse('admin_bookings'))
+        self.step('update', 'put', reverse('admin_update_booking', args=[booking_id]), json={'status': 'confirmed'})
+        self.step('delete', 'delete', reverse('admin_delete_booking', args=[booking_id]), expect=204)
+
+
+class GoogleJourney(Journey):
+    """Sign in through the Google callback (stubbed provider) and view the profile"""
+    name = 'google'
+
+    def run(self):
+        code = f'google-{_unique()}'
+        self.step(
+            'callback', 'get', reverse('google_callback'), expect=302, params={'code': code, 'state': 'lt'},
+            # Failures redirect too, to the frontend with auth=error
+            check=lambda response: 'auth=error' not in response.headers.get('Location', ''),
+        )
+        self.step('me', 'get', reverse('profile:get_current_user'))
+
+
+JOURNEYS = {journey.name: journey for journey in (UserJourney, AdminJourney, GoogleJourney)}
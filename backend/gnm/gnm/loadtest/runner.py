@@ -0,0 +1,143 @@
+# gnm/loadtest/runner.py
+"""
+Virtual users and the ramp.
+
+run_load() goes through ``stages``, a list of concurrency levels, each
+held for ``stage_seconds``. At the start of a stage the extra virtual
+users are started one by one over ``ramp_seconds``; users keep running
+into later stages, so concurrency only ever goes up. Each virtual user
+is a thread that repeatedly picks a journey by weight from ``mix`` and
+runs it. Steps are attributed to the stage in which they finish.
+"""
+import logging
+import random
+import threading
+import time
+
+from gnm.benchmark import percentile
+
+from .journeys import JOURNEYS, StepFailed
+
+logger = logging.getLogger(__name__)
+
+
+class Recorder:
+    """Step timings and errors, per stage, from every virtual user"""
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage = 0
+        # (stage, journey, step) -> [timings in ms], and -> {error: count}
+        self.timings = {}
+        self.errors = {}
+        self.journeys = {}
+
+    def record(self, journey, step, seconds, error=None):
+        key = (self.stage, journey, step)
+        with self._lock:
+            self.timings.setdefault(key, []).append(seconds * 1000)
+            if error:
+                errors = self.errors.setdefault(key, {})
+                errors[error] = errors.get(error, 0) + 1
+
+    def journey_finished(self, journey, ok):
+        key = (self.stage, journey)
+        with self._lock:
+            completed, failed = self.journeys.get(key, (0, 0))
+            self.journeys[key] = (completed + ok, failed + (not ok))
+
+
+def _virtual_user(number, base_url, recorder, mix, stop, think_time, admin):
+    rng = random.Random(number)
+    names, weights = zip(*mix.items())
+    while not stop.is_set():
+        journey = JOURNEYS[rng.choices(names, weights)[0]](base_url, recorder, admin=admin)
+        try:
+            journey.run()
+            recorder.journey_finished(journey.name, True)
+        except StepFailed:
+            recorder.journey_finished(journey.name, False)
+        except Exception:
+            # A bug in the journey itself; keep the user running so concurrency holds
+            logger.exception("Journey %s raised", journey.name)
+            recorder.journey_finished(journey.name, False)
+        finally:
+            journey.close()
+        if think_time:
+            stop.wait(rng.uniform(0, 2 * think_time))
+
+
+def run_load(base_url, stages, stage_seconds, mix, *, ramp_seconds=None, think_time=0, admin=None,
+             progress=None):
+    """Run the stages; returns a report as produced by summarise()"""
+    if 'admin' in mix and mix['admin'] and not admin:
+        raise ValueError("The admin journey needs admin credentials")
+    mix = {name: weight for name, weight in mix.items() if weight}
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = []
+    durations = []
+    try:
+        for index, users in enumerate(stages):
+            recorder.stage = index
+            start = time.monotonic()
+            new = max(users - len(threads), 0)
+            ramp = stage_seconds / 3 if ramp_seconds is None else ramp_seconds
+            for i in range(new):
+                thread = threading.Thread(
+                    target=_virtual_user, daemon=True,
+                    args=(len(threads), base_url, recorder, mix, stop, think_time, admin),
+                )
+                thread.start()
+                threads.append(thread)
+                if i < new - 1:
+                    time.sleep(ramp / new)
+            time.sleep(max(stage_seconds - (time.monotonic() - start), 0))
+            durations.append(time.monotonic() - start)
+            if progress:
+                progress(index, users)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return summarise(recorder, stages, durations)
+
+
+def summarise(recorder, stages, durations):
+    report = []
+    for index, (users, seconds) in enumerate(zip(stages, durations)):
+        steps = []
+        for (stage, journey, step), timings in sorted(recorder.timings.items()):
+            if stage != index:
+                continue
+            timings = sorted(timings)
+            errors = recorder.errors.get((stage, journey, step), {})
+            steps.append({
+                'journey': journey,
+                'step': step,
+                'requests': len(timings),
+                'throughput': len(timings) / seconds,
+                'p50_ms': percentile(timings, 50),
+                'p95_ms': percentile(timings, 95),
+                'p99_ms': percentile(timings, 99),
+                'error_rate': sum(errors.values()) / len(timings),
+                'errors': errors,
+            })
+        journeys = {
+            journey: {'completed': completed, 'failed': failed}
+            for (stage, journey), (completed, failed) in sorted(recorder.journeys.items())
+            if stage == index
+        }
+        requests = sum(step['requests'] for step in steps)
+        report.append({
+            'users': users,
+            'seconds': seconds,
+            'requests': requests,
+            'throughput': requests / seconds,
+            'error_rate': sum(sum(step['errors'].values()) for step in steps) / requests if requests else 0.0,
+            'journeys': journeys,
+            'steps': steps,
+        })
+    return report
@@ -0,0 +1,135 @@
+# gnm/loadtest/stubs.py
+"""
+Local stand-ins for the external services the load test must not hit.
+
+SMTPSink accepts and discards mail over plain SMTP, so the SMTP backend
+still opens a connection and sends each message. GoogleOAuthStub answers
+the code exchange and userinfo requests of CustomGoogleCallbackView; the
+authorization code becomes the user's email address, so every distinct
+code signs in a distinct user.
+"""
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class _Server:
+    """Runs a socketserver server on a background thread"""
+
+    def __init__(self, server):
+        self.server = server
+        self._thread = threading.Thread(target=server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+# ----------------------------
+# SMTP
+# ----------------------------
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 loadtest ESMTP')
+        for raw in self.rfile:
+            command = raw.decode('latin-1').strip().split(' ', 1)[0].upper()
+            if command == 'EHLO':
+                self.wfile.write(b'250-loadtest\r\n250-8BITMIME\r\n250 SIZE 10485760\r\n')
+            elif command in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                for line in self.rfile:
+                    if line in (b'.\r\n', b'.\n'):
+                        break
+                self.server.sink.received()
+                self.reply('250 OK queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(_Server):
+    def __init__(self, host='127.0.0.1', port=0):
+        server = socketserver.ThreadingTCPServer((host, port), _SMTPHandler)
+        server.daemon_threads = True
+        server.sink = self
+        super().__init__(server)
+        self._lock = threading.Lock()
+        self.messages = 0
+
+    def received(self):
+        with self._lock:
+            self.messages += 1
+
+
+# ----------------------------
+# GOOGLE OAUTH
+# ----------------------------
+class _OAuthHandler(BaseHTTPRequestHandler):
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/token':
+            return self.send_json(404, {'error': 'not_found'})
+        form = parse_qs(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode())
+        code = form.get('code', [''])[0]
+        if not code:
+            return self.send_json(400, {'error': 'invalid_grant', 'error_description': 'Missing code'})
+        self.send_json(200, {'access_token': f'stub-{code}', 'token_type': 'Bearer', 'expires_in': 3600})
+
+    def do_GET(self):
+        if self.path.rstrip('/') != '/userinfo':
+            return self.send_json(404, {'error': 'not_found'})
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not token.startswith('stub-'):
+            return self.send_json(401, {'error': 'invalid_token'})
+        self.send_json(200, {
+            'email': f"{token.removeprefix('stub-')}@loadtest.example",
+            'given_name': 'Load', 'family_name': 'Test',
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GoogleOAuthStub(_Server):
+    def __init__(self, host='127.0.0.1', port=0):
+        server = ThreadingHTTPServer((host, port), _OAuthHandler)
+        server.daemon_threads = True
+        super().__init__(server)
+
+    @property
+    def token_url(self):
+        return f'http://127.0.0.1:{self.port}/token'
+
+    @property
+    def userinfo_url(self):
+        return f'http://127.0.0.1:{self.port}/userinfo'
@@ -0,0 +1,212 @@
+# gnm/log.py
+"""
+Logging pipeline: request-scoped ids, sampling, JSON records and a
+non-blocking queue handler.
+
+Records are filtered and queued on the request thread. JSON formatting
+and the stream write happen on a QueueListener thread. The queue is
+bounded, and each request may emit at most LOG_RECORDS_PER_REQUEST
+records below WARNING. Records past either limit are dropped and counted,
+not waited on. AsyncQueueHandler.stats() and request_log_cost() report what logging
+costs the process and the current request.
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+request_id = contextvars.ContextVar('request_id', default='-')
+# [records, seconds] spent by the current request inside the log handler
+_request_cost = contextvars.ContextVar('request_log_cost', default=None)
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id',
+}
+
+
+def start_request(rid):
+    """Bind a request id and a fresh cost counter to the current context"""
+    return request_id.set(rid), _request_cost.set([0, 0.0])
+
+
+def end_request(tokens):
+    rid_token, cost_token = tokens
+    request_id.reset(rid_token)
+    _request_cost.reset(cost_token)
+
+
+def request_log_cost():
+    """(records, seconds) spent logging so far in the current request"""
+    cost = _request_cost.get()
+    return tuple(cost) if cost is not None else (0, 0.0)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        rid = request_id.get()
+        if rid == '-':
+            # django.request logs after the middleware chain has returned
+            rid = getattr(getattr(record, 'request', None), 'request_id', '-')
+        record.request_id = rid
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of low-level records, per logger.
+
+    ``rates`` maps logger names (or parent names) to the fraction of records
+    kept; the most specific name wins. Records above ``max_level`` always
+    pass, so sampling never hides warnings or errors.
+    """
+
+    def __init__(self, rates=None, max_level='DEBUG', default_rate=1.0):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+        self.default_rate = default_rate
+        self._resolved = {}
+
+    def _rate(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = self.default_rate
+            parts = name.split('.')
+            for i in range(len(parts), 0, -1):
+                prefix = '.'.join(parts[:i])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields are included as keys"""
+
+    converter = time.gmtime
+
+    def format(self, record):
+        payload = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exc_info'] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    QueueHandler that owns its listener and downstream StreamHandler.
+
+    The formatter configured for this handler is installed on the stream
+    handler, so formatting runs on the listener thread. After a fork the
+    child gets a new queue and lock and starts its own listener lazily.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.seconds = 0.0
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            # A thread of the parent may have held the lock while forking
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                if self._pid is not None:
+                    # Forked: the inherited queue holds the parent's records,
+                    # which its own listener writes, and its internal locks
+                    # may have been taken by a parent thread
+                    self.queue = queue.Queue(maxsize=self.queue.maxsize)
+                self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+                self.listener.start()
+                self._pid = os.getpid()
+
+    def stop(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+    def prepare(self, record):
+        # Bind args now, since callers may mutate them after logging returns,
+        # but leave formatting to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        start = time.perf_counter()
+        cost = _request_cost.get()
+        # Warnings and errors are never dropped by the per-request cap
+        if (cost is not None and record.levelno < logging.WARNING
+                and cost[0] >= getattr(settings, 'LOG_RECORDS_PER_REQUEST', 200)):
+            self.dropped += 1
+            return
+        try:
+            self._ensure_listener()
+            self.queue.put_nowait(self.prepare(record))
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+        elapsed = time.perf_counter() - start
+        self.seconds += elapsed
+        if cost is not None:
+            cost[0] += 1
+            cost[1] += elapsed
+
+    def stats(self):
+        return {
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'queued': self.queue.qsize(),
+            'seconds': self.seconds,
+        }
@@ -0,0 +1,58 @@
+# gnm/management/commands/bench_db_pool.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from gnm.benchmark import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare connection setup per request with and without the pool: a fresh "
+        "connection per request against the pooled backend, each running SELECT 1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        wrapper = connections[options['database']]
+        if not hasattr(wrapper, 'pool'):
+            raise CommandError(
+                f"Database {options['database']!r} does not use a pooled engine (gnm.mysql_pool)."
+            )
+        iterations = options['iterations']
+        params = wrapper.get_connection_params()
+
+        def unpooled():
+            connection = wrapper.Database.connect(**params)
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+            connection.close()
+
+        def pooled():
+            # What a request does: connect on first query, close at request_finished
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchall()
+            wrapper.close()
+
+        wrapper.close()
+        self.stdout.write(f"{iterations} requests each on {options['database']!r}")
+        self.stdout.write(f"  {'':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for label, run in (('unpooled', unpooled), ('pooled', pooled)):
+            run()  # warm-up
+            timings = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p50, p95, p99 = (percentile(timings, p) for p in (50, 95, 99))
+            self.stdout.write(f"  {label:<10} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}")
+
+        stats = ', '.join(f"{key}={value}" for key, value in wrapper.pool.stats().items())
+        self.stdout.write(self.style.SUCCESS(f"Pool: {stats}"))
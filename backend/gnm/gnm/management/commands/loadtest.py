@@ -0,0 +1,169 @@
+# gnm/management/commands/loadtest.py
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from gnm.loadtest.journeys import JOURNEYS
+from gnm.loadtest.runner import run_load
+from gnm.loadtest.stubs import GoogleOAuthStub, SMTPSink
+
+ADMIN_EMAIL = 'loadtest-admin@loadtest.example'
+ADMIN_PASSWORD = 'loadtest-admin-pass-123'
+
+
+def _parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in JOURNEYS:
+            raise CommandError(f"Unknown journey {name!r}; choose from {', '.join(JOURNEYS)}.")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Run scripted user journeys against a local server (started here, with stubbed "
+        "SMTP and Google OAuth) while ramping concurrency, and report throughput, "
+        "p50/p95/p99 latency and error rate per step."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default='1,5,10,20', help="Concurrency of each stage, comma-separated.")
+        parser.add_argument('--stage-seconds', type=float, default=30)
+        parser.add_argument('--ramp-seconds', type=float, help="Seconds to start a stage's users (a third of it).")
+        parser.add_argument('--mix', default='user=6,google=2,admin=1', help="Journey weights, e.g. user=6,admin=1.")
+        parser.add_argument('--think-time', type=float, default=0, help="Mean pause between a user's journeys.")
+        parser.add_argument(
+            '--url',
+            help="Test a server that is already running instead of starting one. Its mail and OAuth "
+                 "must already be stubbed; the admin journey needs --admin-email and --admin-password.",
+        )
+        parser.add_argument('--admin-email', default=ADMIN_EMAIL)
+        parser.add_argument('--admin-password', default=ADMIN_PASSWORD)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--server', choices=('runserver', 'gunicorn'), default='runserver',
+            help="How to start the local server; gunicorn runs --workers processes with --preload.",
+        )
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--json', dest='json_path', help="Also write the report to this file.")
+
+    def handle(self, *args, **options):
+        stages = [int(users) for users in options['users'].split(',')]
+        mix = _parse_mix(options['mix'])
+        admin = (options['admin_email'], options['admin_password'])
+
+        if options['url']:
+            report = self.run(options['url'], stages, mix, admin, options)
+            return self.write_report(report, options)
+
+        if not getattr(settings, 'LOADTEST', False):
+            raise CommandError(
+                "The local server needs the load-test settings, which this command migrates and "
+                "seeds: run it with --settings=gnm.settings_loadtest, or pass --url."
+            )
+        call_command('migrate', verbosity=0, interactive=False)
+        self.seed_admin(*admin)
+
+        with SMTPSink() as smtp, GoogleOAuthStub() as oauth:
+            env = dict(
+                os.environ,
+                DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'gnm.settings_loadtest'),
+                LOADTEST_SMTP_PORT=str(smtp.port),
+                GOOGLE_TOKEN_URL=oauth.token_url,
+                GOOGLE_USERINFO_URL=oauth.userinfo_url,
+            )
+            base_url = f"http://127.0.0.1:{options['port']}"
+            log_path = os.path.join(tempfile.gettempdir(), 'gnm-loadtest-server.log')
+            with open(log_path, 'w') as log:
+                server = subprocess.Popen(
+                    self.server_command(options), cwd=settings.BASE_DIR, env=env,
+                    stdout=log, stderr=subprocess.STDOUT,
+                )
+                try:
+                    self.wait_until_ready(server, base_url, log_path)
+                    report = self.run(base_url, stages, mix, admin, options)
+                finally:
+                    server.terminate()
+                    try:
+                        server.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        server.kill()
+            self.stdout.write(f"SMTP sink received {smtp.messages} messages; server log: {log_path}")
+        self.write_report(report, options)
+
+    def seed_admin(self, email, password):
+        User = get_user_model()
+        try:
+            user = User.objects.get_by_email(email)
+        except User.DoesNotExist:
+            user = User(username=email, email=email)
+        user.is_staff = user.is_superuser = True
+        user.set_password(password)
+        user.save()
+
+    def server_command(self, options):
+        address = f"127.0.0.1:{options['port']}"
+        if options['server'] == 'gunicorn':
+            return [
+                sys.executable, '-m', 'gunicorn', 'gnm.wsgi', '--bind', address,
+                '--workers', str(options['workers']), '--preload',
+            ]
+        return [sys.executable, 'manage.py', 'runserver', address, '--noreload']
+
+    def wait_until_ready(self, server, base_url, log_path, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"The server exited with status {server.returncode}; see {log_path}.")
+            try:
+                requests.get(base_url + reverse('form_token'), timeout=1)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise CommandError(f"The server did not start within {timeout} s; see {log_path}.")
+
+    def run(self, base_url, stages, mix, admin, options):
+        self.stdout.write(
+            f"{len(stages)} stages of {options['stage_seconds']:.0f} s at {', '.join(map(str, stages))} users "
+            f"against {base_url}"
+        )
+        return run_load(
+            base_url, stages, options['stage_seconds'], mix, ramp_seconds=options['ramp_seconds'],
+            think_time=options['think_time'], admin=admin,
+            progress=lambda index, users: self.stdout.write(f"  stage {index + 1}/{len(stages)} done"),
+        )
+
+    def write_report(self, report, options):
+        for stage in report:
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{stage['users']} users: {stage['throughput']:.1f} req/s, "
+                f"{stage['error_rate']:.1%} errors over {stage['requests']} requests"
+            ))
+            self.stdout.write(
+                f"  {'step':<18} {'reqs':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+            )
+            for step in stage['steps']:
+                self.stdout.write(
+                    f"  {step['journey'] + '.' + step['step']:<18} {step['requests']:>6} {step['throughput']:>7.1f} "
+                    f"{step['p50_ms']:>8.1f} {step['p95_ms']:>8.1f} {step['p99_ms']:>8.1f} "
+                    f"{step['error_rate']:>7.1%}"
+                )
+                for error, count in sorted(step['errors'].items()):
+                    self.stdout.write(self.style.WARNING(f"      {count} x {error}"))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['json_path']}")
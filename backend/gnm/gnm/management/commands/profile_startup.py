@@ -0,0 +1,32 @@
+# gnm/management/commands/profile_startup.py
+from django.core.management.base import BaseCommand
+
+from gnm.warmup import profile_startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the WSGI application in a fresh interpreter with -X importtime and "
+        "report the slowest imports and the time spent in warm-up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help="Number of imports to list.")
+        parser.add_argument(
+            '--self', action='store_true', dest='by_self',
+            help="Sort by time spent in the module itself instead of including its imports.",
+        )
+
+    def handle(self, *args, **options):
+        profile = profile_startup(importtime=True)
+        imports = profile['imports']
+        if options['by_self']:
+            imports = sorted(imports, key=lambda record: record[0], reverse=True)
+
+        self.stdout.write(f"  {'self ms':>8} {'cumul. ms':>10}  module")
+        for self_us, cumulative_us, name in imports[:options['top']]:
+            self.stdout.write(f"  {self_us / 1000:>8.1f} {cumulative_us / 1000:>10.1f}  {name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Start-up took {profile['total'] * 1000:.0f} ms "
+            f"({profile['warm_up'] * 1000:.0f} ms warm-up, {len(profile['imports'])} modules imported)."
+        ))
@@ -0,0 +1,74 @@
+# gnm/management/commands/purge_retention.py
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gnm.retention import POLICIES, Purger, get_policy
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete rows past their retention period (RETENTION_DAYS) in small primary-key "
+        "chunks, pausing between chunks and while replicas lag. Safe to interrupt and "
+        "to run continuously with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--policy', action='append', dest='policies', choices=[policy.name for policy in POLICIES],
+            help="Only purge this policy; may be given more than once. Default: every enabled policy.",
+        )
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--chunk-size', type=int, help="Rows per DELETE (RETENTION_CHUNK_SIZE).")
+        parser.add_argument('--pause', type=float, help="Seconds between chunks (RETENTION_CHUNK_PAUSE).")
+        parser.add_argument(
+            '--max-replica-lag', type=float,
+            help="Wait while a replica is further behind than this many seconds (RETENTION_MAX_REPLICA_LAG).",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Count expired rows without deleting them.")
+        parser.add_argument('--loop', action='store_true', help="Keep purging until interrupted.")
+        parser.add_argument('--interval', type=float, default=300, help="Seconds between passes with --loop.")
+
+    def handle(self, *args, **options):
+        policies = [get_policy(name) for name in options['policies']] if options['policies'] else POLICIES
+        disabled = [policy.name for policy in policies if not policy.enabled]
+        if options['policies'] and disabled:
+            raise CommandError(f"No retention period or app not installed: {', '.join(disabled)}")
+        policies = [policy for policy in policies if policy.enabled]
+
+        if options['dry_run']:
+            for policy in policies:
+                count = policy.expired(using=options['database']).count()
+                self.stdout.write(f"  {policy.name:<24} {count:>10,} expired rows")
+            return
+
+        stop = threading.Event()
+        if options['loop']:
+            # Finish the current chunk, then exit
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: stop.set())
+
+        purger = Purger(
+            chunk_size=options['chunk_size'], pause=options['pause'],
+            max_replica_lag=options['max_replica_lag'], using=options['database'], should_stop=stop.is_set,
+            sleep=stop.wait,
+        )
+        while not stop.is_set():
+            total, seconds = 0, 0.0
+            for policy in policies:
+                if stop.is_set():
+                    break
+                result = purger.purge(policy)
+                total += result.deleted
+                seconds += result.seconds
+                self.stdout.write(
+                    f"  {policy.name:<24} {result.deleted:>10,} rows in {result.chunks:>5} chunks, "
+                    f"{result.seconds:>7.1f} s, {result.rate:>9,.0f} rows/s"
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"Purged {total:,} rows in {seconds:.1f} s ({total / seconds if seconds else 0:,.0f} rows/s)."
+            ))
+            if not options['loop']:
+                break
+            stop.wait(options['interval'])
@@ -0,0 +1,205 @@
+# gnm/media.py
+"""
+Serving of uploaded files under MEDIA_URL.
+
+Requests are checked here, then the transfer is handed to the front
+proxy with X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd), so
+no file bytes pass through Python. With MEDIA_SERVE_MODE = 'django' the
+file is streamed by FileResponse instead, which WSGI servers with a
+file_wrapper send with sendfile(). That path supports conditional
+requests (ETag, Last-Modified) and single byte ranges.
+
+Only the image types in INLINE_CONTENT_TYPES are served inline. Anything
+else is sent as an application/octet-stream attachment, and every
+response carries X-Content-Type-Options: nosniff, so a stored file can
+never be rendered as HTML or SVG on this origin. In accel mode the
+internal nginx location must not override these headers.
+"""
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Content-addressed files (see profile/storage.py) and their variants
+IMMUTABLE_NAME = re.compile(r'(^|/)[0-9a-f]{64}\.[^/]+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Other files may be replaced in place, so clients revalidate each time
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Extension -> Content-Type of the files served inline
+INLINE_CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+
+def _resolve(path):
+    """
+    Absolute path and stat result for a requested media name.
+
+    Only regular files inside MEDIA_PUBLIC_DIRS are served; traversal,
+    dot files (such as in-progress '.upload-*' temp files) and anything
+    else is a 404.
+    """
+    parts = path.split('/')
+    if parts[0] not in settings.MEDIA_PUBLIC_DIRS or any(not p or p.startswith('.') for p in parts):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404
+    return full_path, st
+
+
+def _content_headers(response, path):
+    content_type = INLINE_CONTENT_TYPES.get(os.path.splitext(path)[1].lower())
+    if content_type:
+        response['Content-Type'] = content_type
+        if 'Content-Disposition' in response:
+            del response['Content-Disposition']
+    else:
+        response['Content-Type'] = 'application/octet-stream'
+        response['Content-Disposition'] = 'attachment'
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def _cache_headers(response, path, etag, st):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(st.st_mtime)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if IMMUTABLE_NAME.search(path) else REVALIDATE_CACHE_CONTROL
+    return response
+
+
+def _etag(path, st):
+    if IMMUTABLE_NAME.search(path):
+        # The name already is the content hash
+        return '"%s"' % path.rsplit('/', 1)[-1]
+    return '"%x-%x"' % (st.st_size, st.st_mtime_ns)
+
+
+def _not_modified(request, etag, st):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(st.st_mtime) <= if_modified_since
+
+
+def _byte_range(request, etag, st, size):
+    """
+    (start, end) inclusive for a satisfiable single Range header, None to
+    send the whole file, or False when the range cannot be satisfied.
+    """
+    header = request.META.get('HTTP_RANGE')
+    if not header:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(st.st_mtime):
+        # The client's copy is stale; send the current file in full
+        return None
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Multiple or malformed ranges; a full response is always allowed
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or (last and int(last) < start):
+            return False
+    else:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        start, end = max(size - length, 0), size - 1
+    return start, end
+
+
+class _FileRange:
+    """
+    File object limited to a byte range.
+
+    The underlying file is positioned at the range start, so servers that
+    send file_to_stream with sendfile() start there and stop at
+    Content-Length; read() stops at the range end for everything else.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _proxy_response(path, full_path, mode):
+    response = _content_headers(HttpResponse(), path)
+    if mode == 'accel':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(path)
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT after access checks"""
+    full_path, st = _resolve(path)
+    mode = settings.MEDIA_SERVE_MODE
+    etag = _etag(path, st)
+
+    if mode in ('accel', 'sendfile'):
+        # The proxy handles Range and conditional requests itself
+        return _cache_headers(_proxy_response(path, full_path, mode), path, etag, st)
+
+    if _not_modified(request, etag, st):
+        return _cache_headers(HttpResponseNotModified(), path, etag, st)
+
+    size = st.st_size
+    byte_range = _byte_range(request, etag, st, size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file)
+    else:
+        start, end = byte_range
+        response = FileResponse(_FileRange(file, start, end - start + 1), status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return _cache_headers(_content_headers(response, path), path, etag, st)
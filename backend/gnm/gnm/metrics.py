@@ -0,0 +1,354 @@
+# gnm/metrics.py
+"""
+Process metrics in Prometheus text format, aggregated across workers.
+
+Each worker process keeps its counters and histograms in memory and
+writes them to its own file, METRICS_DIR/metrics-<pid>.json, at most
+every METRICS_FLUSH_INTERVAL seconds. The metrics endpoint sums the files
+of all workers, so any worker can answer a scrape. When a worker exits,
+its file is merged into METRICS_DIR/metrics-archive.json, so counters
+never go backwards and the directory does not grow with every restarted
+worker; the directory is cleared when the server starts. gunicorn.conf.py
+does both from gunicorn's hooks; other servers must clear METRICS_DIR
+before starting. With METRICS_DIR empty nothing is written and only this
+process is reported.
+
+Recorded by MetricsMiddleware for every request, labelled by URL route:
+    gnm_http_requests_total{view, method, status}
+    gnm_http_request_duration_seconds{view}     histogram
+    gnm_http_request_queries{view}               histogram, all databases
+Recorded by the response caches (see profile.cache):
+    gnm_cache_requests_total{cache, result}     hit / miss
+Recorded by the two-tier cache (gnm.cache):
+    gnm_cache_lookups_total{cache, result}      l1_hit / l2_hit / miss
+    gnm_cache_single_flight_total{cache, result} computed / waited
+Recorded by the connection pool (gnm.mysql_pool):
+    gnm_db_pool_events_total{alias, event}
+    gnm_db_pool_wait_seconds{alias}              histogram
+"""
+import atexit
+import contextlib
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+from accounts.authentication import CookieJWTAuthentication
+
+try:
+    import fcntl
+except ImportError:  # Windows: archiving and scrapes are not serialised
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Anything else a client sends is counted as method="other"
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Metrics of exited workers, summed like any worker's file
+ARCHIVE_NAME = 'metrics-archive.json'
+LOCK_NAME = '.metrics.lock'
+
+HELP = {
+    'gnm_http_requests_total': ('counter', 'Requests by view, method and status code.'),
+    'gnm_http_request_duration_seconds': ('histogram', 'Request latency by view.'),
+    'gnm_http_request_queries': ('histogram', 'Database queries per request by view.'),
+    'gnm_cache_requests_total': ('counter', 'Response cache lookups by cache and result.'),
+    'gnm_cache_lookups_total': ('counter', 'Two-tier cache lookups by the tier that answered.'),
+    'gnm_cache_single_flight_total': ('counter', 'Two-tier cache misses computed or waited for.'),
+    'gnm_db_pool_events_total': ('counter', 'Connection pool checkouts and closes by event.'),
+    'gnm_db_pool_wait_seconds': ('histogram', 'Time to check out a pooled connection.'),
+    'gnm_retention_deleted_rows_total': ('counter', 'Rows deleted by purge_retention by policy.'),
+}
+
+
+class MetricsStore:
+    """Counters and histograms of one process, flushed to a per-pid file"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_flush = 0.0
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        # (name, labels) -> value, and -> [bucket counts..., sum, count]
+        self.counters = {}
+        self.histograms = {}
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        # A forked worker must not report the parent's numbers as its own
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_pid()
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, tuple(sorted(labels.items())), buckets)
+        with self._lock:
+            self._check_pid()
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = [0] * len(buckets) + [0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._check_pid()
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, list(labels), list(buckets), list(entry)]
+                    for (name, labels, buckets), entry in self.histograms.items()
+                ],
+            }
+
+    def flush(self):
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return
+        snapshot = self.snapshot()
+        if not (snapshot['counters'] or snapshot['histograms']):
+            # e.g. gunicorn's master, which preloads the application but serves
+            # nothing; no child_exit would archive its file
+            return
+        os.makedirs(directory, exist_ok=True)
+        _write(os.path.join(directory, f'metrics-{os.getpid()}.json'), snapshot)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+            return
+        try:
+            self.flush()
+        except OSError:
+            # Try again after the next interval rather than on every request
+            self._last_flush = time.monotonic()
+            logger.warning("Could not write metrics file", exc_info=True)
+
+
+store = MetricsStore()
+
+
+def inc_cache(cache_name, hit):
+    store.inc('gnm_cache_requests_total', {'cache': cache_name, 'result': 'hit' if hit else 'miss'})
+
+
+def _write(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+@contextlib.contextmanager
+def _directory_lock(directory):
+    """Keeps a scrape from seeing a worker's file both archived and not"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_NAME), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# ----------------------------
+# WORKER LIFECYCLE (gunicorn.conf.py)
+# ----------------------------
+def clear_metrics_dir():
+    """Remove every worker's file and the archive; call before workers start"""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json*')):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def archive_worker(pid):
+    """Merge an exited worker's file into the archive and remove it"""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return
+    path = os.path.join(directory, f'metrics-{pid}.json')
+    archive = os.path.join(directory, ARCHIVE_NAME)
+    with _directory_lock(directory):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            # Killed mid-write; its last complete snapshot was replaced
+            logger.warning("Discarding unreadable metrics file %s", path)
+        else:
+            counters, histograms = {}, {}
+            for snapshot in (_read(archive), data):
+                if snapshot:
+                    _merge(counters, histograms, snapshot)
+            _write(archive, {
+                'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+                'histograms': [
+                    [name, list(labels), list(buckets), entry]
+                    for (name, labels, buckets), entry in histograms.items()
+                ],
+            })
+        os.remove(path)
+
+
+# ----------------------------
+# AGGREGATION & EXPOSITION
+# ----------------------------
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _snapshots():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        # Single process, nothing written to disk
+        return [store.snapshot()]
+    store.flush()
+    with _directory_lock(directory):
+        snapshots = [_read(path) for path in glob.glob(os.path.join(directory, 'metrics-*.json'))]
+    # Missing ones were removed or not yet complete; counted again on the next scrape
+    return [snapshot for snapshot in snapshots if snapshot]
+
+
+def _merge(counters, histograms, data):
+    for name, labels, value in data['counters']:
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, buckets, entry in data['histograms']:
+        key = (name, tuple(map(tuple, labels)), tuple(buckets))
+        total = histograms.setdefault(key, [0] * len(entry))
+        for i, value in enumerate(entry):
+            total[i] += value
+
+
+def collect():
+    """Sum the metrics of every worker, live or archived"""
+    counters, histograms = {}, {}
+    for data in _snapshots():
+        _merge(counters, histograms, data)
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(counters, histograms):
+    lines = []
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append(('counter', labels, value))
+    for (name, labels, buckets), entry in histograms.items():
+        by_name.setdefault(name, []).append(('histogram', labels, (buckets, entry)))
+
+    for name in sorted(by_name):
+        kind, help_text = HELP.get(name, (by_name[name][0][0], name))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for kind, labels, value in sorted(by_name[name], key=lambda item: item[1]):
+            if kind == 'counter':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            buckets, entry = value
+            cumulative = 0
+            for bound, count in zip(buckets, entry):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, [("le", _number(bound))])} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {entry[-1]}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(entry[-2])}')
+            lines.append(f'{name}_count{_labels(labels)} {entry[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+@api_view(['GET'])
+@authentication_classes([CookieJWTAuthentication, BasicAuthentication])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """
+    Prometheus metrics for all workers (staff only)
+    Endpoint: GET /api/metrics/
+    Scrapers can authenticate with HTTP Basic as a staff user
+    """
+    return HttpResponse(render(*collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# ----------------------------
+# MIDDLEWARE
+# ----------------------------
+class MetricsMiddleware:
+    """Count, time and query-count every request by URL route; queries to replicas count too"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.route if match else '<unmatched>'
+        method = request.method if request.method in METHODS else 'other'
+        store.inc('gnm_http_requests_total', {
+            'view': view, 'method': method, 'status': str(response.status_code),
+        })
+        store.observe('gnm_http_request_duration_seconds', {'view': view}, elapsed, LATENCY_BUCKETS)
+        store.observe('gnm_http_request_queries', {'view': view}, queries[0], QUERY_BUCKETS)
+        store.maybe_flush()
+        return response
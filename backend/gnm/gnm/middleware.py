@@ -0,0 +1,33 @@
+# gnm/middleware.py
+import re
+import uuid
+
+from .log import end_request, start_request
+
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class RequestIdMiddleware:
+    """
+    Tag every log record of a request with a request id.
+
+    Reuses a well-formed X-Request-ID from the proxy, otherwise generates
+    one, and echoes it back on the response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rid = request.META.get('HTTP_X_REQUEST_ID', '')
+        if not _VALID_REQUEST_ID.match(rid):
+            rid = uuid.uuid4().hex
+        request.request_id = rid
+
+        tokens = start_request(rid)
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(tokens)
+        response['X-Request-ID'] = rid
+        return response
@@ -0,0 +1,27 @@
+from django.core.cache import caches
+from django.core.management.commands.createcachetable import Command as CreateCacheTable
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    """
+    Tables of the two-tier caches in CACHES. createcachetable only knows
+    DatabaseCache itself; existing tables are left alone.
+    """
+    from gnm.cache import TwoTierCacheBase
+
+    command = CreateCacheTable()
+    command.verbosity = 0
+    for alias in caches:
+        cache = caches[alias]
+        if isinstance(cache, TwoTierCacheBase):
+            command.create_table(schema_editor.connection.alias, cache.l2._table, dry_run=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# gnm/mysql_pool/base.py
+"""
+MySQL backend that takes connections from a per-process pool.
+
+    DATABASES['default']['ENGINE'] = 'gnm.mysql_pool'
+    DATABASES['default']['OPTIONS']['pool'] = {'max_size': 10, ...}
+
+Options are those of pool.ConnectionPool. Keep CONN_MAX_AGE at 0: Django
+then "closes" the connection after every request, which returns it to
+the pool. A connection that saw a database error and fails a ping is
+closed instead, and an open transaction is rolled back before the
+connection is handed to the next request.
+
+Django gives every thread (and, under ASGI, every sync_to_async thread)
+its own DatabaseWrapper; the pool is shared by all of them and is thread
+safe. Session state other than the settings Django applies on connect
+(temporary tables, user variables) survives a return to the pool.
+"""
+from django.db.backends.mysql import base as mysql_base
+from django.utils.asyncio import async_unsafe
+
+from .pool import get_pool
+
+Database = mysql_base.Database
+
+
+def _connect(conn_params):
+    connection = Database.connect(**conn_params)
+    # Same workaround as django.db.backends.mysql
+    if connection.encoders.get(bytes) is bytes:
+        connection.encoders.pop(bytes)
+    return connection
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pool_options = params.pop('pool', None) or {}
+        return params
+
+    @property
+    def pool(self):
+        params = self.get_connection_params()
+        return get_pool(self.alias, lambda: _connect(params), **self.pool_options)
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire()
+
+    def init_connection_state(self):
+        # Session settings stay in place while a connection is pooled
+        if getattr(self.connection, '_gnm_pool_ready', False):
+            return
+        super().init_connection_state()
+        self.connection._gnm_pool_ready = True
+
+    def _close(self):
+        if self.connection is None:
+            return
+        discard = self.errors_occurred and not self.is_usable()
+        if not discard and (self.in_atomic_block or not self.autocommit):
+            try:
+                self.connection.rollback()
+            except Database.Error:
+                discard = True
+        self.pool.release(self.connection, discard=discard)
@@ -0,0 +1,216 @@
+# gnm/mysql_pool/pool.py
+"""
+Bounded, thread-safe connection pool, one per database alias and process.
+
+Django opens and closes a connection around every request (CONN_MAX_AGE
+0); with the pool that becomes a checkout and a return. On checkout a
+connection is
+
+    replaced  when older than max_lifetime (seconds),
+    pinged    when idle for longer than pre_ping_after, and replaced if
+              the ping fails,
+    waited on for up to ``timeout`` seconds when max_size are in use.
+
+Connections idle for longer than idle_timeout are closed on the next
+checkout or return, down to min_size. No background thread is needed.
+
+Events are counted in gnm.metrics (gnm_db_pool_events_total) and in
+stats() for the bench_db_pool command.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Entry:
+    __slots__ = ('connection', 'created', 'last_used')
+
+    def __init__(self, connection, now):
+        self.connection = connection
+        self.created = now
+        self.last_used = now
+
+
+def _record(alias, event, wait=None):
+    # Imported late: the pool is built while Django opens its first connection
+    from gnm.metrics import LATENCY_BUCKETS, store
+    store.inc('gnm_db_pool_events_total', {'alias': alias, 'event': event})
+    if wait is not None:
+        store.observe('gnm_db_pool_wait_seconds', {'alias': alias}, wait, LATENCY_BUCKETS)
+
+
+class ConnectionPool:
+    def __init__(self, connect, *, alias='default', max_size=10, min_size=0, max_lifetime=1800,
+                 idle_timeout=300, pre_ping_after=5, timeout=10, clock=time.monotonic):
+        self.connect = connect
+        self.alias = alias
+        self.max_size = max_size
+        self.min_size = min_size
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.pre_ping_after = pre_ping_after
+        self.timeout = timeout
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._counts = {}
+        self._reset()
+
+    def _reset(self):
+        # Most recently returned last, so the oldest idle connections are reaped first
+        self._idle = []
+        self._in_use = {}
+        # Open connections, including ones being opened right now
+        self._size = 0
+        self._pid = os.getpid()
+
+    def _event(self, event, wait=None):
+        self._counts[event] = self._counts.get(event, 0) + 1
+        _record(self.alias, event, wait)
+
+    def _check_pid(self):
+        # A forked child must not use (or close) the parent's sockets
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _expired(self, entry, now):
+        return self.max_lifetime is not None and now - entry.created > self.max_lifetime
+
+    def _reap(self, now):
+        """Remove idle connections past idle_timeout or max_lifetime; caller holds the lock"""
+        stale = []
+        keep = []
+        for entry in self._idle:
+            idle_too_long = (
+                self.idle_timeout is not None and now - entry.last_used > self.idle_timeout
+                and self._size - len(stale) > self.min_size
+            )
+            if idle_too_long or self._expired(entry, now):
+                stale.append(entry)
+            else:
+                keep.append(entry)
+        self._idle = keep
+        self._size -= len(stale)
+        return stale
+
+    def _close(self, entries, event):
+        for entry in entries:
+            self._event(event)
+            try:
+                entry.connection.close()
+            except Exception:
+                logger.debug("Error closing pooled connection", exc_info=True)
+
+    def _healthy(self, entry, now):
+        if self.pre_ping_after is None or now - entry.last_used <= self.pre_ping_after:
+            return True
+        try:
+            entry.connection.ping()
+            return True
+        except Exception:
+            self._event('ping_failed')
+            logger.info("Pooled connection failed its ping; replacing it", extra={'alias': self.alias})
+            return False
+
+    def acquire(self):
+        """Return an open connection, reusing an idle one when possible"""
+        start = self.clock()
+        deadline = start + self.timeout
+        while True:
+            with self._cond:
+                self._check_pid()
+                stale = self._reap(self.clock())
+                entry = None
+                while True:
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self._event('timeout')
+                        raise PoolTimeout(
+                            f"No connection for {self.alias!r} within {self.timeout}s "
+                            f"({self.max_size} in use)"
+                        )
+                    self._cond.wait(remaining)
+            self._close(stale, 'reaped')
+
+            if entry is None:
+                try:
+                    connection = self.connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                entry = _Entry(connection, self.clock())
+                self._event('created', wait=self.clock() - start)
+            elif self._healthy(entry, self.clock()):
+                self._event('reused', wait=self.clock() - start)
+            else:
+                with self._cond:
+                    self._size -= 1
+                self._close([entry], 'discarded')
+                continue
+
+            with self._cond:
+                self._in_use[id(entry.connection)] = entry
+            return entry.connection
+
+    def release(self, connection, discard=False):
+        """Return a connection; discard closes it instead, e.g. after an error"""
+        now = self.clock()
+        with self._cond:
+            self._check_pid()
+            entry = self._in_use.pop(id(connection), None)
+            if entry is None:
+                # Not from this pool (opened before a fork); just close it
+                stale = [_Entry(connection, now)]
+            elif discard or self._expired(entry, now):
+                self._size -= 1
+                stale = [entry]
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+                stale = []
+            stale += self._reap(now)
+            self._cond.notify()
+        self._close(stale, 'discarded' if discard else 'reaped')
+
+    def close_all(self):
+        """Close the idle connections; ones in use are closed when returned"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        self._close(idle, 'reaped')
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'max_size': self.max_size,
+                **self._counts,
+            }
+
+
+def get_pool(alias, connect, **options):
+    """The pool for alias in this process, created with options on first use"""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(connect, alias=alias, **options)
+        return pool
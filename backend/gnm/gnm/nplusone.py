@@ -0,0 +1,168 @@
+# gnm/nplusone.py
+"""
+N+1 query detection for development and tests.
+
+Every SELECT of a request is fingerprinted (literals and IN lists
+collapsed). When one fingerprint runs NPLUSONE_THRESHOLD times in the
+same request, the queries are reported together with what triggered them:
+the serializer field being rendered, or else the first frame of project
+code.
+
+NPLUSONE_DETECTOR selects what NPlusOneMiddleware does:
+    'warn'   log a warning (default with DEBUG)
+    'raise'  raise NPlusOneError (the test settings)
+    None     off
+
+NPlusOneTestMixin applies the same check to a whole test, including code
+that runs outside a request. allow_repeated_queries() exempts a block
+that repeats a query on purpose, e.g. a chunked admin action.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import sys
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+_allowed = contextvars.ContextVar('nplusone_allowed', default=False)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """Shape of a query: the SQL with literal values and IN lists collapsed"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def query_origin():
+    """
+    Where the current query comes from: 'Serializer.field' when a DRF
+    serializer is rendering a field, else 'path:line in function' of the
+    innermost project frame
+    """
+    project_frame = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code is Serializer.to_representation.__code__:
+            field = frame.f_locals.get('field')
+            if field is not None:
+                return f"{type(field.parent).__name__}.{field.field_name}"
+        filename = os.path.abspath(code.co_filename)
+        if (project_frame is None and filename.startswith(_PROJECT_ROOT)
+                and filename != _THIS_FILE and 'site-packages' not in filename):
+            project_frame = f"{os.path.relpath(filename, _PROJECT_ROOT)}:{frame.f_lineno} in {code.co_name}"
+        frame = frame.f_back
+    return project_frame or '<unknown>'
+
+
+@contextlib.contextmanager
+def allow_repeated_queries():
+    """Do not report queries run inside this block"""
+    token = _allowed.set(True)
+    try:
+        yield
+    finally:
+        _allowed.reset(token)
+
+
+class Detector:
+    """Counts query shapes while active; ``findings`` lists the repeated ones"""
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or getattr(settings, 'NPLUSONE_THRESHOLD', 3)
+        self.counts = {}
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and not _allowed.get() and sql.lstrip()[:6].upper() == 'SELECT':
+            shape = fingerprint(sql)
+            count = self.counts[shape] = self.counts.get(shape, 0) + 1
+            # Walking the stack is only worth it once a shape repeats
+            if count == self.threshold:
+                self.origins[shape] = query_origin()
+        return execute(sql, params, many, context)
+
+    @contextlib.contextmanager
+    def watch(self):
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def findings(self):
+        """(fingerprint, count, origin) for every shape that hit the threshold"""
+        return [
+            (shape, count, self.origins[shape])
+            for shape, count in self.counts.items()
+            if count >= self.threshold
+        ]
+
+    def report(self, where):
+        lines = [f"{count}x from {origin}: {shape}" for shape, count, origin in self.findings]
+        return f"Repeated queries in {where}:\n  " + "\n  ".join(lines)
+
+
+# ----------------------------
+# MIDDLEWARE
+# ----------------------------
+class NPlusOneMiddleware:
+    """Report repeated same-shape queries per request (see NPLUSONE_DETECTOR)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = getattr(settings, 'NPLUSONE_DETECTOR', None)
+        if not mode:
+            return self.get_response(request)
+
+        detector = Detector()
+        with detector.watch():
+            response = self.get_response(request)
+        if detector.findings:
+            message = detector.report(f"{request.method} {request.path}")
+            if mode == 'raise':
+                raise NPlusOneError(message)
+            logger.warning(message, extra={'path': request.path, 'findings': len(detector.findings)})
+        return response
+
+
+# ----------------------------
+# TESTS
+# ----------------------------
+class NPlusOneTestMixin:
+    """Mixed into a django.test.TestCase: fail a test that repeats a query shape"""
+
+    nplusone_threshold = None
+
+    def setUp(self):
+        super().setUp()
+        detector = Detector(self.nplusone_threshold)
+        self.enterContext(detector.watch())
+        # Cleanups run last-in first-out: checked before the wrappers are removed
+        self.addCleanup(self._check_nplusone, detector)
+
+    def _check_nplusone(self, detector):
+        if detector.findings:
+            self.fail(detector.report(self.id()))
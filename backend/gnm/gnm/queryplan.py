@@ -0,0 +1,189 @@
+# gnm/queryplan.py
+"""
+Query-plan regression harness for hot ORM queries.
+
+Each app's tests.py declares its hot queries in a QueryPlanTestMixin test
+case. A HotQuery runs the real code path (a view, a manager method, a
+serializer check) against the seeded database, captures the SQL it sends
+for ``table`` and runs EXPLAIN on it. The plan is normalised to what
+matters for regressions, per table the access type (index seek, range,
+full scan...) and index, plus whether the query sorts or builds a
+temporary table, and compared with the golden file
+
+    gnm/query_plans/<vendor>/<name>.json
+
+The test fails if a table's access type changes or the query starts to
+filesort or use a temporary table. Other differences, such as a
+different index of the same kind, do not fail but show up when the
+golden files are regenerated:
+
+    UPDATE_QUERY_PLANS=1 python manage.py test --settings=gnm.settings_test
+
+Plans are recorded per database vendor; a vendor with no directory yet
+is skipped rather than failed.
+"""
+import json
+import os
+import re
+from pathlib import Path
+
+from django.db import connection
+
+from .benchmark import seed
+from .nplusone import allow_repeated_queries
+
+PLANS_DIR = Path(__file__).resolve().parent / 'query_plans'
+
+_SQLITE_STEP = re.compile(r'^(SCAN|SEARCH) (\S+)(?: AS \S+)?(?: USING (.+?))?(?: \(.*\))?$')
+_SQLITE_INDEX = re.compile(r'(?:COVERING )?INDEX (\S+)|(INTEGER PRIMARY KEY|PRIMARY KEY)')
+
+
+class HotQuery:
+    """
+    ``run(case)`` exercises the code path; the first query it sends that
+    reads ``table`` and contains every string in ``contains`` is explained
+    """
+
+    def __init__(self, name, run, table, contains=()):
+        self.name = name
+        self.run = run
+        self.table = table
+        self.contains = tuple(contains)
+        self._from = re.compile(rf'\bFROM [`"]?{re.escape(table)}[`"]?(?:\s|$)')
+
+    def __str__(self):
+        return self.name
+
+    def matches(self, sql):
+        return sql.lstrip().upper().startswith('SELECT') and self._from.search(sql) and all(
+            part in sql for part in self.contains
+        )
+
+
+def capture(hot_query, case):
+    """(sql, params) of the query ``hot_query`` explains, or None if it was not sent"""
+    captured = []
+
+    def wrapper(execute, sql, params, many, context):
+        if not captured and hot_query.matches(sql):
+            captured.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        hot_query.run(case)
+    return captured[0] if captured else None
+
+
+# ----------------------------
+# EXPLAIN & NORMALISATION
+# ----------------------------
+def normalise_sqlite(rows):
+    plan = {'steps': [], 'filesort': False, 'temporary': False}
+    for row in rows:
+        detail = row[-1]
+        if detail.startswith('USE TEMP B-TREE FOR '):
+            if 'ORDER BY' in detail:
+                plan['filesort'] = True
+            else:
+                plan['temporary'] = True
+            continue
+        match = _SQLITE_STEP.match(detail)
+        if not match:
+            continue
+        kind, table, using = match.groups()
+        index = _SQLITE_INDEX.search(using or '')
+        index = index and (index.group(1) or 'PRIMARY')
+        if kind == 'SEARCH':
+            access = 'search'
+        else:
+            access = 'index_scan' if index else 'scan'
+        plan['steps'].append({'table': table, 'access': access, 'index': index})
+    return plan
+
+
+def normalise_mysql(rows, columns):
+    plan = {'steps': [], 'filesort': False, 'temporary': False}
+    for row in rows:
+        row = dict(zip(columns, row))
+        extra = row.get('Extra') or ''
+        plan['filesort'] |= 'Using filesort' in extra
+        plan['temporary'] |= 'Using temporary' in extra
+        plan['steps'].append({'table': row['table'], 'access': row['type'], 'index': row['key']})
+    return plan
+
+
+def explain(sql, params):
+    """Normalised plan of one query on the default database"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return normalise_sqlite(cursor.fetchall())
+        if connection.vendor == 'mysql':
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return normalise_mysql(cursor.fetchall(), [column[0] for column in cursor.description])
+    raise NotImplementedError(f"No plan normalisation for {connection.vendor}")
+
+
+def regressions(golden, current):
+    """What got worse from the golden plan to the current one"""
+    found = []
+    tables = [step['table'] for step in golden['steps']]
+    if tables != [step['table'] for step in current['steps']]:
+        found.append(f"tables {tables} became {[step['table'] for step in current['steps']]}")
+    else:
+        for before, after in zip(golden['steps'], current['steps']):
+            if before['access'] != after['access']:
+                found.append(
+                    f"{before['table']}: access {before['access']} ({before['index']}) "
+                    f"became {after['access']} ({after['index']})"
+                )
+    for flag in ('filesort', 'temporary'):
+        if current[flag] and not golden[flag]:
+            found.append(f"now uses {flag}")
+    return found
+
+
+# ----------------------------
+# TEST MIXIN
+# ----------------------------
+class QueryPlanTestMixin:
+    """
+    Mixed into a django.test.TestCase. Subclasses set ``hot_queries``;
+    data comes from seed() once per class, as for the endpoint benchmarks.
+    """
+
+    hot_queries = ()
+    update = bool(os.getenv('UPDATE_QUERY_PLANS'))
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.accounts = seed()
+
+    def plan_path(self, hot_query):
+        return PLANS_DIR / connection.vendor / f'{hot_query.name}.json'
+
+    def test_query_plans(self):
+        vendor_dir = PLANS_DIR / connection.vendor
+        if not self.update and not vendor_dir.is_dir():
+            self.skipTest(f"No golden query plans recorded for {connection.vendor}")
+
+        for hot_query in self.hot_queries:
+            with self.subTest(query=str(hot_query)):
+                with allow_repeated_queries():
+                    captured = capture(hot_query, self)
+                self.assertIsNotNone(captured, f"{hot_query} sent no SELECT on {hot_query.table}")
+                sql, params = captured
+                current = explain(sql, params)
+                path = self.plan_path(hot_query)
+
+                if self.update:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_text(json.dumps({'sql': sql, 'plan': current}, indent=2) + '\n')
+                    continue
+                self.assertTrue(
+                    path.exists(), f"No golden plan for {hot_query}; run with UPDATE_QUERY_PLANS=1 and commit it"
+                )
+                golden = json.loads(path.read_text())
+                found = regressions(golden['plan'], current)
+                self.assertFalse(found, f"{hot_query} plan regressed: {'; '.join(found)}\nSQL: {sql}")
@@ -0,0 +1,38 @@
+# gnm/renderers.py
+"""
+orjson-backed drop-in for DRF's JSONRenderer.
+
+Produces the same bytes as JSONRenderer with the default API settings:
+datetimes, dates, times, decimals, UUIDs and lazy strings go through
+DRF's own encoder, non-string keys become strings, and U+2028/U+2029
+are escaped. Anything orjson cannot express the same way (indented
+output other than 2 spaces, ASCII-only output, ints above 64 bits)
+falls back to JSONRenderer.
+
+Known difference: NaN and infinity render as null instead of failing
+STRICT_JSON.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Keep the output a strict JavaScript subset, as JSONRenderer does
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,186 @@
+# gnm/retention.py
+"""
+Retention policies and the batched purge behind manage.py purge_retention.
+
+Each Policy names a model, the datetime field that ages its rows and the
+RETENTION_DAYS entry that says how long they are kept. Purger deletes the
+expired rows of a policy in primary-key ranges of at most
+RETENTION_CHUNK_SIZE rows: one indexed SELECT finds where the range ends,
+one DELETE in its own short transaction removes the expired rows inside
+it. Between chunks it pauses for RETENTION_CHUNK_PAUSE seconds and, if
+any replica in DATABASE_REPLICAS is more than RETENTION_MAX_REPLICA_LAG
+seconds behind, waits for it to catch up, so a large backlog drains
+without stalling replication or holding long locks.
+
+Every chunk commits on its own and the expiry condition is re-checked by
+the DELETE itself, so a purge can be interrupted at any point, run in a
+loop, or even run twice at once without deleting anything it should not.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .metrics import store
+from .nplusone import allow_repeated_queries
+
+logger = logging.getLogger(__name__)
+
+
+class Policy:
+    """Rows of ``model`` whose ``field`` is older than RETENTION_DAYS[name] days"""
+
+    def __init__(self, name, model, field):
+        self.name = name
+        self.model_label = model
+        self.field = field
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def days(self):
+        return settings.RETENTION_DAYS.get(self.name)
+
+    @property
+    def enabled(self):
+        """Kept forever when RETENTION_DAYS has no entry, skipped when the app is not installed"""
+        app_label = self.model_label.split('.')[0]
+        return self.days is not None and any(config.label == app_label for config in apps.get_app_configs())
+
+    def expired(self, now=None, using=DEFAULT_DB_ALIAS):
+        cutoff = (now or timezone.now()) - timedelta(days=self.days)
+        return self.model._base_manager.using(using).filter(**{f'{self.field}__lt': cutoff})
+
+
+POLICIES = [
+    # Sessions are dead once expired; allauth logins write one per login
+    Policy('sessions', 'sessions.Session', 'expire_date'),
+    Policy('axes_attempts', 'axes.AccessAttempt', 'attempt_time'),
+    Policy('axes_access_logs', 'axes.AccessLog', 'attempt_time'),
+    Policy('axes_failure_logs', 'axes.AccessFailureLog', 'attempt_time'),
+    Policy('contact_messages', 'app1.ContactMessage', 'created_at'),
+    Policy('quarantined_submissions', 'app1.QuarantinedSubmission', 'created_at'),
+]
+
+
+def get_policy(name):
+    for policy in POLICIES:
+        if policy.name == name:
+            return policy
+    raise KeyError(name)
+
+
+# ----------------------------
+# REPLICATION LAG
+# ----------------------------
+def replica_lag():
+    """
+    Seconds the furthest-behind replica lags the primary; 0 without
+    replicas or on backends that cannot tell, inf if replication is stopped
+    """
+    lag = 0.0
+    for alias in getattr(settings, 'DATABASE_REPLICAS', ()):
+        connection = connections[alias]
+        if connection.vendor != 'mysql':
+            continue
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute('SHOW REPLICA STATUS')
+            except DatabaseError:
+                # MySQL before 8.0.22
+                cursor.execute('SHOW SLAVE STATUS')
+            row = cursor.fetchone()
+            columns = [column[0] for column in cursor.description or ()]
+        if row is None:
+            continue
+        status = dict(zip(columns, row))
+        seconds = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        lag = max(lag, float('inf') if seconds is None else float(seconds))
+    return lag
+
+
+# ----------------------------
+# PURGE
+# ----------------------------
+class PurgeResult:
+    __slots__ = ('policy', 'deleted', 'chunks', 'seconds')
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.deleted = 0
+        self.chunks = 0
+        self.seconds = 0.0
+
+    @property
+    def rate(self):
+        """Rows deleted per second, pauses included"""
+        return self.deleted / self.seconds if self.seconds else 0.0
+
+
+class Purger:
+    """
+    Deletes expired rows chunk by chunk. ``should_stop`` is polled between
+    chunks and while waiting for replicas; ``sleep`` and ``lag`` are
+    replaceable for tests.
+    """
+
+    def __init__(self, *, chunk_size=None, pause=None, max_replica_lag=None, using=DEFAULT_DB_ALIAS,
+                 should_stop=lambda: False, sleep=time.sleep, lag=replica_lag):
+        self.chunk_size = chunk_size or settings.RETENTION_CHUNK_SIZE
+        self.pause = settings.RETENTION_CHUNK_PAUSE if pause is None else pause
+        self.max_replica_lag = settings.RETENTION_MAX_REPLICA_LAG if max_replica_lag is None else max_replica_lag
+        self.using = using
+        self.should_stop = should_stop
+        self.sleep = sleep
+        self.lag = lag
+
+    def _delete_chunk(self, expired, last):
+        """Delete expired rows in the next pk range after ``last``; returns (rows, range end)"""
+        page = expired if last is None else expired.filter(pk__gt=last)
+        end = next(iter(page.order_by('pk').values_list('pk', flat=True)[self.chunk_size - 1:self.chunk_size]), None)
+        chunk = page if end is None else page.filter(pk__lte=end)
+        with transaction.atomic(using=self.using):
+            deleted, _ = chunk.delete()
+        return deleted, end
+
+    def _throttle(self):
+        if self.pause:
+            self.sleep(self.pause)
+        while not self.should_stop():
+            lag = self.lag()
+            if lag <= self.max_replica_lag:
+                return
+            logger.info("Replica lag %.0f s, pausing purge", lag, extra={'lag_seconds': lag})
+            self.sleep(min(lag, 5) if lag != float('inf') else 5)
+
+    def purge(self, policy, now=None):
+        result = PurgeResult(policy)
+        start = time.monotonic()
+        expired = policy.expired(now or timezone.now(), self.using)
+        last = None
+        with allow_repeated_queries():
+            while not self.should_stop():
+                deleted, last = self._delete_chunk(expired, last)
+                result.deleted += deleted
+                result.chunks += 1
+                if deleted:
+                    store.inc('gnm_retention_deleted_rows_total', {'policy': policy.name}, deleted)
+                    store.maybe_flush()
+                if last is None:
+                    break
+                self._throttle()
+        result.seconds = time.monotonic() - start
+        logger.info("Purged %s", policy.name, extra={
+            'policy': policy.name, 'rows': result.deleted, 'chunks': result.chunks,
+            'rows_per_second': round(result.rate, 1),
+        })
+        return result
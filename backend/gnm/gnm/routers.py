@@ -0,0 +1,105 @@
+# gnm/routers.py
+"""
+Primary/replica routing with read-your-writes stickiness.
+
+Reads go to a replica in DATABASE_REPLICAS only inside use_replica(),
+which the read-only list views apply; everything else, and every write,
+uses 'default'.
+
+ReplicaPinMiddleware keeps a user on the primary after a write: a request
+that writes gets a short-lived cookie (REPLICA_PIN_SECONDS), and while it
+is valid the user's reads skip the replicas, so a booking they just made
+cannot be missing from their history because of replication lag. Reads
+later in the same request as a write also stay on the primary.
+"""
+import contextlib
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_pin'
+
+# Django's database cache table: its reads must not lag and its writes are
+# not the client's writes
+_UNROUTED_APP_LABELS = {'django_cache'}
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+
+
+class _RequestState:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+@contextlib.contextmanager
+def use_replica():
+    """Send reads in this block (or view, as a decorator) to a replica"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Always explicit: falling through would follow the hinted instance's database
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if not replicas or not _replica_reads.get() or model._meta.app_label in _UNROUTED_APP_LABELS:
+            return DEFAULT_DB_ALIAS
+        state = _request_state.get()
+        if state is not None and (state.pinned or state.wrote):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and model._meta.app_label not in _UNROUTED_APP_LABELS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_REPLICAS', ())}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+# ----------------------------
+# MIDDLEWARE
+# ----------------------------
+class ReplicaPinMiddleware:
+    """Pin a client's reads to the primary for a while after it writes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', ()):
+            return self.get_response(request)
+
+        try:
+            pinned = float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        state = _RequestState(pinned)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        if state.wrote:
+            window = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                PIN_COOKIE, str(int(time.time() + window)), max_age=window,
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
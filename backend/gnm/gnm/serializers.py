@@ -0,0 +1,80 @@
+# gnm/serializers.py
+"""
+Sparse fieldsets for ModelSerializers.
+
+With SparseFieldsetsMixin a serializer takes ``fields`` and ``omit``
+lists; fields that are left out are removed before anything is
+serialized, so their SerializerMethodFields are never called. for_request()
+reads them from ``?fields=a,b`` and ``?omit=c`` and also narrows the
+queryset with only() to the columns the remaining fields read:
+
+    serializer = BookingSerializer.for_request(bookings, request)
+
+Fields whose columns cannot be derived from their source (method fields,
+properties) list them in ``Meta.field_sources``; one that has no entry
+there leaves the SELECT as it is. Unknown names are a 400.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def _names(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else None
+
+
+class SparseFieldsetsMixin:
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and not omit:
+            return
+        existing = set(self.fields)
+        unknown = (set(fields or ()) | set(omit or ())) - existing
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': [f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                           f"Available: {', '.join(self.fields)}."],
+            })
+        keep = existing if fields is None else set(fields)
+        for name in existing - keep | set(omit or ()):
+            self.fields.pop(name)
+
+    @classmethod
+    def for_request(cls, queryset, request, **kwargs):
+        """many=True serializer of ``queryset`` for the request's ?fields= and ?omit="""
+        sparse = {
+            'fields': _names(request.query_params.get('fields')),
+            'omit': _names(request.query_params.get('omit')),
+        }
+        if sparse['fields'] is not None or sparse['omit']:
+            queryset = cls(context=kwargs.get('context', {}), **sparse).narrow(queryset)
+        return cls(queryset, many=True, **sparse, **kwargs)
+
+    def columns(self):
+        """Model field paths the current fields read, or None if that cannot be told"""
+        model = self.Meta.model
+        sources = getattr(self.Meta, 'field_sources', {})
+        columns = {model._meta.pk.name}
+        for name, field in self.fields.items():
+            if name in sources:
+                columns.update(sources[name])
+                continue
+            if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+                return None
+            try:
+                model._meta.get_field(field.source_attrs[0])
+            except FieldDoesNotExist:
+                return None
+            columns.add('__'.join(field.source_attrs))
+        return columns
+
+    def narrow(self, queryset):
+        """``queryset`` loading only the columns the current fields read"""
+        columns = self.columns()
+        if columns is None:
+            return queryset
+        # Relations that are read must be joined, and the others not
+        related = {path.split('__')[0] for path in columns if '__' in path}
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
@@ -2,7 +2,10 @@
 Django settings for gnm project.
 """
 
+import copy
 import os
+import tempfile
+from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 from decouple import config
@@ -27,6 +30,14 @@ AUTH_USER_MODEL = 'profile.CustomUser'
 AXES_FAILURE_LIMIT = 5
 AXES_COOLOFF_TIME = 1  # hours
 AXES_LOCKOUT_URL = '/locked'
+# CookieLoginView enforces the same limits from cache counters (accounts/lockout.py).
+# Optionally a single IP may fail LOGIN_LOCKOUT_IP_FAILURE_LIMIT times across all
+# accounts; off by default, since a wrong client address would let anyone lock
+# everybody out
+LOGIN_LOCKOUT_IP_FAILURE_LIMIT = int(os.getenv("LOGIN_LOCKOUT_IP_FAILURE_LIMIT", "0")) or None
+# Reverse proxies in front of Django that append to X-Forwarded-For (1 behind
+# nginx); 0 uses REMOTE_ADDR, which behind a proxy is the proxy's address
+LOGIN_LOCKOUT_TRUSTED_PROXIES = int(os.getenv("LOGIN_LOCKOUT_TRUSTED_PROXIES", "0"))
 AUTHENTICATION_BACKENDS = [
     'axes.backends.AxesStandaloneBackend',
     'django.contrib.auth.backends.ModelBackend',
@@ -35,16 +46,40 @@ AUTHENTICATION_BACKENDS = [
 # MEDIA FILES (UPLOADS)
 # ----------------------------
 MEDIA_URL = '/media/'
+# Created at start-up by gnm.warmup, not on every settings import
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Ensure the media directory exists
-os.makedirs(MEDIA_ROOT, exist_ok=True)
+# How MEDIA_URL is served (gnm/media.py): 'accel' hands the file to nginx with
+# X-Accel-Redirect, 'sendfile' to Apache/lighttpd with X-Sendfile, and
+# 'django' streams it from the app server
+MEDIA_SERVE_MODE = os.getenv("MEDIA_SERVE_MODE", "django")
+# nginx `internal` location aliased to MEDIA_ROOT
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+# Only files in these MEDIA_ROOT directories are served
+MEDIA_PUBLIC_DIRS = ('profile_images',)
 
 # Maximum upload size (5MB)
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024
 
 # Allowed image formats
 ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
+# Upload file names must end in one of these, whatever the bytes are
+ALLOWED_IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp']
+
+# Profile images are streamed to disk and capped while reading (profile/uploadhandlers.py)
+PROFILE_IMAGE_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+# Uploads are decoded in the worker pool; larger images are rejected unread
+PROFILE_IMAGE_MAX_PIXELS = 40_000_000
+PROFILE_IMAGE_VERIFY_TIMEOUT = 10
+
+# Square WebP/JPEG copies rendered after each profile image upload (profile/variants.py)
+PROFILE_IMAGE_VARIANT_SIZES = (64, 128, 512)
+# Worker processes per web worker for rendering; 0 renders inline (and deletes
+# replaced images on the request thread after commit)
+PROFILE_IMAGE_WORKERS = int(os.getenv("PROFILE_IMAGE_WORKERS", "2"))
+# Image files saved within this many seconds are never deleted, as an upload
+# of the same bytes may not have committed yet; gc_media's default --min-age
+PROFILE_IMAGE_MIN_AGE = 3600
 
 # ----------------------------
 # INSTALLED APPS
@@ -61,6 +96,7 @@ INSTALLED_APPS = [
     'django.contrib.sites',
 
     # Local apps
+    'gnm',
     'app1',
     'accounts.apps.AccountsConfig',
     'profile',
@@ -84,6 +120,12 @@ SITE_ID = 1
 # MIDDLEWARE
 # ----------------------------
 MIDDLEWARE = [
+    'gnm.middleware.RequestIdMiddleware',
+    'gnm.metrics.MetricsMiddleware',
+    'gnm.timing.ServerTimingMiddleware',
+    'gnm.compression.APICompressionMiddleware',
+    'gnm.nplusone.NPlusOneMiddleware',
+    'gnm.routers.ReplicaPinMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -153,25 +195,88 @@ SESSION_COOKIE_AGE = 1209600  # 2 weeks
 # ----------------------------
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # django.db.backends.mysql with a per-process connection pool
+        # (gnm/mysql_pool); CONN_MAX_AGE stays 0 so requests return connections
+        'ENGINE': 'gnm.mysql_pool',
         'NAME': os.getenv("DB_NAME"),
         'USER': os.getenv("DB_USER"),
         'PASSWORD': os.getenv("DB_PASSWORD"),
         'HOST': os.getenv("DB_HOST"),
         'PORT': os.getenv("DB_PORT"),
+        'OPTIONS': {
+            'pool': {
+                # Per worker process; keep workers * max_size under max_connections
+                'max_size': int(os.getenv("DB_POOL_SIZE", "10")),
+                'timeout': 10,
+                # Below MySQL's wait_timeout, so the server never drops one first
+                'max_lifetime': 1800,
+                'idle_timeout': 300,
+                'pre_ping_after': 5,
+            },
+        },
     }
 }
 
+# Read replicas (gnm/routers.py): DB_REPLICA_HOSTS="host1,host2" adds the
+# aliases replica1, replica2 with the primary's credentials. Views wrapped in
+# use_replica() read from them unless the client wrote in the last
+# REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), start=1):
+    DATABASES[f"replica{_index}"] = {
+        **copy.deepcopy(DATABASES['default']),
+        'HOST': _host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f"replica{_index}")
+DATABASE_ROUTERS = ['gnm.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+
 # ----------------------------
 # CACHE CONFIGURATION
 # ----------------------------
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        # In-process LRU in front of a database table shared by all workers
+        # (gnm/cache.py); the table is created by the gnm migrations
+        'BACKEND': 'gnm.cache.TwoTierCache',
+        'LOCATION': 'gnm_cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+            'L1_MAX_ENTRIES': 1000,
+            # Seconds another worker's change may go unseen
+            'L1_TIMEOUT': 5,
+            # Counters, locks, security state and documents that are
+            # invalidated on write must be exact on every worker
+            'L1_EXCLUDE_PREFIXES': (
+                'login_failures:', 'jwt_revoked', 'oauth_code:', 'form_dup:',
+                'profile_doc:',
+            ),
+        },
     }
 }
 
+# ----------------------------
+# DATA RETENTION
+# ----------------------------
+# Days rows are kept before manage.py purge_retention deletes them
+# (gnm/retention.py); sessions go as soon as they expire. A policy
+# missing here is never purged.
+RETENTION_DAYS = {
+    'sessions': 0,
+    'axes_attempts': 30,
+    'axes_access_logs': 90,
+    'axes_failure_logs': 90,
+    'contact_messages': 365,
+    'quarantined_submissions': 30,
+}
+# Rows per DELETE and seconds to pause between them
+RETENTION_CHUNK_SIZE = 1000
+RETENTION_CHUNK_PAUSE = 0.1
+# Purging waits while any replica is further behind than this many seconds
+RETENTION_MAX_REPLICA_LAG = 5
+
 # ----------------------------
 # AUTHENTICATION & REST FRAMEWORK
 # ----------------------------
@@ -187,6 +292,14 @@ REST_USE_JWT = True
 JWT_AUTH_COOKIE = "access"
 JWT_AUTH_REFRESH_COOKIE = "refresh"
 
+# Lifetimes match the cookie max_age values set by the auth views
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+}
+# CookieTokenRefreshView rotates refresh tokens itself, retiring the old one
+# in the cache denylist (accounts/revocation.py)
+
 # REST Framework Configuration (COMBINED - only one definition)
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -195,13 +308,24 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
+    # orjson with JSONRenderer/JSONParser-identical output (gnm/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'gnm.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'gnm.parsers.ORJSONParser',
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
 }
 
+# /api/ responses of at least this many bytes are compressed (gnm/compression.py);
+# brotli is used when the optional brotli package is installed
+API_COMPRESSION_MIN_SIZE = 1024
+API_COMPRESSION_GZIP_LEVEL = 6
+API_COMPRESSION_BROTLI_QUALITY = 4
+
 # Override dj-rest-auth serializers to use your custom ones
 REST_AUTH = {
     'USER_DETAILS_SERIALIZER': 'profile.serializers.UserSerializer',
@@ -297,11 +421,15 @@ if not DEBUG:
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 GOOGLE_REDIRECT_URI = "http://localhost:8000/accounts/google/login/callback/"
+# Endpoints of the OAuth code exchange (stubbed by the load test)
+GOOGLE_TOKEN_URL = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+GOOGLE_USERINFO_URL = os.getenv("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v2/userinfo")
 
 # ----------------------------
 # EMAIL CONFIGURATION
 # ----------------------------
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# SMTP backend with Server-Timing instrumentation
+EMAIL_BACKEND = 'gnm.timing.TimedSMTPBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -309,25 +437,83 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = 'GNM Events <gnmevents95@gmail.com>'
 
+# ----------------------------
+# FORM SPAM FILTER
+# ----------------------------
+# Contact and booking submissions scoring this much are quarantined
+# unsent (app1/spam.py); above two spam words plus a link
+SPAM_SCORE_THRESHOLD = 6
+# Form field hidden from people; bots fill it in
+SPAM_HONEYPOT_FIELD = 'website'
+# Seconds a person needs at least to fill in a form after loading it
+SPAM_MIN_FILL_SECONDS = 3
+# Seconds a form token stays valid
+SPAM_TOKEN_MAX_AGE = 2 * 60 * 60
+# Seconds an identical submission is treated as a duplicate
+SPAM_DUPLICATE_WINDOW = 10 * 60
+
 # ----------------------------
 # LOGGING CONFIGURATION
 # ----------------------------
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Records below WARNING one request may emit before further ones are dropped
+LOG_RECORDS_PER_REQUEST = 200
+# Fraction of requests that get a Server-Timing header and a timing log line
+# (gnm/timing.py); cheap enough to leave on in production
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv("SERVER_TIMING_SAMPLE_RATE", "0.05"))
+# Send the Server-Timing header to every client, not only to staff users
+# (always sent when DEBUG)
+SERVER_TIMING_PUBLIC = os.getenv("SERVER_TIMING_PUBLIC", "False").lower() in ('true', '1', 'yes')
+# Per-worker metric files summed by /api/metrics/ (gnm/metrics.py); shared by
+# all workers of one server and cleared when it starts (gunicorn.conf.py)
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "gnm-metrics"))
+# Seconds between writes of a worker's metric file
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+# Repeated same-shape queries in one request (gnm/nplusone.py): 'warn', 'raise'
+# or '' for off
+NPLUSONE_DETECTOR = os.getenv("NPLUSONE_DETECTOR", "warn" if DEBUG else "")
+NPLUSONE_THRESHOLD = 3
+
+# Records are filtered and queued on the request thread; JSON formatting and
+# the stream write happen on a QueueListener thread (see gnm/log.py)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'gnm.log.RequestIdFilter',
+        },
+        'sampling': {
+            '()': 'gnm.log.SamplingFilter',
+            # Fraction of DEBUG records kept per logger
+            'rates': {
+                'accounts': 0.1,
+                'profile': 0.1,
+                'app1': 0.1,
+            },
+        },
+    },
+    'formatters': {
+        'json': {
+            '()': 'gnm.log.JSONFormatter',
+        },
+    },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            '()': 'gnm.log.AsyncQueueHandler',
+            'formatter': 'json',
+            'filters': ['request_id', 'sampling'],
+            'maxsize': 10000,
         },
     },
     'root': {
         'handlers': ['console'],
-        'level': 'INFO',
+        'level': LOG_LEVEL,
     },
     'loggers': {
         'accounts': {
             'handlers': ['console'],
-            'level': 'INFO',
+            'level': LOG_LEVEL,
             'propagate': False,
         },
     },
@@ -0,0 +1,58 @@
+# gnm/settings_loadtest.py
+"""
+Settings for the local server of the load test.
+
+Production settings over plain HTTP, with mail going to the SMTP sink
+and the Google code exchange to the OAuth stub that manage.py loadtest
+starts (it passes their ports in the environment):
+
+    python manage.py loadtest --settings=gnm.settings_loadtest
+
+The database is a SQLite file unless LOADTEST_DATABASE=mysql, which
+keeps the MySQL configuration of gnm.settings; SQLite serialises writes,
+so only MySQL numbers say anything about production.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("SECRET_KEY", "insecure-loadtest-key")
+# Request logs would cost the server more than some of the steps
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from .settings import *  # noqa: E402,F401,F403
+
+# Lets manage.py loadtest migrate and seed this database
+LOADTEST = True
+
+DEBUG = False
+# The load test speaks plain HTTP to the server
+SECURE_SSL_REDIRECT = False
+SECURE_HSTS_SECONDS = 0
+SESSION_COOKIE_SECURE = False
+CSRF_COOKIE_SECURE = False
+
+# ----------------------------
+# DATABASE
+# ----------------------------
+if os.getenv("LOADTEST_DATABASE") != "mysql":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("LOADTEST_DB_PATH", os.path.join(tempfile.gettempdir(), "gnm-loadtest.sqlite3")),
+            # Writers queue for the lock instead of failing
+            'OPTIONS': {'timeout': 30},
+        },
+    }
+    DATABASE_REPLICAS = []
+
+# ----------------------------
+# STUBBED SERVICES
+# ----------------------------
+EMAIL_HOST = '127.0.0.1'
+EMAIL_PORT = int(os.getenv("LOADTEST_SMTP_PORT", "2525"))
+EMAIL_USE_TLS = False
+EMAIL_HOST_USER = 'loadtest@loadtest.example'
+EMAIL_HOST_PASSWORD = ''
+GOOGLE_CLIENT_ID = 'loadtest'
+GOOGLE_CLIENT_SECRET = 'loadtest'
+# GOOGLE_TOKEN_URL and GOOGLE_USERINFO_URL come from the environment
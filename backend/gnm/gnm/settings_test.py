@@ -0,0 +1,60 @@
+# gnm/settings_test.py
+"""
+Settings for the test and benchmark suites.
+
+Runs without MySQL, SMTP or any environment variables:
+
+    python manage.py test --settings=gnm.settings_test
+"""
+import os
+
+os.environ.setdefault("SECRET_KEY", "insecure-test-key")
+
+from .settings import *  # noqa: E402,F401,F403
+
+# The test client speaks plain HTTP
+SECURE_SSL_REDIRECT = False
+SECURE_HSTS_SECONDS = 0
+SESSION_COOKIE_SECURE = False
+CSRF_COOKIE_SECURE = False
+
+# ----------------------------
+# DATABASE
+# ----------------------------
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    # Stand-in read replica, used by tests that set DATABASE_REPLICAS
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+DATABASE_REPLICAS = []
+
+# ----------------------------
+# FAST, LOCAL SERVICES
+# ----------------------------
+# Hashing cost is not what the suite measures
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+# The production two-tier cache, so endpoint query budgets include the
+# queries its database tier sends; 'shared' names it for the cache tests
+CACHES = {
+    'default': CACHES['default'],  # noqa: F405
+    'shared': CACHES['default'],  # noqa: F405
+}
+# Render image variants and delete files inline
+PROFILE_IMAGE_WORKERS = 0
+# Keep metrics in memory; tests that need worker files set a directory
+METRICS_DIR = ''
+# A request that repeats a query shape fails its test
+NPLUSONE_DETECTOR = 'raise'
+
+# Keep test output readable
+LOGGING['root']['level'] = os.getenv("LOG_LEVEL", "ERROR")  # noqa: F405
+LOGGING['loggers']['accounts']['level'] = os.getenv("LOG_LEVEL", "ERROR")  # noqa: F405
+# 4xx responses the tests provoke on purpose
+LOGGING['loggers']['django.request'] = {'level': os.getenv("LOG_LEVEL", "ERROR")}  # noqa: F405
@@ -0,0 +1,1133 @@
+import builtins
+import datetime
+import decimal
+import gc
+import gzip
+import io
+import json
+import logging
+import statistics
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.contrib.sessions.models import Session
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+
+from app1.models import Booking, ContactMessage
+from app1.serializers import BookingSerializer
+from profile.serializers import UserSerializer
+
+from .benchmark import seed
+from .cache import SharedDatabaseCache, TwoTierCache
+from .compression import choose_encoding, compress
+from .loadtest.runner import run_load
+from .log import AsyncQueueHandler, JSONFormatter, SamplingFilter, end_request, request_id, start_request
+from .loadtest.stubs import GoogleOAuthStub, SMTPSink
+from .metrics import (
+    LATENCY_BUCKETS, QUERY_BUCKETS, MetricsMiddleware, MetricsStore, archive_worker, clear_metrics_dir, collect,
+    render, store,
+)
+from .middleware import RequestIdMiddleware
+from .mysql_pool.pool import ConnectionPool, PoolTimeout
+from .routers import PIN_COOKIE, ReplicaRouter, use_replica
+from .nplusone import Detector, NPlusOneError, NPlusOneMiddleware, NPlusOneTestMixin, fingerprint
+from .parsers import ORJSONParser
+from .queryplan import normalise_mysql, normalise_sqlite, explain, regressions
+from .retention import Purger, get_policy
+from .renderers import ORJSONRenderer
+from .timing import ServerTimingMiddleware, record, timed
+from .warmup import profile_startup, warm_up
+
+HASHED_NAME = 'profile_images/ab/' + 'ab' * 32 + '.jpg'
+
+
+class MediaServingTests(SimpleTestCase):
+    """GET /media/<path> through gnm.media.serve_media"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.content = bytes(range(256)) * 40
+        for name in (HASHED_NAME, 'profile_images/old.jpg', 'profile_images/.upload-x.jpg', 'private/notes.txt',
+                     'profile_images/evil.html', 'profile_images/evil.svg'):
+            path = os.path.join(self.media_root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(self.content)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, MEDIA_SERVE_MODE='django')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def refuse_media_reads(self):
+        """Patch open() so that opening any file in MEDIA_ROOT fails the test"""
+        real_open = builtins.open
+
+        def guarded_open(file, *args, **kwargs):
+            if os.fspath(file).startswith(self.media_root):
+                raise AssertionError(f'{file} was opened')
+            return real_open(file, *args, **kwargs)
+        return mock.patch('builtins.open', guarded_open)
+
+    def get(self, name, **headers):
+        return self.client.get('/media/' + name, headers=headers)
+
+    def test_streams_file_with_validators(self):
+        response = self.get(HASHED_NAME)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(response['ETag'])
+
+    def test_only_image_types_are_served_inline(self):
+        for mode in ('django', 'accel', 'sendfile'):
+            with self.subTest(mode=mode), override_settings(MEDIA_SERVE_MODE=mode):
+                response = self.get(HASHED_NAME)
+                self.assertEqual(response['Content-Type'], 'image/jpeg')
+                self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+                self.assertNotIn('attachment', response.get('Content-Disposition', ''))
+                response.close()
+                for name in ('profile_images/evil.html', 'profile_images/evil.svg'):
+                    response = self.get(name)
+                    self.assertEqual(response['Content-Type'], 'application/octet-stream')
+                    self.assertEqual(response['Content-Disposition'], 'attachment')
+                    self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+                    response.close()
+
+    def test_unhashed_name_must_revalidate(self):
+        response = self.get('profile_images/old.jpg')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        response.close()
+
+    def test_if_none_match_returns_304(self):
+        etag = self.get(HASHED_NAME)['ETag']
+        response = self.get(HASHED_NAME, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_request(self):
+        response = self.get(HASHED_NAME, range='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+    def test_suffix_range_request(self):
+        response = self.get(HASHED_NAME, range='bytes=-10')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HASHED_NAME, range=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_stale_if_range_sends_full_file(self):
+        response = self.get(HASHED_NAME, range='bytes=0-9', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_access_checks(self):
+        for name in ('profile_images/.upload-x.jpg', 'private/notes.txt', 'profile_images/../private/notes.txt',
+                     'profile_images/missing.jpg', 'profile_images/ab'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+        self.assertEqual(self.client.post('/media/' + HASHED_NAME).status_code, 405)
+
+    def test_accel_redirect_reads_no_file_bytes(self):
+        with override_settings(MEDIA_SERVE_MODE='accel', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/'), \
+                self.refuse_media_reads():
+            response = self.get(HASHED_NAME)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + HASHED_NAME)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_sendfile_reads_no_file_bytes(self):
+        with override_settings(MEDIA_SERVE_MODE='sendfile'), self.refuse_media_reads():
+            response = self.get(HASHED_NAME)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, HASHED_NAME))
+
+    def test_proxy_mode_still_checks_access(self):
+        with override_settings(MEDIA_SERVE_MODE='accel'):
+            response = self.get('private/notes.txt')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('X-Accel-Redirect', response)
+
+
+def log_record(message, level=logging.INFO, name='gnm.test', args=(), exc_info=None, **extra):
+    record_ = logging.LogRecord(name, level, __file__, 1, message, args, exc_info)
+    record_.__dict__.update(extra)
+    return record_
+
+
+class LoggingTests(SimpleTestCase):
+    """The gnm.log pipeline and RequestIdMiddleware"""
+
+    def handler(self, **kwargs):
+        stream = io.StringIO()
+        handler = AsyncQueueHandler(stream, **kwargs)
+        handler.setFormatter(JSONFormatter())
+        self.addCleanup(handler.stop)
+        return handler, stream
+
+    def lines(self, handler, stream):
+        handler.stop()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_records_are_written_by_the_listener(self):
+        handler, stream = self.handler()
+        args = ['before']
+        handler.emit(log_record('value %s', args=(args,)))
+        # Args are bound when the record is queued
+        args[0] = 'after'
+        self.assertEqual([line['message'] for line in self.lines(handler, stream)], ["value ['before']"])
+        self.assertEqual(handler.stats()['enqueued'], 1)
+
+    def test_full_queue_drops_records(self):
+        handler, _ = self.handler(maxsize=1)
+        with mock.patch.object(handler, '_ensure_listener'):
+            handler.emit(log_record('one'))
+            handler.emit(log_record('two'))
+        self.assertEqual((handler.enqueued, handler.dropped), (1, 1))
+
+    @override_settings(LOG_RECORDS_PER_REQUEST=2)
+    def test_per_request_cap_spares_warnings(self):
+        handler, stream = self.handler()
+        tokens = start_request('r1')
+        try:
+            for level in (logging.INFO, logging.INFO, logging.INFO, logging.WARNING, logging.ERROR):
+                handler.emit(log_record(logging.getLevelName(level), level))
+        finally:
+            end_request(tokens)
+        self.assertEqual([line['level'] for line in self.lines(handler, stream)], ['INFO', 'INFO', 'WARNING', 'ERROR'])
+        self.assertEqual(handler.dropped, 1)
+
+    def test_forked_process_gets_a_new_queue(self):
+        handler, _ = self.handler()
+        handler.emit(log_record('parent'))
+        inherited, parent_listener = handler.queue, handler.listener
+        with mock.patch('gnm.log.os.getpid', return_value=-1):
+            handler.emit(log_record('child'))
+            self.assertIsNot(handler.queue, inherited)
+            self.assertIsNot(handler.listener, parent_listener)
+            handler.stop()
+        parent_listener.stop()
+
+    def test_sampling_filter(self):
+        sampling = SamplingFilter({'accounts': 0.0, 'accounts.views': 1.0, 'app1': 0.5})
+        self.assertFalse(sampling.filter(log_record('x', logging.DEBUG, 'accounts.lockout')))
+        self.assertTrue(sampling.filter(log_record('x', logging.DEBUG, 'accounts.views')))
+        # Only records up to max_level are sampled
+        self.assertTrue(sampling.filter(log_record('x', logging.INFO, 'accounts.lockout')))
+        self.assertTrue(sampling.filter(log_record('x', logging.WARNING, 'accounts.lockout')))
+        with mock.patch('gnm.log.random.random', side_effect=[0.4, 0.6]):
+            self.assertTrue(sampling.filter(log_record('x', logging.DEBUG, 'app1.views')))
+            self.assertFalse(sampling.filter(log_record('x', logging.DEBUG, 'app1.views')))
+
+    def test_json_formatter(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            exc_info = sys.exc_info()
+        line = json.loads(JSONFormatter().format(
+            log_record('hello %s', logging.ERROR, 'gnm.x', args=('you',), exc_info=exc_info,
+                       request_id='abc', user_id=7)
+        ))
+        self.assertRegex(line.pop('ts'), r'^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{3}Z$')
+        self.assertIn('ValueError: boom', line.pop('exc_info'))
+        self.assertEqual(line, {
+            'level': 'ERROR', 'logger': 'gnm.x', 'request_id': 'abc', 'message': 'hello you', 'user_id': 7,
+        })
+
+    def test_request_id_middleware(self):
+        seen = []
+
+        def view(request):
+            seen.append(request_id.get())
+            return HttpResponse()
+
+        middleware = RequestIdMiddleware(view)
+        response = middleware(RequestFactory().get('/', HTTP_X_REQUEST_ID='proxy-id.1'))
+        self.assertEqual((response['X-Request-ID'], seen[-1]), ('proxy-id.1', 'proxy-id.1'))
+        response = middleware(RequestFactory().get('/', HTTP_X_REQUEST_ID='bad id\n'))
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+        self.assertEqual(seen[-1], response['X-Request-ID'])
+        self.assertEqual(request_id.get(), '-')
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+class ServerTimingTests(TestCase):
+    """Server-Timing header and timing log line from ServerTimingMiddleware"""
+
+    def setUp(self):
+        cache.clear()
+        # The header only goes to staff
+        user = get_user_model().objects.create_user('t@example.com', 't@example.com', 'pw123456789', is_staff=True)
+        self.client.cookies['access'] = str(AccessToken.for_user(user))
+
+    def metrics(self, response):
+        found = {}
+        for part in response['Server-Timing'].split(', '):
+            name, *params = part.split(';')
+            found[name] = dict(p.split('=', 1) for p in params)
+        return found
+
+    def test_breaks_down_a_sampled_request(self):
+        with CaptureQueriesContext(connection) as queries, \
+                self.assertLogs('gnm.timing', 'INFO') as logs:
+            response = self.client.get('/api/auth/custom/me/')
+        metrics = self.metrics(response)
+        app_queries = [q for q in queries if settings.CACHES['default']['LOCATION'] not in q['sql']]
+        self.assertEqual(metrics['db']['desc'], f'"{len(app_queries)}"')
+        self.assertIn('cache', metrics)
+        self.assertIn('serialize', metrics)
+        self.assertGreaterEqual(float(metrics['total']['dur']), float(metrics['db']['dur']))
+        record_ = logs.records[0]
+        self.assertEqual(record_.path, '/api/auth/custom/me/')
+        self.assertEqual(record_.db_count, len(app_queries))
+
+    def test_cache_queries_count_once(self):
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('gnm.timing', 'INFO') as logs:
+            self.client.get('/api/auth/custom/me/')
+        self.assertTrue(any(settings.CACHES['default']['LOCATION'] in q['sql'] for q in queries))
+        record_ = logs.records[0]
+        self.assertLess(record_.db_count, len(queries))
+        self.assertLessEqual(record_.db_ms + record_.cache_ms, record_.duration_ms)
+
+    def test_header_only_for_staff(self):
+        user = get_user_model().objects.create_user('u@example.com', 'u@example.com', 'pw123456789')
+        self.client.cookies['access'] = str(AccessToken.for_user(user))
+        with self.assertLogs('gnm.timing', 'INFO'):
+            response = self.client.get('/api/auth/custom/me/')
+        self.assertNotIn('Server-Timing', response)
+        with override_settings(SERVER_TIMING_PUBLIC=True), self.assertLogs('gnm.timing', 'INFO'):
+            self.assertIn('Server-Timing', self.client.get('/api/auth/custom/me/'))
+
+    def test_header_check_does_not_load_the_user(self):
+        staff = get_user_model().objects.get(email='t@example.com')
+        middleware = ServerTimingMiddleware(None)
+        request = RequestFactory().get('/')
+        request.user = SimpleLazyObject(mock.Mock(side_effect=AssertionError("user loaded")))
+        with self.assertNumQueries(0):
+            self.assertFalse(middleware.send_header(request))
+        # Once the middleware's lazy user was evaluated it is cached on the request
+        request._cached_user = staff
+        self.assertTrue(middleware.send_header(request))
+
+    @override_settings(EMAIL_BACKEND='gnm.timing.TimedSMTPBackend')
+    def test_smtp_time_is_recorded(self):
+        with mock.patch('smtplib.SMTP') as smtp:
+            smtp.return_value.sendmail.return_value = {}
+            response = self.client.post('/api/contact/', {
+                'name': 'A', 'email': 'a@example.com', 'subject': 'S', 'message': 'M',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(smtp.return_value.sendmail.called)
+        self.assertEqual(self.metrics(response)['smtp']['desc'], '"1"')
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_untouched(self):
+        response = self.client.get('/api/auth/custom/me/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_timed_is_a_no_op_outside_sampled_requests(self):
+        with timed('smtp'):
+            record('db', 1.0)
+
+    def test_header_format(self):
+        header = ServerTimingMiddleware(None).header({'db': [3, 0.0125], 'google': [2, 0.3]}, 0.5)
+        self.assertEqual(header, 'db;dur=12.50;desc="3", google;dur=300.00;desc="2", total;dur=500.00')
+
+
+class MetricsTests(TestCase):
+    """Request metrics from MetricsMiddleware, exposed at /api/metrics/"""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        store._reset()
+        User = get_user_model()
+        self.user = User.objects.create_user('m@example.com', 'm@example.com', 'pw123456789')
+        self.staff = User.objects.create_user('s@example.com', 's@example.com', 'pw123456789', is_staff=True)
+
+    def get_as(self, user, url):
+        self.client.cookies['access'] = str(AccessToken.for_user(user))
+        return self.client.get(url)
+
+    def scrape(self):
+        response = self.get_as(self.staff, '/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_counts_requests_and_cache_lookups(self):
+        self.get_as(self.user, '/api/auth/custom/me/')
+        self.get_as(self.user, '/api/auth/custom/me/')
+        body = self.scrape()
+        self.assertIn(
+            'gnm_http_requests_total{method="GET",status="200",view="api/auth/custom/me/"} 2', body
+        )
+        self.assertIn('gnm_http_request_duration_seconds_count{view="api/auth/custom/me/"} 2', body)
+        self.assertIn('gnm_http_request_queries_bucket{view="api/auth/custom/me/",le="+Inf"} 2', body)
+        self.assertIn('gnm_cache_requests_total{cache="profile_document",result="hit"} 1', body)
+        self.assertIn('gnm_cache_requests_total{cache="profile_document",result="miss"} 1', body)
+        self.assertIn('# TYPE gnm_http_request_duration_seconds histogram', body)
+
+    def test_unknown_methods_share_one_label(self):
+        for method in ('FOO', 'BAR'):
+            self.client.generic(method, '/api/auth/custom/me/')
+        body = self.scrape()
+        self.assertIn('gnm_http_requests_total{method="other",status="401",view="api/auth/custom/me/"} 2', body)
+        self.assertNotIn('method="FOO"', body)
+
+    def test_staff_only(self):
+        self.assertEqual(self.get_as(self.user, '/api/metrics/').status_code, 403)
+        self.client.cookies.clear()
+        self.assertIn(self.client.get('/api/metrics/').status_code, (401, 403))
+
+    def test_sums_the_files_of_all_workers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        other_worker = {
+            'counters': [['gnm_http_requests_total',
+                          [['method', 'GET'], ['status', '200'], ['view', 'api/auth/custom/me/']], 5]],
+            'histograms': [],
+        }
+        with open(os.path.join(directory, 'metrics-1.json'), 'w') as f:
+            json.dump(other_worker, f)
+
+        with override_settings(METRICS_DIR=directory):
+            self.get_as(self.user, '/api/auth/custom/me/')
+            body = self.scrape()
+        self.assertIn(
+            'gnm_http_requests_total{method="GET",status="200",view="api/auth/custom/me/"} 6', body
+        )
+        self.assertTrue(os.path.exists(os.path.join(directory, f'metrics-{os.getpid()}.json')))
+
+    def test_exited_workers_are_archived(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for pid, count in ((1, 5), (2, 7), (3, 1)):
+            with open(os.path.join(directory, f'metrics-{pid}.json'), 'w') as f:
+                json.dump({'counters': [['requests', [['view', 'a']], count]],
+                           'histograms': [['queries', [['view', 'a']], [1, 5], [count, 0, count, count]]]}, f)
+
+        with override_settings(METRICS_DIR=directory):
+            before = collect()
+            archive_worker(1)
+            archive_worker(2)
+            archive_worker(2)
+            self.assertEqual(collect(), before)
+            self.assertEqual(before[0][('requests', (('view', 'a'),))], 13)
+            # This process's own file exists only if it has recorded anything
+            self.assertCountEqual(
+                [name for name in os.listdir(directory)
+                 if name.endswith('.json') and name != f'metrics-{os.getpid()}.json'],
+                ['metrics-3.json', 'metrics-archive.json'],
+            )
+            clear_metrics_dir()
+            self.assertEqual(collect(), ({}, {}))
+
+    def test_process_that_served_nothing_writes_no_file(self):
+        # gunicorn's preloading master exits without a child_exit to archive it
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(METRICS_DIR=directory):
+            MetricsStore().flush()
+        self.assertEqual(os.listdir(directory), [])
+
+    def test_replica_queries_are_counted(self):
+        def view(request):
+            for alias in ('default', 'replica'):
+                with connections[alias].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.resolver_match = None
+        MetricsMiddleware(view)(request)
+        entry = store.histograms[('gnm_http_request_queries', (('view', '<unmatched>'),), QUERY_BUCKETS)]
+        self.assertEqual(entry[-2:], [2, 1])
+
+    def test_histogram_buckets_are_cumulative(self):
+        store.observe('latency', {'view': 'a"b'}, 0.02, LATENCY_BUCKETS)
+        store.observe('latency', {'view': 'a"b'}, 3, LATENCY_BUCKETS)
+        store.observe('latency', {'view': 'a"b'}, 60, LATENCY_BUCKETS)
+        snapshot = store.snapshot()['histograms'][0]
+        body = render({}, {('latency', tuple(map(tuple, snapshot[1])), tuple(snapshot[2])): snapshot[3]})
+        self.assertIn('latency_bucket{view="a\\"b",le="0.01"} 0', body)
+        self.assertIn('latency_bucket{view="a\\"b",le="0.025"} 1', body)
+        self.assertIn('latency_bucket{view="a\\"b",le="5"} 2', body)
+        self.assertIn('latency_bucket{view="a\\"b",le="+Inf"} 3', body)
+        self.assertIn('latency_sum{view="a\\"b"} 63.02', body)
+
+
+class NPlusOneTests(TestCase):
+    """Repeated query detection in gnm.nplusone"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(4):
+            user = get_user_model().objects.create_user(f'n{i}@example.com', f'n{i}@example.com', 'pw123456789')
+            Booking.objects.create(
+                user=user, name='N', email=user.email, phone='9876543210', eventType='wedding',
+                eventDate='2026-06-01', venue='Hall', guestCount=10, budget='1L',
+            )
+
+    def test_fingerprint_collapses_values(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'x''y' AND pk IN (%s, %s, %s)"),
+            fingerprint("SELECT * FROM t WHERE id = 7 AND name = 'z' AND pk IN (%s)"),
+        )
+
+    def test_reports_the_serializer_field(self):
+        detector = Detector()
+        with detector.watch():
+            BookingSerializer(Booking.objects.all(), many=True).data
+        [(shape, count, origin)] = detector.findings
+        self.assertEqual(count, 4)
+        self.assertEqual(origin, 'BookingSerializer.user_email')
+
+    def test_select_related_is_clean(self):
+        detector = Detector()
+        with detector.watch():
+            BookingSerializer(Booking.objects.select_related('user'), many=True).data
+        self.assertEqual(detector.findings, [])
+
+    def middleware(self):
+        return NPlusOneMiddleware(lambda request: [b.user.email for b in Booking.objects.all()])
+
+    @override_settings(NPLUSONE_DETECTOR='raise')
+    def test_middleware_raises(self):
+        with self.assertRaisesMessage(NPlusOneError, 'GET /bookings/'):
+            self.middleware()(RequestFactory().get('/bookings/'))
+
+    @override_settings(NPLUSONE_DETECTOR='warn')
+    def test_middleware_warns(self):
+        with self.assertLogs('gnm.nplusone', 'WARNING') as logs:
+            self.middleware()(RequestFactory().get('/bookings/'))
+        self.assertIn('4x from', logs.output[0])
+
+    def test_mixin_fails_the_test(self):
+        class Case(NPlusOneTestMixin, TestCase):
+            def runTest(self):
+                [b.user.email for b in Booking.objects.all()]
+
+        result = unittest.TestResult()
+        Case().run(result)
+        self.assertEqual(len(result.failures), 1)
+        self.assertIn('Repeated queries', result.failures[0][1])
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.ping_fails = False
+
+    def ping(self):
+        if self.ping_fails:
+            raise OSError("gone away")
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Checkout, health checks and reaping in gnm.mysql_pool.pool"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.opened = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def pool(self, **options):
+        options.setdefault('pre_ping_after', 5)
+        return ConnectionPool(self.connect, clock=lambda: self.now, **options)
+
+    def test_reuses_returned_connections(self):
+        pool = self.pool()
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(pool.stats()['reused'], 1)
+
+    def test_replaces_a_connection_that_fails_its_ping(self):
+        pool = self.pool()
+        first = pool.acquire()
+        pool.release(first)
+        first.ping_fails = True
+        self.now = 10
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['ping_failed'], 1)
+
+    def test_recently_used_connections_are_not_pinged(self):
+        pool = self.pool()
+        first = pool.acquire()
+        pool.release(first)
+        first.ping_fails = True
+        self.now = 1
+        self.assertIs(pool.acquire(), first)
+
+    def test_max_lifetime(self):
+        pool = self.pool(max_lifetime=60)
+        first = pool.acquire()
+        self.now = 61
+        pool.release(first)
+        self.assertTrue(first.closed)
+        self.assertIsNot(pool.acquire(), first)
+
+    def test_idle_connections_are_reaped_down_to_min_size(self):
+        pool = self.pool(idle_timeout=30, min_size=1)
+        connections = [pool.acquire() for _ in range(3)]
+        for connection in connections:
+            pool.release(connection)
+        self.now = 31
+        pool.release(pool.acquire())
+        self.assertEqual(sum(c.closed for c in connections), 2)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_is_bounded(self):
+        pool = ConnectionPool(self.connect, max_size=1, timeout=0.05)
+        held = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        threading.Timer(0.01, pool.release, [held]).start()
+        self.assertIs(pool.acquire(), held)
+
+    def test_threads_share_the_pool(self):
+        pool = ConnectionPool(self.connect, max_size=3, timeout=5)
+        in_use = []
+        peak = []
+        shared = []
+        lock = threading.Lock()
+
+        def work():
+            for _ in range(50):
+                connection = pool.acquire()
+                with lock:
+                    if connection in in_use:
+                        shared.append(connection)
+                    in_use.append(connection)
+                    peak.append(len(in_use))
+                time.sleep(0.0005)
+                with lock:
+                    in_use.remove(connection)
+                pool.release(connection)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(shared, [])
+        self.assertLessEqual(max(peak), 3)
+        self.assertLessEqual(len(self.opened), 3)
+        self.assertEqual(pool.stats()['in_use'], 0)
+
+    def test_failed_connect_frees_its_slot(self):
+        pool = ConnectionPool(mock.Mock(side_effect=OSError), max_size=1, timeout=0.01)
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                pool.acquire()
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    """Replica reads and read-your-writes pinning from gnm.routers"""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('r@example.com', 'r@example.com', 'pw123456789')
+        # The replica has the account but lags behind on bookings
+        self.user.save(using='replica', force_insert=True)
+        self.client.cookies['access'] = str(AccessToken.for_user(self.user))
+
+    def history(self):
+        response = self.client.get('/api/bookings/history/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def book(self):
+        return self.client.post('/api/booking/', {
+            'name': 'R', 'email': 'r@example.com', 'phone': '9876543210', 'eventType': 'wedding',
+            'eventDate': '2026-06-01', 'venue': 'Hall', 'guestCount': 10, 'budget': '1L',
+        }, content_type='application/json')
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        response = self.book()
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(len(self.history()), 1)
+
+    def test_unpinned_reads_use_the_replica(self):
+        Booking.objects.create(
+            user=self.user, name='R', email='r@example.com', phone='9876543210', eventType='wedding',
+            eventDate='2026-06-01', venue='Hall', guestCount=10, budget='1L',
+        )
+        self.assertEqual(self.history(), [])
+
+    def test_pin_expires(self):
+        self.book()
+        with mock.patch('gnm.routers.time.time', return_value=time.time() + 60):
+            self.assertEqual(self.history(), [])
+
+    def test_writes_go_to_the_primary(self):
+        replica_user = get_user_model().objects.using('replica').get(pk=self.user.pk)
+        self.assertEqual(ReplicaRouter().db_for_write(type(replica_user), instance=replica_user), 'default')
+
+    def test_cache_table_stays_on_the_primary(self):
+        entry = caches['shared'].l2.cache_model_class
+        with use_replica():
+            self.assertEqual(ReplicaRouter().db_for_read(entry), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        response = self.book()
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(len(self.history()), 1)
+
+
+class JSONRenderingTests(SimpleTestCase):
+    """ORJSONRenderer and ORJSONParser match DRF's JSON renderer and parser"""
+
+    data = {
+        'aware': datetime.datetime(2026, 6, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'offset': datetime.datetime(2026, 6, 1, 12, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=5, minutes=30))),
+        'naive': datetime.datetime(2026, 6, 1, 12, 30),
+        'date': datetime.date(2026, 6, 1),
+        'time': datetime.time(9, 15, 0, 500),
+        'duration': datetime.timedelta(minutes=90),
+        'decimal': decimal.Decimal('1234.50'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('Booking'),
+        'sizes': {64: 'a.64.webp', 128: 'a.128.webp'},
+        'text': 'Mumbai \u2028 ₹ "quoted" \u2029',
+        'nested': [{'n': None, 't': True, 'i': 2 ** 62, 'f': 1.5}, ('tuple', 1), {'set-like'}],
+        'big': 2 ** 70,
+    }
+
+    def test_same_bytes_as_drf(self):
+        self.assertEqual(ORJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_indented_output_falls_back(self):
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            ORJSONRenderer().render(self.data, media_type),
+            JSONRenderer().render(self.data, media_type),
+        )
+
+    def test_parser(self):
+        body = b'{"name": "\\u20b9 Pune", "guests": [1, 2.5, null, true]}'
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        for invalid in (b'{"a": ', b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(io.BytesIO(invalid))
+
+
+class APICompressionTests(TestCase):
+    """gzip/brotli for large /api/ responses from APICompressionMiddleware"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.accounts = seed(users=20, bookings_per_user=5, messages=0)
+
+    def setUp(self):
+        self.client.cookies['access'] = str(AccessToken.for_user(self.accounts['admin']))
+
+    def test_large_responses_are_compressed(self):
+        plain = self.client.get('/api/admin/bookings/')
+        response = self.client.get('/api/admin/bookings/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content) / 4)
+
+    def test_small_and_refused_responses_are_not(self):
+        self.assertNotIn('Content-Encoding', self.client.get('/api/auth/custom/csrf/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertNotIn(
+            'Content-Encoding', self.client.get('/api/admin/bookings/', HTTP_ACCEPT_ENCODING='gzip;q=0, br;q=0')
+        )
+
+    def test_encoding_negotiation(self):
+        self.assertEqual(choose_encoding('gzip;q=0.5, identity'), 'gzip')
+        self.assertEqual(choose_encoding('*'), 'gzip')
+        self.assertIsNone(choose_encoding('identity'))
+        self.assertIsNone(choose_encoding(''))
+
+    def test_compressed_profile_still_revalidates(self):
+        self.client.cookies['access'] = str(AccessToken.for_user(self.accounts['user']))
+        with override_settings(API_COMPRESSION_MIN_SIZE=1):
+            first = self.client.get('/api/auth/custom/me/', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertTrue(first['ETag'].startswith('W/'))
+            again = self.client.get('/api/auth/custom/me/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_benchmark_rendering_and_compression(self):
+        """Render time and bytes on the wire for the booking and user lists"""
+        lists = {
+            'bookings': BookingSerializer(Booking.objects.select_related('user'), many=True).data,
+            'users': UserSerializer(get_user_model().objects.all(), many=True).data,
+        }
+
+        def median_ms(function, *args):
+            timings = []
+            for _ in range(30):
+                start = time.perf_counter()
+                function(*args)
+                timings.append((time.perf_counter() - start) * 1000)
+            return statistics.median(timings)
+
+        print("\nJSON rendering and compression (median of 30 runs)")
+        print(f"  {'list':<10} {'rows':>5} {'json ms':>8} {'orjson ms':>10} {'bytes':>8} {'gzip':>7} {'gzip ms':>8}")
+        for name, data in lists.items():
+            body = ORJSONRenderer().render(data)
+            self.assertEqual(body, JSONRenderer().render(data))
+            drf_ms = median_ms(JSONRenderer().render, data)
+            orjson_ms = median_ms(ORJSONRenderer().render, data)
+            gzip_ms = median_ms(compress, body, 'gzip')
+            compressed = compress(body, 'gzip')
+            print(
+                f"  {name:<10} {len(data):>5} {drf_ms:>8.3f} {orjson_ms:>10.3f} "
+                f"{len(body):>8} {len(compressed):>7} {gzip_ms:>8.3f}"
+            )
+            self.assertLess(orjson_ms, drf_ms)
+            self.assertLess(len(compressed), len(body))
+
+
+class StartupTests(SimpleTestCase):
+    """warm_up() and the start-up time budget"""
+
+    # Seconds to import gnm.wsgi in a fresh interpreter, warm-up included
+    startup_budget = float(os.getenv('STARTUP_BUDGET_SECONDS', '2.0'))
+    warm_up_budget = float(os.getenv('WARM_UP_BUDGET_SECONDS', '0.5'))
+    scale = float(os.getenv('BENCHMARK_LATENCY_SCALE', '1'))
+
+    def test_warm_up_needs_no_database(self):
+        media_root = os.path.join(tempfile.mkdtemp(), 'media')
+        self.addCleanup(shutil.rmtree, os.path.dirname(media_root))
+        self.addCleanup(gc.unfreeze)
+        with override_settings(MEDIA_ROOT=media_root):
+            warm_up()
+        self.assertTrue(os.path.isdir(media_root))
+
+    def test_startup_within_budget(self):
+        profile = profile_startup('gnm.settings_test')
+        print(f"\nStart-up: {profile['total'] * 1000:.0f} ms, warm-up {profile['warm_up'] * 1000:.0f} ms")
+        self.assertLessEqual(profile['total'], self.startup_budget * self.scale)
+        self.assertLessEqual(profile['warm_up'], self.warm_up_budget * self.scale)
+
+
+class TwoTierCacheTests(TestCase):
+    """gnm.cache.TwoTierCache; two instances stand in for two workers"""
+
+    def worker(self, name, **options):
+        params = settings.CACHES['shared']
+        cache_ = TwoTierCache(params['LOCATION'], {
+            **params, 'OPTIONS': {**params['OPTIONS'], 'L1_NAME': f'test-{name}', **options},
+        })
+        self.addCleanup(cache_.l1.clear)
+        return cache_
+
+    def setUp(self):
+        store._reset()
+        self.a = self.worker('a', L1_EXCLUDE_PREFIXES=('counter:',))
+        self.b = self.worker('b', L1_EXCLUDE_PREFIXES=('counter:',))
+        self.a.clear()
+
+    def lookups(self):
+        return {dict(labels)['result']: value for (name, labels), value in store.counters.items()
+                if name == 'gnm_cache_lookups_total'}
+
+    def test_l1_answers_repeat_reads(self):
+        self.a.set('doc', {'v': 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.a.get('doc'), {'v': 1})
+        with self.assertNumQueries(1):
+            self.assertEqual(self.b.get('doc'), {'v': 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.b.get('doc'), {'v': 1})
+        self.assertEqual(self.lookups(), {'l1_hit': 2, 'l2_hit': 1})
+
+    def test_excluded_keys_are_always_shared(self):
+        self.a.set('counter:x', 1)
+        self.b.incr('counter:x')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.a.get('counter:x'), 2)
+
+    def test_add_is_exclusive_across_workers(self):
+        self.assertTrue(self.a.add('oauth_code:abc', True))
+        self.assertFalse(self.b.add('oauth_code:abc', True))
+
+    def test_get_many_fills_from_both_tiers(self):
+        self.a.set_many({'k1': 1, 'k2': 2})
+        self.b.get('k1')
+        self.assertEqual(self.b.get_many(['k1', 'k2', 'k3']), {'k1': 1, 'k2': 2})
+        self.assertEqual(self.lookups(), {'l2_hit': 2, 'l1_hit': 1, 'miss': 1})
+
+    def test_versions(self):
+        self.a.set('doc', 'v1')
+        self.a.incr_version('doc')
+        self.assertIsNone(self.b.get('doc'))
+        self.assertEqual(self.b.get('doc', version=2), 'v1')
+        self.a.delete('doc', version=2)
+        self.assertIsNone(self.a.get('doc', version=2))
+
+    def test_single_flight_within_a_process(self):
+        # A thread-safe in-memory L2, so the threads need no database connections
+        self.a.l2 = LocMemCache('test-l2', {})
+        self.addCleanup(self.a.l2.clear)
+        calls = []
+
+        def compute():
+            calls.append(True)
+            time.sleep(0.05)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.a.get_or_set('hot', compute)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_waits_for_another_process(self):
+        self.b.add('hot:lock', 1)
+        # The other process finishes while this one polls
+        with mock.patch('gnm.cache.time.sleep', side_effect=lambda seconds: self.b.set('hot', 'theirs')):
+            self.assertEqual(self.a.get_or_set('hot', lambda: 'mine'), 'theirs')
+
+
+class SharedDatabaseCacheTests(TestCase):
+    """gnm.cache.SharedDatabaseCache, the two-tier cache's database tier"""
+
+    def make(self, **options):
+        cache_ = SharedDatabaseCache(settings.CACHES['shared']['LOCATION'], {'OPTIONS': options})
+        cache_.clear()
+        return cache_
+
+    def test_writes_do_not_count_the_table(self):
+        cache_ = self.make()
+        with self.assertNumQueries(1):
+            cache_.set('a', 1)
+        with self.assertNumQueries(1):
+            self.assertTrue(cache_.add('b', 2))
+        # The insert, then the takeover that only applies to an expired entry
+        with self.assertNumQueries(2):
+            self.assertFalse(cache_.add('a', 2))
+        self.assertEqual(cache_.get('a'), 1)
+
+    def test_add_takes_over_an_expired_key(self):
+        cache_ = self.make()
+        cache_.set('a', 'old', timeout=1)
+        self.assertFalse(cache_.add('a', 'new'))
+        with mock.patch('django.core.cache.backends.base.time.time', return_value=time.time() - 10):
+            cache_.set('b', 'old', timeout=1)
+        self.assertTrue(cache_.add('b', 'new'))
+        self.assertEqual(cache_.get_many(['a', 'b']), {'a': 'old', 'b': 'new'})
+
+    def test_incr_locks_the_row_before_reading_it(self):
+        cache_ = self.make()
+        cache_.set('n', 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(cache_.incr('n', 2), 3)
+        statements = [q['sql'] for q in queries if 'SAVEPOINT' not in q['sql']]
+        # SQLite has no row locks; the no-op UPDATE takes its write lock
+        self.assertTrue(statements[0].startswith('UPDATE'), statements)
+        self.assertTrue(statements[1].startswith('SELECT'), statements)
+        self.assertEqual(cache_.get('n'), 3)
+
+    def test_incr_of_a_missing_key(self):
+        cache_ = self.make()
+        with self.assertRaises(ValueError):
+            cache_.incr('missing')
+        with mock.patch('django.core.cache.backends.base.time.time', return_value=time.time() - 10):
+            cache_.set('expired', 1, timeout=1)
+        with self.assertRaises(ValueError):
+            cache_.incr('expired')
+
+    def test_cull_spares_excluded_prefixes(self):
+        cache_ = self.make(MAX_ENTRIES=4, CULL_FREQUENCY=2, CULL_INTERVAL=0,
+                           CULL_EXCLUDE_PREFIXES=('jwt_revoked:',))
+        cache_.set_many({'jwt_revoked:1': 1, 'jwt_revoked:2': 2})
+        cache_.set_many({f'k{i}': i for i in range(4)})
+        cache_.set('k4', 4)
+        spared = {'jwt_revoked:1': 1, 'jwt_revoked:2': 2}
+        self.assertEqual(cache_.get_many(list(spared)), spared)
+        self.assertLess(len(cache_.get_many([f'k{i}' for i in range(5)])), 5)
+
+
+class RetentionTests(TestCase):
+    """purge_retention deletes only expired rows, in bounded chunks"""
+
+    def setUp(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            Session(session_key=f'{i:032d}', session_data='', expire_date=now + datetime.timedelta(days=i - 25, hours=1))
+            for i in range(50)
+        )
+        messages = ContactMessage.objects.bulk_create(
+            ContactMessage(name='N', email='n@example.com', subject='S', message='M') for _ in range(30)
+        )
+        # created_at is auto_now_add; age half of them past the 365-day period
+        ContactMessage.objects.filter(pk__in=[m.pk for m in messages[::2]]).update(
+            created_at=now - datetime.timedelta(days=400)
+        )
+
+    def test_deletes_only_expired_rows_in_chunks(self):
+        pauses = []
+        purger = Purger(chunk_size=7, pause=0.5, sleep=pauses.append, lag=lambda: 0)
+        with CaptureQueriesContext(connection) as queries:
+            result = purger.purge(get_policy('sessions'))
+
+        self.assertEqual(result.deleted, 25)
+        self.assertEqual(Session.objects.count(), 25)
+        self.assertFalse(Session.objects.filter(expire_date__lt=timezone.now()).exists())
+        self.assertEqual(result.chunks, 4)
+        self.assertEqual(pauses, [0.5] * 3)
+        deletes = [q['sql'] for q in queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 4)
+
+    def test_waits_for_lagging_replicas(self):
+        lags = iter([30, 12, 1, 0, 0, 0])
+        pauses = []
+        purger = Purger(chunk_size=10, pause=0, max_replica_lag=5, sleep=pauses.append, lag=lambda: next(lags))
+        purger.purge(get_policy('contact_messages'))
+        self.assertEqual(ContactMessage.objects.count(), 15)
+        self.assertEqual(pauses, [5, 5])
+
+    def test_stops_between_chunks(self):
+        purger = Purger(chunk_size=5, pause=0, lag=lambda: 0, should_stop=lambda: Session.objects.count() < 50)
+        result = purger.purge(get_policy('sessions'))
+        self.assertEqual(result.deleted, 5)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('purge_retention', '--dry-run', stdout=out)
+        self.assertRegex(out.getvalue(), r'sessions\s+25 expired rows')
+        self.assertRegex(out.getvalue(), r'contact_messages\s+15 expired rows')
+
+        key = ('gnm_retention_deleted_rows_total', (('policy', 'sessions'),))
+        before = store.counters.get(key, 0)
+        call_command('purge_retention', '--pause', '0', stdout=out)
+        self.assertEqual(Session.objects.count(), 25)
+        self.assertEqual(ContactMessage.objects.count(), 15)
+        self.assertIn('Purged 40 rows', out.getvalue())
+        self.assertEqual(store.counters[key] - before, 25)
+
+
+class LoadTestHarnessTests(LiveServerTestCase):
+    """The load-test journeys run cleanly end to end against a live server"""
+
+    def setUp(self):
+        get_user_model().objects.create_superuser('lt-admin', 'lt-admin@example.com', 'admin-pass-123')
+        self.oauth = GoogleOAuthStub().start()
+        self.addCleanup(self.oauth.stop)
+
+    def test_journeys_complete_without_errors(self):
+        with override_settings(GOOGLE_TOKEN_URL=self.oauth.token_url, GOOGLE_USERINFO_URL=self.oauth.userinfo_url):
+            # One user: the live server shares the test's in-memory database connection
+            report = run_load(
+                self.live_server_url, [1], 2, {'user': 1, 'admin': 1, 'google': 1}, ramp_seconds=0,
+                admin=('lt-admin@example.com', 'admin-pass-123'),
+            )
+
+        stage, = report
+        steps = {f"{step['journey']}.{step['step']}": step for step in stage['steps']}
+        self.assertEqual(stage['error_rate'], 0, [step['errors'] for step in stage['steps'] if step['errors']])
+        self.assertIn('user.refresh', steps)
+        self.assertGreater(steps['user.register']['p99_ms'], 0)
+        self.assertEqual(Booking.objects.filter(email='lt-admin@example.com').count(), 0)
+        self.assertTrue(get_user_model().objects.filter(email__endswith='@loadtest.example').exists())
+
+    def test_smtp_sink_accepts_mail(self):
+        with SMTPSink() as sink:
+            connection = get_connection(
+                'django.core.mail.backends.smtp.EmailBackend', host='127.0.0.1', port=sink.port,
+                use_tls=False, username='', password='',
+            )
+            EmailMessage('Subject', 'Body\n.\nmore', 'from@example.com', ['to@example.com'],
+                         connection=connection).send()
+        self.assertEqual(sink.messages, 1)
+
+
+class QueryPlanHarnessTests(TestCase):
+    """Plans are normalised per vendor and only real regressions fail"""
+
+    def test_sqlite_plan_normalisation(self):
+        plan = normalise_sqlite([
+            (3, 0, 0, 'SCAN app1_booking USING INDEX booking_created_at_idx'),
+            (8, 0, 0, 'SEARCH custom_user USING INTEGER PRIMARY KEY (rowid=?)'),
+            (12, 0, 0, 'USE TEMP B-TREE FOR ORDER BY'),
+        ])
+        self.assertEqual(plan, {
+            'steps': [
+                {'table': 'app1_booking', 'access': 'index_scan', 'index': 'booking_created_at_idx'},
+                {'table': 'custom_user', 'access': 'search', 'index': 'PRIMARY'},
+            ],
+            'filesort': True, 'temporary': False,
+        })
+
+    def test_mysql_plan_normalisation(self):
+        columns = ['id', 'select_type', 'table', 'type', 'key', 'rows', 'Extra']
+        plan = normalise_mysql([
+            (1, 'SIMPLE', 'app1_booking', 'ALL', None, 1000, 'Using where; Using temporary; Using filesort'),
+            (1, 'SIMPLE', 'custom_user', 'eq_ref', 'PRIMARY', 1, None),
+        ], columns)
+        self.assertEqual(plan['steps'][0], {'table': 'app1_booking', 'access': 'ALL', 'index': None})
+        self.assertTrue(plan['filesort'] and plan['temporary'])
+
+    def test_unindexed_order_is_a_regression(self):
+        sql, params = Booking.objects.order_by('-created_at').query.sql_with_params()
+        golden = explain(sql, params)
+        sql, params = Booking.objects.order_by('guestCount').query.sql_with_params()
+        self.assertEqual(regressions(golden, explain(sql, params)), [
+            'app1_booking: access index_scan (booking_created_at_idx) became scan (None)',
+            'now uses filesort',
+        ])
+
+    def test_other_index_of_same_kind_is_not_a_regression(self):
+        golden = {'steps': [{'table': 't', 'access': 'ref', 'index': 'a'}], 'filesort': False, 'temporary': False}
+        current = {'steps': [{'table': 't', 'access': 'ref', 'index': 'b'}], 'filesort': False, 'temporary': False}
+        self.assertEqual(regressions(golden, current), [])
@@ -0,0 +1,229 @@
+# gnm/timing.py
+"""
+Per-request time breakdown for the Server-Timing header.
+
+ServerTimingMiddleware samples a fraction of requests
+(SERVER_TIMING_SAMPLE_RATE). For a sampled request it binds a timings
+dict to the current context, and the instrumented pieces add to it:
+
+    db         every query outside cache calls, through connection.execute_wrapper
+    cache      TimedCacheMixin backends, including their database tier
+    google     outbound OAuth calls (accounts.views)
+    smtp       TimedSMTPBackend
+    serialize  TimedSerializerMixin serializers
+    log        time spent in the log handler (gnm.log.request_log_cost)
+
+Unsampled requests pay one random() call; the instrumented pieces see no
+timings dict and skip their clock reads.
+
+Every sampled request is logged, but the header, which tells clients how
+long the database and outbound calls took, only goes to staff users,
+unless DEBUG or SERVER_TIMING_PUBLIC is set.
+"""
+import contextlib
+import contextvars
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+from django.utils.functional import SimpleLazyObject
+from django.db import connections
+from rest_framework.serializers import ListSerializer
+
+from .log import request_log_cost
+
+logger = logging.getLogger(__name__)
+
+# metric -> [count, seconds] while a sampled request is running
+_timings = contextvars.ContextVar('server_timings', default=None)
+_in_cache = contextvars.ContextVar('server_timing_in_cache', default=False)
+
+
+def record(metric, seconds, count=1):
+    timings = _timings.get()
+    if timings is not None:
+        entry = timings.setdefault(metric, [0, 0.0])
+        entry[0] += count
+        entry[1] += seconds
+
+
+@contextlib.contextmanager
+def timed(metric):
+    """Add the time spent in the block to metric, if this request is sampled"""
+    if _timings.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(metric, time.perf_counter() - start)
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    if _in_cache.get():
+        # Already part of the enclosing cache call's time
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record('db', time.perf_counter() - start)
+
+
+# ----------------------------
+# INSTRUMENTED BACKENDS
+# ----------------------------
+class TimedCacheMixin:
+    """
+    Times the cache calls the app makes; mix in before a cache backend.
+
+    Base implementations of get_many() and friends call get() and set()
+    per key, so nested calls are not timed a second time.
+    """
+
+    def _call(self, name, *args, **kwargs):
+        method = getattr(super(), name)
+        if _timings.get() is None or _in_cache.get():
+            return method(*args, **kwargs)
+        token = _in_cache.set(True)
+        try:
+            with timed('cache'):
+                return method(*args, **kwargs)
+        finally:
+            _in_cache.reset(token)
+
+    def get(self, *args, **kwargs):
+        return self._call('get', *args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self._call('set', *args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self._call('add', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._call('delete', *args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        return self._call('touch', *args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        return self._call('incr', *args, **kwargs)
+
+    def has_key(self, *args, **kwargs):
+        return self._call('has_key', *args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        return self._call('get_many', *args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self._call('set_many', *args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        return self._call('delete_many', *args, **kwargs)
+
+
+class TimedSMTPBackend(EmailBackend):
+    def send_messages(self, email_messages):
+        with timed('smtp'):
+            return super().send_messages(email_messages)
+
+
+class TimedListSerializer(ListSerializer):
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Times ``.data`` of a DRF serializer, including many=True lists"""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        if type(serializer) is ListSerializer:
+            serializer.__class__ = TimedListSerializer
+        return serializer
+
+
+# ----------------------------
+# MIDDLEWARE
+# ----------------------------
+class ServerTimingMiddleware:
+    """
+    Emit a Server-Timing header and one structured log line for sampled
+    requests. Must come after RequestIdMiddleware so the log line carries
+    the request id.
+    """
+
+    # Header order; 'total' is always last
+    METRICS = ('db', 'cache', 'google', 'smtp', 'serialize', 'log')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 0.0)
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+
+        timings = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_query_wrapper))
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        total = time.perf_counter() - start
+
+        log_records, log_seconds = request_log_cost()
+        if log_records:
+            timings['log'] = [log_records, log_seconds]
+        if self.send_header(request):
+            response['Server-Timing'] = self.header(timings, total)
+        self.log(request, response, timings, total)
+        return response
+
+    def send_header(self, request):
+        if settings.DEBUG or getattr(settings, 'SERVER_TIMING_PUBLIC', False):
+            return True
+        # Only a user something else already loaded: DRF views set the one
+        # they authenticated, and AuthenticationMiddleware's lazy user caches
+        # itself once evaluated. Evaluating it here would cost a query.
+        user = request.__dict__.get('user')
+        if isinstance(user, SimpleLazyObject):
+            user = request.__dict__.get('_cached_user')
+        return bool(user is not None and user.is_staff)
+
+    def header(self, timings, total):
+        parts = []
+        for metric in self.METRICS:
+            if metric in timings:
+                count, seconds = timings[metric]
+                parts.append(f'{metric};dur={seconds * 1000:.2f};desc="{count}"')
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+    def log(self, request, response, timings, total):
+        extra = {
+            'method': request.method,
+            'path': request.path,
+            'status_code': response.status_code,
+            'duration_ms': round(total * 1000, 2),
+        }
+        for metric, (count, seconds) in timings.items():
+            extra[f'{metric}_count'] = count
+            extra[f'{metric}_ms'] = round(seconds * 1000, 2)
+        logger.info("Request timing", extra=extra)
@@ -1,9 +1,12 @@
 # gnm/urls.py
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from accounts.views import CustomGoogleCallbackView
 from django.conf import settings
-from django.conf.urls.static import static
+from .media import serve_media
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,7 +31,9 @@ urlpatterns = [
     # Allauth social authentication (must come AFTER the override)
     path("accounts/", include("allauth.urls")),
 
-]
+    # Prometheus scrape target (staff only)
+    path("api/metrics/", metrics_view, name="metrics"),
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Uploaded files; handed to the front proxy when MEDIA_SERVE_MODE allows
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media),
+]
\ No newline at end of file
@@ -0,0 +1,138 @@
+# gnm/warmup.py
+"""
+Start-up warm-up for the WSGI/ASGI application.
+
+warm_up() builds, once, what Django and the libraries otherwise build on
+the first requests of every worker: the URL resolver, the lazily imported
+DRF and simplejwt classes, the allauth provider registry, model metadata,
+the password hashers and the translation catalog. gnm/wsgi.py and
+gnm/asgi.py call it right after the application is created, so under
+gunicorn (preload_app in gunicorn.conf.py) it runs in the master before
+forking. gc.freeze() then moves everything allocated so far out of the
+collector's reach, so collections in the workers do not write to (and
+un-share) those pages.
+
+It opens no database connections and starts no threads or process pools,
+both of which must not cross a fork.
+
+profile_startup() measures the same start-up in a fresh interpreter;
+see the profile_startup command and the start-up budget test.
+"""
+import gc
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Seconds the last warm_up() took, for profile_startup()
+last_duration = None
+
+
+def _local_apps():
+    base = str(settings.BASE_DIR)
+    return {config.name for config in apps.get_app_configs() if str(config.path).startswith(base)}
+
+
+def _serializer_classes(root):
+    stack = [root]
+    while stack:
+        cls = stack.pop()
+        stack.extend(cls.__subclasses__())
+        yield cls
+
+
+def warm_up():
+    global last_duration
+    start = time.perf_counter()
+
+    os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+
+    # URL resolver; importing the URLconf imports every view module
+    from django.urls import get_resolver
+    resolver = get_resolver()
+    resolver.reverse_dict
+    resolver.namespace_dict
+
+    # DRF and simplejwt import their configured classes on first access
+    from rest_framework.settings import api_settings
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+    for name in ('DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_AUTHENTICATION_CLASSES',
+                 'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_CONTENT_NEGOTIATION_CLASS'):
+        getattr(api_settings, name)
+    for name in ('AUTH_TOKEN_CLASSES', 'TOKEN_USER_CLASS', 'USER_AUTHENTICATION_RULE'):
+        getattr(jwt_settings, name)
+    # Signing and verifying once loads the JWT algorithm and crypto modules
+    AccessToken(str(AccessToken()))
+
+    from allauth.socialaccount import providers
+    providers.registry.get_class_list()
+
+    # Model metadata and the fields of the project's serializers
+    for model in apps.get_models():
+        model._meta.get_fields()
+        model._meta.related_objects
+    from rest_framework.serializers import ModelSerializer
+    local_apps = _local_apps()
+    for cls in _serializer_classes(ModelSerializer):
+        meta = getattr(cls, 'Meta', None)
+        if cls.__module__.split('.')[0] in local_apps and getattr(meta, 'model', None):
+            try:
+                cls().fields
+            except Exception:
+                logger.debug("Could not warm serializer %s", cls.__qualname__, exc_info=True)
+
+    from django.contrib.auth.hashers import get_hashers
+    get_hashers()
+    from django.utils import translation
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.deactivate()
+
+    # Nothing above should connect, but a connection must not be inherited by workers
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+
+    last_duration = time.perf_counter() - start
+    logger.info("Warm-up finished", extra={'duration_ms': round(last_duration * 1000, 2)})
+
+
+# ----------------------------
+# START-UP PROFILING
+# ----------------------------
+_PROBE = (
+    "import json, time\n"
+    "start = time.perf_counter()\n"
+    "import gnm.wsgi, gnm.warmup\n"
+    "print(json.dumps({'total': time.perf_counter() - start, 'warm_up': gnm.warmup.last_duration}))\n"
+)
+
+
+def profile_startup(settings_module=None, importtime=False):
+    """
+    Import gnm.wsgi in a fresh interpreter. Returns the seconds taken in
+    total and by warm_up(), plus, with importtime, the -X importtime
+    records as (self µs, cumulative µs, module), slowest first.
+    """
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = settings_module or os.environ.get('DJANGO_SETTINGS_MODULE', 'gnm.settings')
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', _PROBE]
+    result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True)
+    profile = json.loads(result.stdout.strip().splitlines()[-1])
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((int(self_us), int(cumulative_us), name.rstrip()))
+    profile['imports'] = sorted(imports, key=lambda record: record[1], reverse=True)
+    return profile
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gnm.settings')
 
 application = get_wsgi_application()
+
+# Build lazily initialized state before gunicorn/uvicorn fork workers
+from gnm.warmup import warm_up  # noqa: E402
+
+warm_up()
@@ -0,0 +1,35 @@
+# gunicorn.conf.py
+"""
+gunicorn server hooks; gunicorn reads this file when started from this
+directory (gunicorn gnm.wsgi).
+
+Per-worker metric files (gnm/metrics.py) are cleared when the master
+starts, so a scrape never sums the workers of a previous run, and a
+worker's file is merged into the archive when it exits.
+
+The application is preloaded: gnm.wsgi and its warm-up (gnm/warmup.py)
+run once in the master, and the workers fork with that state shared.
+"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gnm.settings')
+
+preload_app = True
+
+
+def _metrics():
+    from django.apps import apps
+    if not apps.ready:
+        # preload_app was turned off, so the master has not loaded the application
+        import django
+        django.setup()
+    from gnm import metrics
+    return metrics
+
+
+def on_starting(server):
+    _metrics().clear_metrics_dir()
+
+
+def child_exit(server, worker):
+    _metrics().archive_worker(worker.pid)
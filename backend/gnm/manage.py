@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gnm.settings')
+    # Tests run against SQLite and local services (gnm/settings_test.py)
+    default_settings = 'gnm.settings_test' if sys.argv[1:2] == ['test'] else 'gnm.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default_settings)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
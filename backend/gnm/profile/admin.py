@@ -1,16 +1,23 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from gnm.admin import EstimatedCountPaginator, ListDisplayColumnsMixin, chunked_update
 from .models import CustomUser as User
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(ListDisplayColumnsMixin, UserAdmin):
     """Custom User Admin with additional profile fields"""
     
     list_display = ['username', 'email', 'first_name', 'last_name', 'phone', 'location', 'is_staff', 'date_joined']
-    list_filter = ['is_staff', 'is_superuser', 'is_active', 'location', 'date_joined']
+    # location has too many distinct values to filter on; date_joined is
+    # browsed through the (indexed) date hierarchy instead
+    list_filter = ['is_staff', 'is_superuser', 'is_active']
     search_fields = ['username', 'email', 'first_name', 'last_name', 'phone', 'location']
     ordering = ['-date_joined']
+    date_hierarchy = 'date_joined'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['deactivate_users']
     
     fieldsets = UserAdmin.fieldsets + (
         ('Profile Information', {
@@ -24,4 +31,9 @@ class CustomUserAdmin(UserAdmin):
             'fields': ('phone', 'location', 'bio', 'occupation', 'website'),
             'classes': ('wide',)
         }),
-    )
\ No newline at end of file
+    )
+
+    @admin.action(description="Deactivate selected users", permissions=['change'])
+    def deactivate_users(self, request, queryset):
+        updated = chunked_update(queryset.exclude(pk=request.user.pk), is_active=False)
+        self.message_user(request, f"{updated} user(s) deactivated.")
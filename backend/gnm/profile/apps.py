@@ -4,3 +4,6 @@ class ProfileConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'profile'
     verbose_name = 'User Profiles'
+
+    def ready(self):
+        import profile.signals  # Import signals when app starts
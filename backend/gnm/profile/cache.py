@@ -0,0 +1,66 @@
+# profile/cache.py
+"""
+Cached profile document for GET /me/.
+
+The serialized user is stored per user together with an ETag derived
+from its content, so repeat loads are a cache lookup (or a 304) instead
+of a serializer run. Entries are dropped by profile.signals whenever the
+user row changes. ``profile_doc:`` keys skip the per-worker L1 (see
+CACHES), so the drop is seen by every worker at once.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from gnm.metrics import inc_cache
+
+from .serializers import UserSerializer
+
+
+def _key(user_id):
+    return f"profile_doc:{user_id}"
+
+
+def get_profile_document(user):
+    """
+    Return (etag, data) for the user, serializing only on a cache miss.
+
+    The document is built without a request, so profile_image_url is
+    site-relative; callers make it absolute for the current host.
+    """
+    built = []
+
+    def build():
+        built.append(True)
+        data = dict(UserSerializer(user).data)
+        body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+        return hashlib.blake2b(body, digest_size=16).hexdigest(), data
+
+    # get_or_set so concurrent misses (e.g. after an update) serialize once
+    timeout = getattr(settings, 'PROFILE_DOCUMENT_CACHE_TIMEOUT', 300)
+    document = cache.get_or_set(_key(user.pk), build, timeout=timeout)
+    inc_cache('profile_document', not built)
+    return document
+
+
+def with_absolute_urls(data, request):
+    """Copy of a cached document with its image URLs made absolute for request"""
+    if not data.get('profile_image'):
+        return data
+    absolute = request.build_absolute_uri
+    return {
+        **data,
+        'profile_image': absolute(data['profile_image']),
+        'profile_image_url': absolute(data['profile_image_url']),
+        'profile_image_variants': {
+            size: {ext: absolute(url) for ext, url in urls.items()}
+            for size, urls in data['profile_image_variants'].items()
+        },
+    }
+
+
+def invalidate_profile_document(user_id):
+    cache.delete(_key(user_id))
@@ -0,0 +1,139 @@
+# profile/imaging.py
+"""
+Pillow work for profile images, run inside worker processes.
+
+Nothing here touches Django models or settings, so the functions can be
+submitted to a spawned process pool.
+"""
+import contextlib
+import os
+import tempfile
+
+from PIL import ExifTags, Image, ImageOps
+
+# Variant file extension -> Pillow format and encoder options
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def verify_image(source, max_pixels):
+    """
+    Fully decode an uploaded image and return its MIME type.
+
+    Raises ValueError for anything Pillow cannot decode completely, and for
+    images whose dimensions exceed max_pixels, before decoding them.
+    """
+    try:
+        with Image.open(source) as image:
+            if image.width * image.height > max_pixels:
+                raise ValueError(f"Image is too large ({image.width}x{image.height}).")
+            mime_type = Image.MIME.get(image.format)
+            image.verify()
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        # verify() only checks structure; load() catches truncated pixel data
+        with Image.open(source) as image:
+            image.load()
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Not a valid image: {e}") from None
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+    return mime_type
+
+
+def strip_metadata(source, target):
+    """
+    Re-save an image in its own format without EXIF, XMP or comments.
+
+    The EXIF orientation goes with the rest, so it is applied to the pixels
+    first; a JPEG that needs no rotation keeps its quantisation tables. The
+    ICC profile is kept. ``target`` is a path or a binary file and may be
+    the path ``source`` is read from.
+    """
+    with Image.open(source) as original:
+        original.load()
+        pil_format = original.format
+        options = {'icc_profile': original.info.get('icc_profile')}
+        if getattr(original, 'is_animated', False):
+            image = original
+            options.update(save_all=True)
+        elif original.getexif().get(ExifTags.Base.Orientation, 1) != 1:
+            image = ImageOps.exif_transpose(original)
+            if pil_format == 'JPEG':
+                options.update(quality=95)
+        else:
+            image = original
+            if pil_format == 'JPEG':
+                options.update(quality='keep', subsampling='keep')
+        # Savers fall back to the decoder's info for these
+        for key in ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment'):
+            image.info.pop(key, None)
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        image.save(target, pil_format, **{k: v for k, v in options.items() if v is not None})
+    if hasattr(target, 'seek'):
+        target.seek(0)
+
+
+def clean_image(source, max_pixels, target):
+    """verify_image, then strip_metadata into target; returns the MIME type"""
+    mime_type = verify_image(source, max_pixels)
+    strip_metadata(source, target)
+    return mime_type
+
+
+def variant_name(name, size, ext):
+    """Storage name of a variant, derived from the original's name"""
+    return f"{name}.{size}.{ext}"
+
+
+def render_variants(source_path, sizes):
+    """
+    Write square, EXIF-free WebP and JPEG copies of source_path for each size.
+
+    Orientation from EXIF is applied before resizing and no metadata is
+    written to the outputs. Images are never upscaled. Returns
+    {size: [ext, ...]} for the files written.
+    """
+    targets = {size: [variant_name(source_path, size, ext) for ext in VARIANT_FORMATS] for size in sizes}
+    if all(os.path.exists(path) for paths in targets.values() for path in paths):
+        # Same bytes were uploaded before; content-addressed variants exist
+        return {size: list(VARIANT_FORMATS) for size in sizes}
+
+    written = {}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        for size in sizes:
+            edge = min(size, *image.size)
+            resized = ImageOps.fit(image, (edge, edge), Image.Resampling.LANCZOS)
+            for ext, (pil_format, options) in VARIANT_FORMATS.items():
+                output = resized
+                if pil_format == 'JPEG' and resized.mode == 'RGBA':
+                    # JPEG has no alpha; transparent areas would come out black
+                    output = Image.new('RGB', resized.size, 'white')
+                    output.paste(resized, mask=resized.getchannel('A'))
+                elif pil_format == 'JPEG':
+                    output = resized.convert('RGB')
+                path = variant_name(source_path, size, ext)
+                # Unique, so concurrent renders of the same upload do not share it
+                with tempfile.NamedTemporaryFile(
+                    dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix='.tmp', delete=False,
+                ) as tmp:
+                    tmp_path = tmp.name
+                try:
+                    output.save(tmp_path, pil_format, **options)
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    with contextlib.suppress(OSError):
+                        os.remove(tmp_path)
+                    raise
+                written.setdefault(size, []).append(ext)
+    return written
@@ -0,0 +1,139 @@
+# profile/management/commands/gc_media.py
+import os
+import re
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from profile.imaging import VARIANT_FORMATS
+
+User = get_user_model()
+
+# '<original>.<size>.<ext>' as written by profile.imaging.variant_name
+VARIANT_NAME = re.compile(r'^(?P<original>.+)\.\d+\.(%s)$' % '|'.join(VARIANT_FORMATS))
+# Leftovers of interrupted writes: storage temp files and variant .tmp files
+TEMP_NAME = re.compile(r'(^\.upload-|\.tmp$)')
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete profile image files (and their variants) that no user references. "
+        "Walks the upload directory with os.scandir and checks names against the "
+        "database in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report orphans without deleting them.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Names checked per query.")
+        parser.add_argument(
+            '--min-age', type=int, default=settings.PROFILE_IMAGE_MIN_AGE,
+            help="Skip files modified in the last N seconds, so in-flight uploads are left alone.",
+        )
+
+    def handle(self, *args, **options):
+        self.storage = User._meta.get_field('profile_image').storage
+        self.root = self.storage.location
+        self.dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        self.cutoff = time.time() - options['min_age']
+        self.scanned = self.orphans = self.reclaimed_bytes = 0
+        upload_dir = os.path.join(self.root, 'profile_images')
+
+        batch = []
+        for entry, name in self._walk(upload_dir):
+            self.scanned += 1
+            batch.append((entry, name))
+            if len(batch) >= options['batch_size']:
+                self._collect(batch)
+                batch = []
+                self._progress()
+        if batch:
+            self._collect(batch)
+
+        action = "Would delete" if self.dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {self.orphans} of {self.scanned} files "
+            f"({self.reclaimed_bytes / (1024 * 1024):.1f} MB)."
+        ))
+
+    def _walk(self, top):
+        """Yield (DirEntry, storage name) for every file below top, depth first"""
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry, os.path.relpath(entry.path, self.root).replace(os.sep, '/')
+            except FileNotFoundError:
+                continue
+
+    def _collect(self, batch):
+        """Delete the files in batch whose original image nobody references"""
+        originals = {}
+        temp_files = []
+        for entry, name in batch:
+            if TEMP_NAME.search(entry.name):
+                temp_files.append(entry)
+                continue
+            match = VARIANT_NAME.match(name)
+            originals.setdefault(match.group('original') if match else name, []).append(entry)
+
+        referenced = set(
+            User.objects.filter(profile_image__in=list(originals)).values_list('profile_image', flat=True)
+        )
+        for original, entries in originals.items():
+            if original not in referenced:
+                self._release(original, entries)
+        for entry in temp_files:
+            self._delete(entry)
+
+    def _release(self, original, entries):
+        """
+        Delete an unreferenced original and its variants together, unless
+        the original is younger than --min-age.
+
+        The original may be in another batch, or already gone, so its age
+        is read from disk. Under the storage lock a save of the same bytes
+        cannot touch it between that check and the deletes (see
+        ContentAddressedStorage.release).
+        """
+        with self.storage.lock():
+            try:
+                mtime = os.stat(os.path.join(self.root, original)).st_mtime
+            except FileNotFoundError:
+                mtime = 0
+            if mtime > self.cutoff:
+                return
+            for entry in entries:
+                self._delete(entry)
+
+    def _delete(self, entry):
+        try:
+            # Re-stat: a deduplicated re-upload refreshes the file's mtime
+            st = os.stat(entry.path)
+        except FileNotFoundError:
+            return
+        if st.st_mtime > self.cutoff:
+            return
+        self.orphans += 1
+        self.reclaimed_bytes += st.st_size
+        if self.verbosity >= 2:
+            self.stdout.write(f"  {entry.path}")
+        if not self.dry_run:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _progress(self):
+        if self.verbosity >= 1:
+            self.stdout.write(
+                f"Scanned {self.scanned} files, {self.orphans} orphans "
+                f"({self.reclaimed_bytes / (1024 * 1024):.1f} MB)"
+            )
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:33
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+import profile.models
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def find_duplicate_emails(apps, schema_editor):
+    """Refuse to build the unique index while case-insensitive duplicates exist"""
+    User = apps.get_model('profile', 'CustomUser')
+    users = User.objects.using(schema_editor.connection.alias)
+    duplicates = (
+        users.exclude(email='')
+        .annotate(email_lower=Lower('email'))
+        .values('email_lower')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+        .order_by('email_lower')
+    )
+    report = []
+    for row in duplicates:
+        ids = list(
+            users.filter(email__iexact=row['email_lower'])
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        report.append(f"  {row['email_lower']}: user ids {ids}")
+    if report:
+        raise RuntimeError(
+            "Cannot add unique index on lower(email); merge or rename these "
+            "accounts first:\n" + "\n".join(report)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('profile', '0002_customuser_profile_image'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', profile.models.CustomUserManager()),
+            ],
+        ),
+        migrations.RunPython(find_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.NullIf(django.db.models.functions.text.Lower('email'), django.db.models.expressions.RawSQL("''", ())), name='custom_user_email_ci_unique', violation_error_message='A user with that email already exists.'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0003_customuser_email_ci_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Profile Image Variants'),
+        ),
+    ]
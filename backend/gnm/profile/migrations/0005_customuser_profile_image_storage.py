@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:41
+
+import profile.models
+import profile.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0004_customuser_profile_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_image',
+            field=models.ImageField(blank=True, null=True, storage=profile.storage.ContentAddressedStorage(), upload_to=profile.models.user_profile_image_path, verbose_name='Profile Image'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('profile', '0005_customuser_profile_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['date_joined'], name='custom_user_date_joined_idx'),
+        ),
+    ]
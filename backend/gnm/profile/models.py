@@ -1,13 +1,57 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import IntegrityError, models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower, NullIf
+from .storage import ContentAddressedStorage
 import os
 
 
 def user_profile_image_path(instance, filename):
-    """Generate file path for user profile images"""
-    ext = filename.split('.')[-1]
-    filename = f"user_{instance.id}_profile.{ext}"
-    return os.path.join('profile_images', filename)
+    """
+    Generate file path for user profile images. Only the directory is
+    kept: ContentAddressedStorage names the file by its hash and takes the
+    extension from the detected image type, never from ``filename``.
+    """
+    return os.path.join('profile_images', 'upload')
+
+
+def email_key():
+    """Expression backing the case-insensitive unique email index.
+
+    Blank emails map to NULL so users without an email don't collide.
+    Lookups must use this exact expression for the index to be used; the
+    empty string is inlined rather than bound so the SQL text matches the
+    index definition on backends that bind parameters server side.
+    """
+    return NullIf(Lower('email'), RawSQL("''", ()))
+
+
+class CustomUserQuerySet(models.QuerySet):
+    def with_email(self, email):
+        """Filter by email through the functional unique index"""
+        return self.alias(email_key=email_key()).filter(email_key=(email or '').strip().lower())
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    """User manager with index-backed, case-insensitive email lookups"""
+
+    def get_by_email(self, email):
+        return self.with_email(email).get()
+
+    def get_or_create_by_email(self, email, defaults=None):
+        """
+        Like get_or_create(email=...) but seeks the unique index and
+        relies on it, rather than a second SELECT, to settle races
+        """
+        try:
+            return self.get_by_email(email), False
+        except self.model.DoesNotExist:
+            pass
+        try:
+            with transaction.atomic(using=self.db):
+                return self.create(email=email, **(defaults or {})), True
+        except IntegrityError:
+            return self.get_by_email(email), False
 
 
 class CustomUser(AbstractUser):
@@ -19,13 +63,33 @@ class CustomUser(AbstractUser):
     website = models.URLField(max_length=200, blank=True, null=True, verbose_name="Website")
     profile_image = models.ImageField(
         upload_to=user_profile_image_path,
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True,
         verbose_name="Profile Image"
     )
+    # {size: [ext, ...]} of resized copies rendered by profile.variants
+    profile_image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Profile Image Variants"
+    )
     
+    objects = CustomUserManager()
+
     class Meta:
         db_table = 'custom_user'
+        constraints = [
+            models.UniqueConstraint(
+                email_key(),
+                name='custom_user_email_ci_unique',
+                violation_error_message='A user with that email already exists.',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date_joined'], name='custom_user_date_joined_idx'),
+        ]
         verbose_name = 'User'
         verbose_name_plural = 'Users'
 
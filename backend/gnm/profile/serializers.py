@@ -1,13 +1,20 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.validators import FileExtensionValidator
+from gnm.serializers import SparseFieldsetsMixin
+from gnm.timing import TimedSerializerMixin
+from .imaging import variant_name
+from .uploadhandlers import max_upload_size, too_large_message
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for reading user profile data"""
     full_name = serializers.ReadOnlyField()
     profile_image_url = serializers.SerializerMethodField()
+    profile_image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = User
@@ -15,9 +22,16 @@ class UserSerializer(serializers.ModelSerializer):
             'id', 'email', 'username', 'first_name', 'last_name',
             'full_name', 'phone', 'location', 'bio', 'occupation', 
             'website', 'profile_image', 'profile_image_url',
+            'profile_image_variants',
             'is_staff', 'is_superuser', 'date_joined'
         ]
         read_only_fields = ['id', 'email', 'is_staff', 'is_superuser', 'date_joined']
+        # Columns behind the computed fields, for ?fields= (gnm/serializers.py)
+        field_sources = {
+            'full_name': ('first_name', 'last_name', 'username'),
+            'profile_image_url': ('profile_image',),
+            'profile_image_variants': ('profile_image', 'profile_image_variants'),
+        }
     
     def get_profile_image_url(self, obj):
         """Get full URL for profile image"""
@@ -28,10 +42,30 @@ class UserSerializer(serializers.ModelSerializer):
             return obj.profile_image.url
         return None
 
+    def get_profile_image_variants(self, obj):
+        """Resized image URLs by width and format: {'64': {'webp': url, 'jpeg': url}}"""
+        if not obj.profile_image or not obj.profile_image_variants:
+            return {}
+        storage = obj.profile_image.storage
+        request = self.context.get('request')
+        variants = {}
+        for size, exts in obj.profile_image_variants.items():
+            urls = {}
+            for ext in exts:
+                url = storage.url(variant_name(obj.profile_image.name, size, ext))
+                urls[ext] = request.build_absolute_uri(url) if request else url
+            variants[size] = urls
+        return variants
 
-class UserProfileUpdateSerializer(serializers.ModelSerializer):
+
+class UserProfileUpdateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for updating user profile"""
-    profile_image = serializers.ImageField(required=False, allow_null=True)
+    # Decoded by verify_upload in the worker pool rather than by ImageField;
+    # the stored extension comes from the decoded type (profile/storage.py)
+    profile_image = serializers.FileField(
+        required=False, allow_null=True,
+        validators=[FileExtensionValidator(settings.ALLOWED_IMAGE_EXTENSIONS)],
+    )
     
     class Meta:
         model = User
@@ -79,13 +113,22 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
     def validate_profile_image(self, value):
         """Validate profile image"""
         if value:
-            # Check file size (max 5MB)
-            if value.size > 5 * 1024 * 1024:
-                raise serializers.ValidationError("Image file size cannot exceed 5MB.")
+            # Check file size (PROFILE_IMAGE_MAX_UPLOAD_SIZE, 5MB by default)
+            if value.size > max_upload_size():
+                raise serializers.ValidationError(too_large_message())
             
-            # Check file type
-            allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
-            if value.content_type not in allowed_types:
+            # Check file type; content_type was sniffed from the bytes by the upload handler
+            if value.content_type not in settings.ALLOWED_IMAGE_TYPES:
+                raise serializers.ValidationError("Only JPEG, PNG, GIF, and WebP images are allowed.")
+
+            # profile.variants imports the profile cache, which imports this module
+            from .variants import verify_upload
+            try:
+                decoded_type = verify_upload(value)
+            except ValueError as e:
+                raise serializers.ValidationError(f"Upload a valid image. {e}")
+            if decoded_type not in settings.ALLOWED_IMAGE_TYPES:
                 raise serializers.ValidationError("Only JPEG, PNG, GIF, and WebP images are allowed.")
+            value.content_type = decoded_type
         
         return value
\ No newline at end of file
@@ -0,0 +1,28 @@
+# profile/signals.py
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_profile_document
+from .variants import schedule_release
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_profile_document(sender, instance, **kwargs):
+    """
+    Invalidate the cached /me/ document once the change is committed, so a
+    concurrent reader can't re-cache the old row in between
+    """
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_profile_document(user_id))
+
+
+@receiver(post_delete, sender=User)
+def release_deleted_user_image(sender, instance, **kwargs):
+    """Delete a removed user's image once nobody else references it"""
+    if instance.profile_image:
+        schedule_release(instance.profile_image.name, instance.profile_image_variants)
@@ -0,0 +1,128 @@
+# profile/storage.py
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves and releases are not serialised between processes
+    fcntl = None
+
+# Detected content type -> stored extension; the client's file name is never used
+EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that names every file after the SHA-256 of its bytes.
+
+    ``save('dir/anything', content)`` stores the file as
+    ``dir/<h[:2]>/<h>.<ext>``, with the extension taken from
+    ``content.content_type`` as detected from the bytes (see
+    profile/uploadhandlers.py); other types are refused. Saving the same
+    bytes again returns the existing name without rewriting the file, so
+    identical uploads are stored once and a name never changes content.
+    That makes the URLs safe to cache as immutable.
+
+    Because a name may be shared, deletes go through release(), which
+    holds the same lock as saves.
+    """
+
+    lock_name = '.content-addressed.lock'
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Exclusive lock between saves and releases in every process"""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, self.lock_name), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def release(self, names, min_age):
+        """
+        Delete ``names`` (an original first, then its variants) unless the
+        original was saved or re-saved in the last ``min_age`` seconds.
+
+        A save of the same bytes touches the file before its transaction
+        commits, so a recent mtime means a reference may not be visible
+        yet; such files are left to gc_media. Returns whether they went.
+        """
+        with self.lock():
+            try:
+                mtime = os.stat(self.path(names[0])).st_mtime
+            except FileNotFoundError:
+                mtime = 0
+            if time.time() - mtime < min_age:
+                return False
+            for name in names:
+                self.delete(name)
+        return True
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        ext = EXTENSIONS.get(getattr(content, 'content_type', None))
+        if ext is None:
+            raise SuspiciousFileOperation(f"Refusing to store content of type {getattr(content, 'content_type', None)!r}")
+        directory = os.path.dirname(name)
+        hexdigest = digest.hexdigest()
+        name = '/'.join(part for part in (directory, hexdigest[:2], hexdigest + ext) if part)
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # An existing file with this name already has these exact bytes
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        with self.lock():
+            try:
+                # Refresh the mtime so release() and gc_media's age guard
+                # cover the new, not yet committed, reference
+                os.utime(full_path)
+                return name
+            except FileNotFoundError:
+                pass
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file and rename, so readers never see a
+        # partial file and concurrent saves of the same bytes are harmless
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            with self.lock():
+                os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return name
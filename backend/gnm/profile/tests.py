@@ -1,3 +1,571 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from PIL import ExifTags, Image, PngImagePlugin
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from gnm.benchmark import Endpoint, EndpointBenchmarkMixin
+from gnm.cache import TwoTierCache
+from gnm.queryplan import HotQuery, QueryPlanTestMixin
+
+from .cache import invalidate_profile_document
+from .storage import ContentAddressedStorage
+from .imaging import render_variants
+from .variants import _store_variants, release_profile_image, schedule_variants
+from .serializers import UserProfileUpdateSerializer, UserSerializer
+
+User = get_user_model()
+
+
+class MeEndpointTests(TestCase):
+    """GET /me/ served from the cached profile document"""
+
+    url = '/api/auth/custom/me/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'me@example.com', 'me@example.com', 'pw123456789',
+            first_name='Me', location='Pune', bio='Hello'
+        )
+        self.client.cookies['access'] = str(AccessToken.for_user(self.user))
+
+    def test_returns_profile_with_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['location'], 'Pune')
+        self.assertTrue(response['ETag'])
+
+    def test_repeat_load_only_authenticates(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # The auth class's user lookup and the shared cache tier's read
+        self.assertEqual(len(queries), 2)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_saving_user_invalidates_document(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.location = 'Mumbai'
+            self.user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['location'], 'Mumbai')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalidation_reaches_other_workers(self):
+        # Two cache instances with separate L1s stand in for two workers
+        params = settings.CACHES['default']
+        workers = [
+            TwoTierCache(params['LOCATION'], {**params, 'OPTIONS': {**params['OPTIONS'], 'L1_NAME': f'test-{name}'}})
+            for name in ('a', 'b')
+        ]
+        for worker in workers:
+            self.addCleanup(worker.l1.clear)
+        with mock.patch('profile.cache.cache', workers[0]):
+            etag = self.client.get(self.url)['ETag']
+        with mock.patch('profile.cache.cache', workers[1]), self.captureOnCommitCallbacks(execute=True):
+            self.user.location = 'Mumbai'
+            self.user.save()
+        with mock.patch('profile.cache.cache', workers[0]):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['location'], 'Mumbai')
+
+
+class EmailLookupTests(TestCase):
+    """Case-insensitive email lookups through the unique lower(email) index"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('foo', 'Foo@X.com', 'pw123456789')
+
+    def test_get_by_email_ignores_case(self):
+        self.assertEqual(User.objects.get_by_email(' foo@x.COM '), self.user)
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_by_email('bar@x.com')
+
+    def test_unique_index_ignores_case(self):
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user('other', 'foo@x.com', 'pw123456789')
+
+    def test_get_or_create_by_email(self):
+        self.assertEqual(User.objects.get_or_create_by_email('FOO@x.com'), (self.user, False))
+        user, created = User.objects.get_or_create_by_email('new@x.com', defaults={'username': 'new'})
+        self.assertTrue(created)
+        self.assertEqual(User.objects.get_by_email('new@x.com'), user)
+
+    def test_get_or_create_by_email_loses_a_race(self):
+        # Another request creates the user between the lookup and the INSERT
+        real_get = User.objects.get_by_email
+        with mock.patch.object(type(User.objects), 'get_by_email',
+                               side_effect=[User.DoesNotExist, real_get('foo@x.com')]):
+            user, created = User.objects.get_or_create_by_email('foo@x.com', defaults={'username': 'racer'})
+        self.assertEqual((user, created), (self.user, False))
+        self.assertEqual(User.objects.with_email('foo@x.com').count(), 1)
+
+
+class EmailIndexMigrationTests(TransactionTestCase):
+    """0003 refuses to add the index over case-insensitive duplicate emails"""
+
+    before = [('profile', '0002_customuser_profile_image')]
+    after = [('profile', '0003_customuser_email_ci_unique')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        leaves = executor.loader.graph.leaf_nodes()
+        executor.migrate(self.before)
+        self.addCleanup(lambda: MigrationExecutor(connection).migrate(leaves))
+        apps = executor.loader.project_state(self.before).apps
+        self.users = apps.get_model('profile', 'CustomUser').objects
+        self.addCleanup(self.users.all().delete)
+        for username, email in [('a', 'Foo@x.com'), ('b', 'foo@x.com'), ('c', ''), ('d', '')]:
+            self.users.create(username=username, email=email)
+
+    def migrate(self):
+        MigrationExecutor(connection).migrate(self.after)
+
+    def test_reports_duplicates(self):
+        with self.assertRaisesMessage(RuntimeError, 'foo@x.com: user ids'):
+            self.migrate()
+
+    def test_blank_emails_are_not_duplicates(self):
+        self.users.filter(username='b').update(email='bar@x.com')
+        self.migrate()
+
+
+class UserSparseFieldsetsTests(TestCase):
+    """?fields= on the admin user list skips unrequested columns and method fields"""
+
+    url = '/api/admin/users/'
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin@example.com', 'admin@example.com', 'pw123456789',
+                                                   bio='Long bio')
+        self.client.cookies['access'] = str(AccessToken.for_user(self.admin))
+
+    def test_unrequested_method_fields_are_not_computed(self):
+        with mock.patch.object(UserSerializer, 'get_profile_image_url') as image_url, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url + '?fields=id,email')
+        self.assertEqual(response.json(), [{'id': self.admin.pk, 'email': 'admin@example.com'}])
+        image_url.assert_not_called()
+        self.assertNotIn('"bio"', queries[-1]['sql'])
+
+    def test_method_field_loads_its_columns(self):
+        response = self.client.get(self.url + '?fields=full_name,profile_image_url')
+        self.assertEqual(response.json(), [{'full_name': 'admin@example.com', 'profile_image_url': None}])
+
+    def test_omit(self):
+        response = self.client.get(self.url + '?omit=bio,profile_image_variants')
+        self.assertNotIn('bio', response.json()[0])
+        self.assertIn('profile_image_url', response.json()[0])
+
+
+def png_bytes(size=(32, 32)):
+    buf = io.BytesIO()
+    Image.new('RGB', size, (200, 10, 10)).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def jpeg_with_gps(size=(40, 20)):
+    """A JPEG whose EXIF has GPS coordinates and a 90 degree orientation"""
+    exif = Image.Exif()
+    exif[ExifTags.Base.Orientation] = 6
+    exif.get_ifd(ExifTags.IFD.GPSInfo)[ExifTags.GPS.GPSLatitude] = (18.0, 31.0, 12.0)
+    buf = io.BytesIO()
+    Image.new('RGB', size, (10, 200, 10)).save(buf, 'JPEG', exif=exif)
+    return buf.getvalue()
+
+
+class ProfileImageUploadTests(TestCase):
+    """Streaming validation of profile image uploads"""
+
+    url = '/api/auth/custom/profile/update/'
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root, PROFILE_IMAGE_WORKERS=0, PROFILE_IMAGE_MAX_UPLOAD_SIZE=16 * 1024
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user('img@example.com', 'img@example.com', 'pw123456789')
+        self.client.cookies['access'] = str(AccessToken.for_user(self.user))
+
+    def patch(self, data):
+        return self.client.patch(self.url, encode_multipart(BOUNDARY, data), content_type=MULTIPART_CONTENT)
+
+    def test_accepts_image_with_sniffed_type(self):
+        # The client-supplied content type is ignored
+        image = SimpleUploadedFile('avatar.png', png_bytes(), content_type='application/octet-stream')
+        response = self.patch({'profile_image': image, 'bio': 'Hi'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(response.json()['profile_image'])
+        self.assertEqual(response.json()['bio'], 'Hi')
+
+    def test_rejects_image_with_html_name(self):
+        # A valid PNG carrying a script in a text chunk must not become a .html file
+        buf = io.BytesIO()
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Comment', '<script>alert(1)</script>')
+        Image.new('RGB', (8, 8)).save(buf, 'PNG', pnginfo=info)
+        response = self.patch({'profile_image': SimpleUploadedFile('evil.html', buf.getvalue())})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('profile_image', response.json()['errors'])
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_image)
+        stored = [name for _, _, names in os.walk(self.media_root) for name in names]
+        self.assertFalse([name for name in stored if name.endswith('.html')])
+
+    def test_stored_extension_follows_decoded_type(self):
+        response = self.patch({'profile_image': SimpleUploadedFile('avatar.jpg', png_bytes())})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.profile_image.name.endswith('.png'), self.user.profile_image.name)
+
+    def test_stored_image_has_no_metadata(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.patch({'profile_image': SimpleUploadedFile('avatar.jpg', jpeg_with_gps())})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.user.refresh_from_db()
+        storage = self.user.profile_image.storage
+        names = [self.user.profile_image.name]
+        names += [f"{names[0]}.{size}.{ext}" for size, exts in self.user.profile_image_variants.items()
+                  for ext in exts]
+        self.assertEqual(len(names), 7)
+        for name in names:
+            with Image.open(storage.path(name)) as image:
+                self.assertEqual(dict(image.getexif()), {}, name)
+        # The orientation was applied before it was dropped
+        with Image.open(storage.path(names[0])) as image:
+            self.assertEqual(image.size, (20, 40))
+
+    def test_rejects_non_image_bytes(self):
+        fake = SimpleUploadedFile('avatar.png', b'<?php echo 1; ?>' * 10, content_type='image/png')
+        response = self.patch({'profile_image': fake})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('profile_image', response.json()['errors'])
+
+    def test_rejects_file_over_limit_while_streaming(self):
+        big = png_bytes() + b'\0' * (20 * 1024)
+        response = self.patch({'profile_image': SimpleUploadedFile('avatar.png', big)})
+        self.assertEqual(response.status_code, 413)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_image)
+
+    def test_rejects_body_over_limit_before_reading(self):
+        big = png_bytes() + b'\0' * (200 * 1024)
+        response = self.patch({'profile_image': SimpleUploadedFile('avatar.png', big)})
+        self.assertEqual(response.status_code, 413)
+
+    def test_rejects_truncated_image(self):
+        truncated = png_bytes((256, 256))[:200]
+        response = self.patch({'profile_image': SimpleUploadedFile('avatar.png', truncated)})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('profile_image', response.json()['errors'])
+
+
+class ImageVariantTests(TestCase):
+    """render_variants and schedule_variants, run inline (PROFILE_IMAGE_WORKERS=0)"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root, PROFILE_IMAGE_WORKERS=0, PROFILE_IMAGE_VARIANT_SIZES=(16, 64)
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.path = os.path.join(self.media_root, 'original.png')
+        Image.new('RGBA', (48, 32), (0, 0, 255, 128)).save(self.path, 'PNG')
+
+    def test_renders_square_variants_without_upscaling(self):
+        self.assertEqual(render_variants(self.path, (16, 64)), {16: ['webp', 'jpeg'], 64: ['webp', 'jpeg']})
+        with Image.open(f"{self.path}.16.webp") as image:
+            self.assertEqual((image.size, image.mode), ((16, 16), 'RGBA'))
+        with Image.open(f"{self.path}.64.jpeg") as image:
+            self.assertEqual((image.size, image.mode), ((32, 32), 'RGB'))
+
+    def test_jpeg_flattens_transparency_onto_white(self):
+        render_variants(self.path, (16,))
+        with Image.open(f"{self.path}.16.jpeg") as image:
+            red, green, blue = image.getpixel((8, 8))
+        # Half-transparent blue over white, not over black
+        self.assertGreater(min(red, green), 100)
+        self.assertGreater(blue, 200)
+
+    def test_each_render_uses_its_own_temp_files(self):
+        saved = []
+        original_save = Image.Image.save
+
+        def save(image, fp, *args, **kwargs):
+            saved.append(fp)
+            return original_save(image, fp, *args, **kwargs)
+
+        with mock.patch('profile.imaging.Image.Image.save', save):
+            render_variants(self.path, (16,))
+            os.remove(f"{self.path}.16.webp")
+            render_variants(self.path, (16,))
+        self.assertEqual(len(set(saved)), len(saved))
+        self.assertTrue(all(name.endswith('.tmp') for name in saved))
+        self.assertFalse([name for name in os.listdir(self.media_root) if name.endswith('.tmp')])
+
+    def test_existing_variants_are_reused(self):
+        render_variants(self.path, (16,))
+        mtime = os.path.getmtime(f"{self.path}.16.webp")
+        with mock.patch('profile.imaging.Image.open') as image_open:
+            self.assertEqual(render_variants(self.path, (16,)), {16: ['webp', 'jpeg']})
+        image_open.assert_not_called()
+        self.assertEqual(os.path.getmtime(f"{self.path}.16.webp"), mtime)
+
+    def test_schedule_variants_stores_the_map(self):
+        user = User.objects.create_user('var@example.com', 'var@example.com', 'pw123456789',
+                                        profile_image='original.png')
+        schedule_variants(user.pk, 'original.png')
+        user.refresh_from_db()
+        self.assertEqual(user.profile_image_variants, {'16': ['webp', 'jpeg'], '64': ['webp', 'jpeg']})
+
+    def test_variants_of_a_replaced_image_are_not_stored(self):
+        user = User.objects.create_user('var@example.com', 'var@example.com', 'pw123456789',
+                                        profile_image='newer.png')
+        _store_variants(user.pk, 'original.png', {16: ['webp']})
+        user.refresh_from_db()
+        self.assertEqual(user.profile_image_variants, {})
+
+
+class MediaCleanupTests(TestCase):
+    """Deferred image deletion and the gc_media command"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, PROFILE_IMAGE_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user('gc@example.com', 'gc@example.com', 'pw123456789')
+
+    def write(self, name, age=7200):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_deleting_user_releases_image_after_commit(self):
+        path = self.write('profile_images/aa/kept.jpg')
+        variant = self.write('profile_images/aa/kept.jpg.64.webp')
+        User.objects.filter(pk=self.user.pk).update(
+            profile_image='profile_images/aa/kept.jpg', profile_image_variants={'64': ['webp']}
+        )
+        self.user.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.user.delete()
+            self.assertTrue(os.path.exists(path))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(variant))
+
+    def test_gc_media_reclaims_orphans(self):
+        User.objects.filter(pk=self.user.pk).update(profile_image='profile_images/aa/kept.jpg')
+        kept = [self.write('profile_images/aa/kept.jpg'), self.write('profile_images/aa/kept.jpg.64.webp')]
+        orphans = [
+            self.write('profile_images/bb/orphan.jpg'),
+            self.write('profile_images/bb/orphan.jpg.512.jpeg'),
+            self.write('profile_images/bb/.upload-abc123'),
+        ]
+        recent = self.write('profile_images/cc/recent.jpg', age=10)
+        out = io.StringIO()
+
+        call_command('gc_media', dry_run=True, batch_size=2, stdout=out)
+        self.assertIn('Would delete 3 of 6 files', out.getvalue())
+        self.assertTrue(all(os.path.exists(p) for p in orphans))
+
+        call_command('gc_media', batch_size=2, stdout=io.StringIO())
+        self.assertTrue(all(os.path.exists(p) for p in kept + [recent]))
+        self.assertFalse(any(os.path.exists(p) for p in orphans))
+
+
+    def test_gc_media_keeps_variants_of_a_recent_original(self):
+        # An upload of the same bytes touched the original but has not committed
+        recent = self.write('profile_images/dd/recent.jpg', age=10)
+        variants = [self.write('profile_images/dd/recent.jpg.64.webp'),
+                    self.write('profile_images/dd/recent.jpg.64.jpeg')]
+        # Variants left behind by an original that is already gone
+        stray = self.write('profile_images/ee/gone.jpg.64.webp')
+
+        # One file per batch, so the original is checked outside its variants' batch
+        call_command('gc_media', batch_size=1, stdout=io.StringIO())
+        self.assertTrue(all(os.path.exists(p) for p in [recent, *variants]))
+        self.assertFalse(os.path.exists(stray))
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Hash naming, dedup and the release of shared image files"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, PROFILE_IMAGE_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.storage = ContentAddressedStorage()
+        self.user = User.objects.create_user('cas@example.com', 'cas@example.com', 'pw123456789')
+
+    def upload(self, data, name='avatar.html', content_type='image/png'):
+        return SimpleUploadedFile(name, data, content_type=content_type)
+
+    def age(self, name, seconds=7200):
+        mtime = time.time() - seconds
+        os.utime(self.storage.path(name), (mtime, mtime))
+
+    def test_name_is_hash_with_extension_of_detected_type(self):
+        data = png_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        name = self.storage.save('profile_images/upload', self.upload(data))
+        self.assertEqual(name, f'profile_images/{digest[:2]}/{digest}.png')
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), data)
+
+    def test_client_file_name_does_not_set_extension(self):
+        name = self.storage.save('profile_images/evil.html', self.upload(png_bytes(), content_type='image/jpeg'))
+        self.assertTrue(name.endswith('.jpg'), name)
+
+    def test_refuses_unknown_content_type(self):
+        with self.assertRaises(SuspiciousFileOperation):
+            self.storage.save('profile_images/upload', self.upload(b'<html>', content_type='text/html'))
+
+    def test_same_bytes_stored_once_and_touched(self):
+        first = self.storage.save('profile_images/upload', self.upload(png_bytes()))
+        self.age(first)
+        second = self.storage.save('profile_images/upload', self.upload(png_bytes()))
+        self.assertEqual(first, second)
+        self.assertLess(time.time() - os.stat(self.storage.path(first)).st_mtime, 60)
+        self.assertEqual(len(os.listdir(os.path.dirname(self.storage.path(first)))), 1)
+
+    def test_release_keeps_file_still_referenced(self):
+        name = self.storage.save('profile_images/upload', self.upload(png_bytes()))
+        self.age(name)
+        User.objects.filter(pk=self.user.pk).update(profile_image=name)
+        release_profile_image(name, {})
+        self.assertTrue(self.storage.exists(name))
+
+    def test_release_deletes_unreferenced_file_and_variants(self):
+        name = self.storage.save('profile_images/upload', self.upload(png_bytes()))
+        variant = name + '.64.webp'
+        with open(self.storage.path(variant), 'wb') as f:
+            f.write(b'x')
+        self.age(name)
+        release_profile_image(name, {'64': ['webp']})
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(self.storage.exists(variant))
+
+    def test_release_spares_file_resaved_by_uncommitted_upload(self):
+        name = self.storage.save('profile_images/upload', self.upload(png_bytes()))
+        self.age(name)
+        # Another user's upload of the same bytes, before its row is committed
+        self.storage.save('profile_images/upload', self.upload(png_bytes()))
+        release_profile_image(name, {})
+        self.assertTrue(self.storage.exists(name))
+
+
+def _give_image(case):
+    User.objects.filter(pk=case.accounts['user'].pk).update(
+        profile_image='profile_images/aa/' + 'a' * 64 + '.jpg', profile_image_variants={}
+    )
+    return {}
+
+
+class ProfileEndpointBenchmark(EndpointBenchmarkMixin, TestCase):
+    urls_module = 'profile.urls'
+    endpoints = [
+        # User lookup and the profile document from the shared cache tier
+        Endpoint('profile:get_current_user', as_user='user', queries=2, p95_ms=25),
+        Endpoint('profile:update_user_profile', 'patch', as_user='user', queries=3, p95_ms=50,
+                 data={'bio': 'Updated from the benchmark', 'location': 'Mumbai'}),
+        Endpoint('profile:delete_profile_image', 'delete', as_user='user', queries=3, p95_ms=50,
+                 prepare=_give_image),
+    ]
+
+
+class MeEndpointBenchmark(TestCase):
+    """Latency of GET /me/: cache miss vs cached document vs 304 revalidation"""
+
+    url = '/api/auth/custom/me/'
+    iterations = 200
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'bench@example.com', 'bench@example.com', 'pw123456789',
+            first_name='Bench', last_name='User', phone='+91 98765 43210',
+            location='Pune', bio='x' * 500, occupation='Planner',
+            website='https://example.com'
+        )
+        self.client.cookies['access'] = str(AccessToken.for_user(self.user))
+
+    def _measure(self, before=None, **headers):
+        samples = []
+        for _ in range(self.iterations):
+            if before:
+                before()
+            start = time.perf_counter()
+            response = self.client.get(self.url, **headers)
+            samples.append((time.perf_counter() - start) * 1000)
+        return response, statistics.median(samples)
+
+    def test_cached_document_latency(self):
+        _, miss = self._measure(before=lambda: invalidate_profile_document(self.user.pk))
+        response, hit = self._measure()
+        _, revalidated = self._measure(HTTP_IF_NONE_MATCH=response['ETag'])
+
+        print(
+            f"\n/me/ median latency over {self.iterations} requests: "
+            f"miss {miss:.3f} ms, cached {hit:.3f} ms, 304 {revalidated:.3f} ms"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(hit, miss)
+
+
+def _username_taken(case):
+    request = RequestFactory().patch('/')
+    request.user = case.accounts['user']
+    serializer = UserProfileUpdateSerializer(context={'request': request})
+    with case.assertRaises(ValidationError):
+        serializer.validate_username(case.accounts['reset'].username)
+
+
+class ProfileQueryPlans(QueryPlanTestMixin, TestCase):
+    hot_queries = [
+        # Login, password reset and Google sign-in all look users up this way
+        HotQuery('user_by_email', lambda case: User.objects.get_by_email('Bench7@Example.com'), User._meta.db_table),
+        HotQuery('username_taken', _username_taken, User._meta.db_table),
+    ]
@@ -0,0 +1,133 @@
+# profile/uploadhandlers.py
+"""
+Streaming upload handler for profile images.
+
+The file is written to a temporary file in 8 KiB chunks, so a request
+never holds more than one chunk of it in memory. Uploads are rejected as
+soon as they are known to be bad: from Content-Length before the body is
+read, from the leading magic bytes, or once the received size passes the
+limit. The parser then stops reading the body.
+"""
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+# Allowance for the other form fields and multipart boundaries
+FORM_OVERHEAD = 64 * 1024
+
+# Leading bytes -> content type. WebP is RIFF????WEBP and checked separately.
+MAGIC_NUMBERS = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+SNIFF_BYTES = 12
+
+
+def sniff_image_type(header):
+    """Content type for the leading bytes of an image, or None"""
+    for magic, content_type in MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return content_type
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def max_upload_size():
+    return getattr(settings, 'PROFILE_IMAGE_MAX_UPLOAD_SIZE', 5 * 1024 * 1024)
+
+
+def too_large_message():
+    limit = max_upload_size()
+    if limit >= 1024 * 1024:
+        return f"Image file size cannot exceed {limit / (1024 * 1024):g}MB."
+    return f"Image file size cannot exceed {limit // 1024}KB."
+
+
+class ProfileImageUploadHandler(FileUploadHandler):
+    """
+    Accepts a single image in the ``profile_image`` field.
+
+    Rejections are recorded in ``error`` and ``status_code`` for the view
+    to report, since the file is simply missing from request.FILES.
+    """
+
+    chunk_size = 8 * 1024
+    field_name_allowed = 'profile_image'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.status_code = None
+        self.header = b''
+
+    def _reject(self, message, status_code=400):
+        self.error = message
+        self.status_code = status_code
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length and content_length > max_upload_size() + FORM_OVERHEAD:
+            self._reject(too_large_message(), 413)
+            # Parsed as empty without reading the body
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        if field_name != self.field_name_allowed:
+            raise SkipFile()
+        if hasattr(self, 'file'):
+            # Only one image per request
+            raise SkipFile()
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if content_length is not None and content_length > max_upload_size():
+            self._reject(too_large_message(), 413)
+            raise StopUpload(connection_reset=True)
+        self.file = TemporaryUploadedFile(file_name, content_type, 0, charset, content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > max_upload_size():
+            self._reject(too_large_message(), 413)
+            raise StopUpload(connection_reset=True)
+        if len(self.header) < SNIFF_BYTES:
+            self.header += raw_data[:SNIFF_BYTES - len(self.header)]
+            if len(self.header) >= SNIFF_BYTES:
+                self._check_type()
+        self.file.write(raw_data)
+        return None
+
+    def _check_type(self):
+        sniffed = sniff_image_type(self.header)
+        if sniffed is None:
+            self._reject("Only JPEG, PNG, GIF, and WebP images are allowed.")
+            raise StopUpload(connection_reset=True)
+        # The client-supplied type is not trusted
+        self.file.content_type = sniffed
+
+    def file_complete(self, file_size):
+        if not hasattr(self, 'file') or self.error:
+            return None
+        sniffed = sniff_image_type(self.header)
+        if sniffed is None:
+            # Shorter than SNIFF_BYTES, so never checked while streaming
+            self._reject("Only JPEG, PNG, GIF, and WebP images are allowed.")
+            self.file.close()
+            return None
+        self.file.content_type = sniffed
+        self.file.seek(0)
+        self.file.size = file_size
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            temp_location = self.file.temporary_file_path()
+            try:
+                self.file.close()
+                os.remove(temp_location)
+            except FileNotFoundError:
+                pass
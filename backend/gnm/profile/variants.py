@@ -0,0 +1,173 @@
+# profile/variants.py
+"""
+Runs profile image work in a per-process pool of spawned workers (see
+profile.imaging).
+
+Uploads are decoded there before they are accepted, and re-saved without
+their metadata (EXIF can carry GPS coordinates) since the original is
+served as well as the variants. Variant rendering is
+scheduled there off the request thread; when a job finishes, the variant
+map is written back to the user row, but only if the user still has the
+same image. Replaced images are deleted by a background thread once the
+change has committed, unless they were saved again too recently to be
+sure nobody references them; gc_media collects those later.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from .cache import invalidate_profile_document
+from .imaging import clean_image, render_variants, variant_name
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+# File deletion is I/O only, so a single thread is enough
+_deleter = None
+_deleter_pid = None
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PROFILE_IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                max_tasks_per_child=100,
+            )
+            _executor_pid = os.getpid()
+    return _executor
+
+
+def _get_deleter():
+    global _deleter, _deleter_pid
+    with _executor_lock:
+        if _deleter is None or _deleter_pid != os.getpid():
+            _deleter = ThreadPoolExecutor(max_workers=1, thread_name_prefix='media-delete')
+            _deleter_pid = os.getpid()
+    return _deleter
+
+
+def verify_upload(upload):
+    """
+    Decode an uploaded image, strip its metadata and return its MIME type.
+
+    Files streamed to disk are cleaned in the worker pool and rewritten in
+    place, so the pixel data never enters the web process; small in-memory
+    uploads are cleaned here. Raises ValueError for invalid images.
+    """
+    max_pixels = settings.PROFILE_IMAGE_MAX_PIXELS
+    if not hasattr(upload, 'temporary_file_path'):
+        cleaned = io.BytesIO()
+        mime_type = clean_image(upload, max_pixels, cleaned)
+        upload.file, upload.size = cleaned, cleaned.getbuffer().nbytes
+        return mime_type
+
+    path = upload.temporary_file_path()
+    if not settings.PROFILE_IMAGE_WORKERS:
+        mime_type = clean_image(path, max_pixels, path)
+    else:
+        future = _get_executor().submit(clean_image, path, max_pixels, path)
+        try:
+            mime_type = future.result(timeout=settings.PROFILE_IMAGE_VERIFY_TIMEOUT)
+        except TimeoutError:
+            future.cancel()
+            raise ValueError("Image took too long to process.") from None
+    upload.size = os.path.getsize(path)
+    upload.seek(0)
+    return mime_type
+
+
+def variant_names(name, variants):
+    """All storage names listed in a profile_image_variants map"""
+    return [variant_name(name, size, ext) for size, exts in (variants or {}).items() for ext in exts]
+
+
+def release_profile_image(name, variants):
+    """
+    Delete an image and its variants once no user references it.
+
+    Content-addressed names are shared by every user who uploaded the same
+    bytes, so a file may only go when its last reference does. A reference
+    that has not committed yet is not visible here, but its save touched
+    the file, so recently saved files are kept (see
+    ContentAddressedStorage.release).
+    """
+    User = get_user_model()
+    if not name or User.objects.filter(profile_image=name).exists():
+        return
+    storage = User._meta.get_field('profile_image').storage
+    if storage.release([name, *variant_names(name, variants)], settings.PROFILE_IMAGE_MIN_AGE):
+        logger.debug("Released profile image %s", name)
+    else:
+        logger.debug("Profile image %s was saved again recently; left to gc_media", name)
+
+
+def _release_quietly(name, variants):
+    try:
+        release_profile_image(name, variants)
+    except Exception as e:
+        # Anything left behind is reclaimed by the gc_media command
+        logger.warning("Could not delete image file %s: %s", name, e)
+
+
+def _release_in_background(name, variants):
+    try:
+        _release_quietly(name, variants)
+    finally:
+        connection.close()
+
+
+def schedule_release(name, variants):
+    """
+    Release an image after the current transaction commits, off the
+    request thread. Nothing is deleted if the transaction rolls back.
+    """
+    if not name:
+        return
+    if not settings.PROFILE_IMAGE_WORKERS:
+        transaction.on_commit(lambda: _release_quietly(name, variants))
+        return
+    transaction.on_commit(lambda: _get_deleter().submit(_release_in_background, name, variants))
+
+
+def _store_variants(user_id, name, written):
+    variants = {str(size): exts for size, exts in written.items()}
+    User = get_user_model()
+    updated = User.objects.filter(pk=user_id, profile_image=name).update(profile_image_variants=variants)
+    if updated:
+        invalidate_profile_document(user_id)
+    logger.debug("Stored %s variant sizes for user %s", len(variants), user_id)
+
+
+def _on_rendered(user_id, name, future):
+    # Runs on the executor's management thread, which has its own connection
+    try:
+        _store_variants(user_id, name, future.result())
+    except Exception as e:
+        logger.exception("Profile image variants failed for user %s: %s", user_id, e)
+    finally:
+        connection.close()
+
+
+def schedule_variants(user_id, name):
+    """Render variants for the image stored at name, without blocking the caller"""
+    User = get_user_model()
+    path = User._meta.get_field('profile_image').storage.path(name)
+    sizes = tuple(settings.PROFILE_IMAGE_VARIANT_SIZES)
+
+    if not settings.PROFILE_IMAGE_WORKERS:
+        _store_variants(user_id, name, render_variants(path, sizes))
+        return
+    future = _get_executor().submit(render_variants, path, sizes)
+    future.add_done_callback(lambda f: _on_rendered(user_id, name, f))
@@ -1,11 +1,15 @@
-import os
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.contrib.auth import get_user_model
+from django.utils.http import parse_etags
 from .serializers import UserSerializer, UserProfileUpdateSerializer
+from django.db import transaction
+from .cache import get_profile_document, with_absolute_urls
+from .variants import schedule_release, schedule_variants
+from .uploadhandlers import ProfileImageUploadHandler
 import logging
 
 User = get_user_model()
@@ -18,40 +22,24 @@ def get_current_user(request):
     """
     Get current authenticated user's profile data
     Endpoint: GET /api/auth/custom/me/
+    Served from the cached profile document; supports If-None-Match
     """
     try:
-        # Refresh from database to get latest data
-        request.user.refresh_from_db()
-        user = request.user
-        
-        logger.info(f"MeView called for user: {user.email}")
-        logger.info(f"User model: {user.__class__.__name__}")
-        logger.info(f"User ID: {user.id}")
-        logger.info(f"User data - phone: {user.phone}")
-        logger.info(f"User data - location: {user.location}")
-        logger.info(f"User data - bio: {user.bio}")
-        logger.info(f"User data - occupation: {user.occupation}")
-        logger.info(f"User data - website: {user.website}")
-        logger.info(f"Profile image field: {user.profile_image}")
-        
-        # Serialize with context to build absolute URLs
-        serializer = UserSerializer(user, context={'request': request})
-        serialized_data = serializer.data
-        
-        logger.info(f"Serializer class: {serializer.__class__.__name__}")
-        logger.info(f"Serializer fields: {list(serializer.fields.keys())}")
-        logger.info(f"Serialized data keys: {list(serialized_data.keys())}")
-        logger.info(f"Serialized data: {serialized_data}")
-        
-        # Double check each field
-        for field in ['phone', 'location', 'bio', 'occupation', 'website']:
-            logger.info(f"Field '{field}' in response: {serialized_data.get(field)}")
-        
-        logger.info(f"Response size: {len(str(serialized_data))} chars")
-        
-        return Response(serialized_data, status=status.HTTP_200_OK)
+        # request.user was just loaded by the auth class, no refresh needed
+        etag, data = get_profile_document(request.user)
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            # Weak comparison: compression turns the ETag into W/"..."
+            etags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+            if '*' in etags or headers['ETag'] in etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        logger.debug("Profile document served for user %s", request.user.pk)
+        return Response(with_absolute_urls(data, request), status=status.HTTP_200_OK, headers=headers)
     except Exception as e:
-        logger.exception(f"Error fetching user profile: {str(e)}")
+        logger.exception("Error fetching user profile: %s", e)
         return Response(
             {'detail': 'Failed to fetch user data.'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -66,25 +54,34 @@ def update_user_profile(request):
     Update current user's profile information
     Endpoint: PATCH /api/auth/custom/profile/update/
     Supports both JSON data and multipart/form-data for image uploads
+    Images are streamed to disk and rejected while uploading if too large
+    or not an image
     """
     try:
+        # Must be set before request.data is first read
+        upload_handler = ProfileImageUploadHandler(request._request)
+        request._request.upload_handlers = [upload_handler]
+
         user = request.user
-        logger.info(f"=== Profile update request from: {user.email} ===")
-        logger.info(f"Request method: {request.method}")
-        logger.info(f"Request data: {request.data}")
-        logger.info(f"Request FILES: {request.FILES}")
-        logger.info(f"Content-Type: {request.content_type}")
-        logger.info(f"Current profile_image: {user.profile_image}")
+        logger.debug(
+            "Profile update from user %s: method=%s content_type=%s fields=%s files=%s",
+            user.pk, request.method, request.content_type,
+            list(request.data.keys()), list(request.FILES.keys())
+        )
         
-        # Handle old profile image deletion if new image is uploaded
-        if 'profile_image' in request.FILES and user.profile_image:
-            try:
-                old_image_path = user.profile_image.path
-                if os.path.exists(old_image_path):
-                    os.remove(old_image_path)
-                    logger.info(f"Deleted old image: {old_image_path}")
-            except Exception as e:
-                logger.warning(f"Could not delete old image: {str(e)}")
+        if upload_handler.error:
+            logger.warning("Profile image upload rejected for user %s: %s", user.pk, upload_handler.error)
+            return Response(
+                {
+                    'detail': 'Validation failed',
+                    'errors': {'profile_image': [upload_handler.error]}
+                },
+                status=upload_handler.status_code
+            )
+
+        # Remember the old image; it is released once the new one is saved
+        new_image = 'profile_image' in request.FILES
+        old_name, old_variants = user.profile_image.name, user.profile_image_variants
         
         # Use partial=True for PATCH, False for PUT
         partial = request.method == 'PATCH'
@@ -97,17 +94,18 @@ def update_user_profile(request):
         )
         
         if serializer.is_valid():
-            updated_user = serializer.save()
-            logger.info("Profile saved to database")
-            logger.info(f"Updated fields - phone: {updated_user.phone}, location: {updated_user.location}")
-            logger.info(f"Updated fields - bio: {updated_user.bio}, occupation: {updated_user.occupation}")
-            logger.info(f"Updated fields - website: {updated_user.website}")
-            logger.info(f"Updated profile_image field: {updated_user.profile_image}")
-            
-            if updated_user.profile_image:
-                logger.info(f"Image path: {updated_user.profile_image.path}")
-                logger.info(f"Image URL: {updated_user.profile_image.url}")
-                logger.info(f"File exists: {os.path.exists(updated_user.profile_image.path)}")
+            if new_image:
+                # Variants of the new image are rendered after commit
+                updated_user = serializer.save(profile_image_variants={})
+            else:
+                updated_user = serializer.save()
+            if new_image and updated_user.profile_image:
+                user_id, name = updated_user.pk, updated_user.profile_image.name
+                transaction.on_commit(lambda: schedule_variants(user_id, name))
+            if new_image and old_name and old_name != updated_user.profile_image.name:
+                schedule_release(old_name, old_variants)
+            logger.info("Profile updated for user %s", updated_user.pk)
+            logger.debug("Updated profile fields: %s", list(serializer.validated_data.keys()))
             
             # Refresh from database to ensure we have the latest data
             updated_user.refresh_from_db()
@@ -115,14 +113,10 @@ def update_user_profile(request):
             # Return complete user data using UserSerializer
             user_serializer = UserSerializer(updated_user, context={'request': request})
             
-            logger.info(f"Returning complete user data: {user_serializer.data}")
-            logger.info(f"Returning profile_image_url: {user_serializer.data.get('profile_image_url')}")
-            logger.info("=== Profile update complete ===\n")
-            
             return Response(user_serializer.data, status=status.HTTP_200_OK)
         
         # Log validation errors
-        logger.error(f"Validation errors: {serializer.errors}")
+        logger.warning("Profile update validation failed for user %s: %s", user.pk, serializer.errors)
         return Response(
             {
                 'detail': 'Validation failed',
@@ -132,7 +126,7 @@ def update_user_profile(request):
         )
     
     except Exception as e:
-        logger.exception(f"Profile update error: {str(e)}")
+        logger.exception("Profile update error: %s", e)
         return Response(
             {'detail': f'Failed to update profile: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -148,37 +142,32 @@ def delete_profile_image(request):
     """
     try:
         user = request.user
-        logger.info(f"=== Delete profile image for: {user.email} ===")
+        logger.debug("Delete profile image for user %s", user.pk)
         
         if user.profile_image:
-            try:
-                old_image_path = user.profile_image.path
-                if os.path.exists(old_image_path):
-                    os.remove(old_image_path)
-                    logger.info(f"Deleted image file: {old_image_path}")
-            except Exception as e:
-                logger.warning(f"Could not delete image file: {str(e)}")
+            old_name, old_variants = user.profile_image.name, user.profile_image_variants
             
             # Clear database field
             user.profile_image = None
+            user.profile_image_variants = {}
             user.save()
+            schedule_release(old_name, old_variants)
             user.refresh_from_db()
             
-            logger.info("Profile image cleared from database")
+            logger.info("Profile image cleared for user %s", user.pk)
             
             # Return updated user data
             user_serializer = UserSerializer(user, context={'request': request})
-            logger.info("=== Delete complete ===\n")
             return Response(user_serializer.data, status=status.HTTP_200_OK)
         
-        logger.warning("No profile image to delete")
+        logger.debug("No profile image to delete for user %s", user.pk)
         return Response(
             {'detail': 'No profile image to delete'},
             status=status.HTTP_404_NOT_FOUND
         )
     
     except Exception as e:
-        logger.exception(f"Error deleting profile image: {str(e)}")
+        logger.exception("Error deleting profile image: %s", e)
         return Response(
             {'detail': 'Failed to delete profile image'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
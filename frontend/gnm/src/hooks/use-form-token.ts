@@ -0,0 +1,21 @@
+import * as React from "react";
+import axios from "axios";
+
+const API_BASE = import.meta.env.VITE_API_BASE_URL?.replace(/\/+$/, "") || "http://localhost:8000";
+
+// Signed load time for the public forms; the backend's spam filter
+// quarantines forms sent back too quickly or with a forged token.
+export function useFormToken() {
+  const [token, setToken] = React.useState("");
+
+  const refresh = React.useCallback(() => {
+    axios
+      .get(`${API_BASE}/api/form-token/`, { withCredentials: true })
+      .then((response) => setToken(response.data.token))
+      .catch(() => setToken(""));
+  }, []);
+
+  React.useEffect(refresh, [refresh]);
+
+  return { token, refresh };
+}
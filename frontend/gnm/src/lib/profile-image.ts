@@ -0,0 +1,27 @@
+// Resized copies of a profile image, by width and format:
+// { "64": { "webp": url, "jpeg": url }, ... } (profile_image_variants)
+export type ProfileImageVariants = Record<string, Record<string, string>>;
+
+// <img> attributes for a profile image shown at `size` CSS pixels. The WebP
+// variants go in srcSet and src is the smallest JPEG that covers a 2x
+// display. Until the variants are rendered, src falls back to `fallback`.
+export function profileImageProps(
+  variants: ProfileImageVariants | undefined,
+  size: number,
+  fallback?: string | null,
+) {
+  const widths = Object.keys(variants ?? {}).map(Number).sort((a, b) => a - b);
+  if (widths.length === 0) {
+    return fallback ? { src: fallback } : null;
+  }
+  const fit = widths.find((width) => width >= size * 2) ?? widths[widths.length - 1];
+  const srcSet = widths
+    .filter((width) => variants[width].webp)
+    .map((width) => `${variants[width].webp} ${width}w`)
+    .join(", ");
+  return {
+    src: variants[fit].jpeg ?? variants[fit].webp,
+    srcSet: srcSet || undefined,
+    sizes: `${size}px`,
+  };
+}
@@ -7,8 +7,20 @@ import { Label } from "@/components/ui/label";
 import { Textarea } from "@/components/ui/textarea";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
+import { profileImageProps, type ProfileImageVariants } from "@/lib/profile-image";
 const API_BASE = import.meta.env.VITE_API_BASE_URL?.replace(/\/+$/, "") || "http://localhost:8000";
 
+// Only the columns the tables below display (?fields= on the admin endpoints)
+const BOOKING_FIELDS = [
+  "id", "user", "user_email", "user_name", "name", "email", "phone", "eventType",
+  "eventDate", "venue", "guestCount", "budget", "specialRequests", "status", "created_at",
+].join(",");
+const USER_FIELDS = [
+  "id", "username", "email", "first_name", "last_name", "phone", "location", "bio",
+  "occupation", "website", "profile_image", "profile_image_variants", "is_staff", "is_superuser",
+  "date_joined",
+].join(",");
+
 
 import { 
   Users, 
@@ -66,6 +78,7 @@ interface UserData {
   occupation?: string;
   website?: string;
   profile_image?: string;
+  profile_image_variants?: ProfileImageVariants;
   booking_count?: number;
   total_spent?: string;
 }
@@ -114,6 +127,7 @@ const Admin = () => {
   const fetchAllBookings = async () => {
     try {
       const response = await axios.get(`${API_BASE}/api/admin/bookings/`, {
+        params: { fields: BOOKING_FIELDS },
         withCredentials: true
       });
       setBookings(response.data);
@@ -133,6 +147,7 @@ const Admin = () => {
   const fetchAllUsers = async () => {
     try {
       const response = await axios.get(`${API_BASE}/api/admin/users/`, {
+        params: { fields: USER_FIELDS },
         withCredentials: true
       });
       setUsers(response.data);
@@ -433,13 +448,14 @@ const Admin = () => {
                   <div className="space-y-4">
                     {filteredUsers.map((user) => {
                       const userBookings = getUserBookings(user.id);
+                      const avatar = profileImageProps(user.profile_image_variants, 80, user.profile_image);
                       return (
                         <div key={user.id} className="p-5 border border-border rounded-lg hover:bg-secondary/20 transition-colors">
                           <div className="flex items-start gap-4 mb-4">
-                            {user.profile_image ? (
+                            {avatar ? (
                               <div className="flex-shrink-0">
                                 <img 
-                                  src={user.profile_image} 
+                                  {...avatar}
                                   alt={user.username}
                                   className="w-20 h-20 rounded-full object-cover border-2 border-primary/20"
                                 />
@@ -7,11 +7,15 @@ import { Textarea } from '@/components/ui/textarea';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Calendar, MessageSquare, CheckCircle } from 'lucide-react';
 import { useToast } from '@/hooks/use-toast';
+import { useFormToken } from '@/hooks/use-form-token';
 const API_BASE = import.meta.env.VITE_API_BASE_URL?.replace(/\/+$/, "") || "http://localhost:8000";
 
 
 const Booking = () => {
   const { toast } = useToast();
+  const { token: formToken, refresh: refreshFormToken } = useFormToken();
+  // Honeypot: hidden from people, filled in by bots
+  const [website, setWebsite] = useState('');
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [formData, setFormData] = useState({
     name: '',
@@ -58,7 +62,7 @@ const Booking = () => {
       delete submitData.customEventType;
 
       // Send form data to Django backend
-     const response = await axios.post(`${API_BASE}/api/booking/`, submitData, {
+     const response = await axios.post(`${API_BASE}/api/booking/`, { ...submitData, website, form_token: formToken }, {
           withCredentials: true, 
           headers: {
             "Content-Type": "application/json",
@@ -86,6 +90,7 @@ const Booking = () => {
         guestCount: '',
         specialRequests: '',
       });
+      refreshFormToken();
 
     } catch (error) {
       console.error('Booking submit error:', error);
@@ -237,6 +242,17 @@ const Booking = () => {
                     />
                   </div>
 
+                  <input
+                    type="text"
+                    name="website"
+                    value={website}
+                    onChange={(e) => setWebsite(e.target.value)}
+                    tabIndex={-1}
+                    autoComplete="off"
+                    aria-hidden="true"
+                    className="hidden"
+                  />
+
                   <Button 
                     type="submit" 
                     size="lg" 
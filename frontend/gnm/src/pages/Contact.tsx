@@ -6,10 +6,14 @@ import { Label } from '@/components/ui/label';
 import { Textarea } from '@/components/ui/textarea';
 import { Phone, Mail, MapPin, Clock, Send, MessageCircle } from 'lucide-react';
 import { useToast } from '@/hooks/use-toast';
+import { useFormToken } from '@/hooks/use-form-token';
 const API_BASE = import.meta.env.VITE_API_BASE_URL?.replace(/\/+$/, "") || "http://localhost:8000";
 
 const Contact = () => {
   const { toast } = useToast();
+  const { token: formToken, refresh: refreshFormToken } = useFormToken();
+  // Honeypot: hidden from people, filled in by bots
+  const [website, setWebsite] = useState('');
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [formData, setFormData] = useState({
     name: '',
@@ -30,7 +34,7 @@ const Contact = () => {
     // Send form data to Django backend
     
 // Line 48 - Replace:
-const response = await axios.post(`${API_BASE}/api/contact/`, formData, {
+const response = await axios.post(`${API_BASE}/api/contact/`, { ...formData, website, form_token: formToken }, {
         withCredentials: true, // ✅ Important for cookie-based auth
         headers: {
           "Content-Type": "application/json",
@@ -50,6 +54,7 @@ const response = await axios.post(`${API_BASE}/api/contact/`, formData, {
       subject: '',
       message: '',
     });
+    refreshFormToken();
 
   } catch (error) {
     console.error('Contact submit error:', error);
@@ -154,6 +159,17 @@ const response = await axios.post(`${API_BASE}/api/contact/`, formData, {
                     />
                   </div>
 
+                  <input
+                    type="text"
+                    name="website"
+                    value={website}
+                    onChange={(e) => setWebsite(e.target.value)}
+                    tabIndex={-1}
+                    autoComplete="off"
+                    aria-hidden="true"
+                    className="hidden"
+                  />
+
                   <Button 
                     type="submit" 
                     size="lg" 
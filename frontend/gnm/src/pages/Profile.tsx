@@ -9,6 +9,7 @@ import { Label } from "@/components/ui/label";
 import { Avatar, AvatarFallback, AvatarImage } from "@/components/ui/avatar";
 import { Separator } from "@/components/ui/separator";
 import { useToast } from "@/hooks/use-toast";
+import { profileImageProps, type ProfileImageVariants } from "@/lib/profile-image";
 import { 
   User, Mail, Calendar, Shield, Edit2, Save, X, Loader2, 
   Phone, MapPin, Briefcase, Globe, Camera, Trash2, Upload 
@@ -35,6 +36,7 @@ interface UserData {
   website?: string;
   profile_image?: string;
   profile_image_url?: string;
+  profile_image_variants?: ProfileImageVariants;
   is_staff?: boolean;
   is_superuser?: boolean;
 }
@@ -66,6 +68,7 @@ const Profile = () => {
   const [isLoading, setIsLoading] = useState(true);
   const [savingField, setSavingField] = useState<string | null>(null);
   const [uploadingImage, setUploadingImage] = useState(false);
+  // Local preview of a file being uploaded; otherwise the stored image is shown
   const [imagePreview, setImagePreview] = useState<string | null>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
   const { toast } = useToast();
@@ -92,9 +95,6 @@ const Profile = () => {
           occupation: response.data.occupation || "",
           website: response.data.website || "",
         });
-        if (response.data.profile_image_url) {
-          setImagePreview(response.data.profile_image_url);
-        }
       }
     } catch (error: any) {
       console.error("Failed to fetch user data:", error);
@@ -177,13 +177,8 @@ const Profile = () => {
 
       if (response.data) {
         setUserData(response.data);
-        
-        // Add cache-busting timestamp to avoid browser caching old image
-        if (response.data.profile_image_url) {
-          const urlWithTimestamp = `${response.data.profile_image_url}?t=${Date.now()}`;
-          console.log("Setting image preview:", urlWithTimestamp);
-          setImagePreview(urlWithTimestamp);
-        }
+        // Stored images are named by their content, so the new URL is never cached
+        setImagePreview(null);
         
         toast({
           title: "Success",
@@ -207,12 +202,8 @@ const Profile = () => {
         variant: "destructive",
       });
       
-      // Reset preview on error
-      if (userData?.profile_image_url) {
-        setImagePreview(userData.profile_image_url);
-      } else {
-        setImagePreview(null);
-      }
+      // Back to the stored image
+      setImagePreview(null);
     } finally {
       setUploadingImage(false);
       if (fileInputRef.current) {
@@ -547,6 +538,11 @@ const Profile = () => {
     return null;
   }
 
+  // The avatar is h-28, 112 CSS pixels
+  const avatar = imagePreview
+    ? { src: imagePreview }
+    : profileImageProps(userData.profile_image_variants, 112, userData.profile_image_url);
+
   return (
     <div className="min-h-screen bg-gradient-elegant pt-20">
       <div className="container max-w-4xl mx-auto px-4 py-8">
@@ -558,8 +554,8 @@ const Profile = () => {
               {/* Profile Image Section */}
               <div className="relative group">
                 <Avatar className="h-28 w-28 text-2xl ring-4 ring-background shadow-lg">
-                  {imagePreview ? (
-                    <AvatarImage src={imagePreview} alt={userData.username} />
+                  {avatar ? (
+                    <AvatarImage {...avatar} alt={userData.username} />
                   ) : null}
                   <AvatarFallback className="bg-gradient-hero text-white text-2xl font-semibold">
                     {getUserInitials()}
@@ -583,7 +579,7 @@ const Profile = () => {
                       )}
                     </Button>
                     
-                    {imagePreview && (
+                    {avatar && (
                       <Button
                         size="sm"
                         variant="ghost"